@@ -0,0 +1,33 @@
+from fastapi import HTTPException, status
+
+from core.helpers.ProfilingHelper import PROFILING_HELPER
+from apps.administration.profiling.domain.schemas.ProfilingSchema import ProfilingRequestSchema, ProfilingResponseSchema
+
+
+
+class ProfilingUsecase:
+
+    @staticmethod
+    async def profile(profiling: ProfilingRequestSchema) -> ProfilingResponseSchema:
+        # Un solo perfil a la vez por worker, dos muestreadores se medirían entre sí
+        if PROFILING_HELPER.lock.locked():
+            raise HTTPException(
+                status_code = status.HTTP_409_CONFLICT,
+                detail = {
+                    "code":status.HTTP_409_CONFLICT,
+                    "message":"Ya hay un perfil en curso en este worker."
+                }
+            )
+
+        async with PROFILING_HELPER.lock:
+            result = await PROFILING_HELPER.profile(
+                seconds = profiling.seconds,
+                interval = profiling.interval,
+                slow_callback = profiling.slow_callback
+            )
+
+        return ProfilingResponseSchema(**result)
+
+
+
+PROFILING_USECASES = ProfilingUsecase()
@@ -0,0 +1,25 @@
+from typing import Dict, List, Literal
+
+from pydantic import BaseModel, Field
+
+from settings import SETTINGS
+
+
+
+class ProfilingRequestSchema(BaseModel):
+    seconds: float = Field(default=10.0, gt=0, le=SETTINGS.PROFILING_MAX_SECONDS)
+    interval: float = Field(default=SETTINGS.PROFILING_INTERVAL, ge=0.001, le=1.0)
+    slow_callback: float = Field(default=SETTINGS.PROFILING_SLOW_CALLBACK, gt=0)
+    format: Literal["json", "collapsed", "tasks"] = "json"
+
+
+
+class ProfilingResponseSchema(BaseModel):
+    pid: int
+    seconds: float
+    interval: float
+    samples: int
+    stacks: str
+    tasks: str
+    loop_lag_ms: Dict[str, float]
+    slow_callbacks: List[Dict]
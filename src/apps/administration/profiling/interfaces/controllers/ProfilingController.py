@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import PlainTextResponse
+
+from core.databases.Models import Users
+from core.bases.BaseSchemas import ResponseSchema
+from core.helpers.PermissionHelper import PERMISSION_HELPER
+from apps.administration.profiling.domain.schemas.ProfilingSchema import ProfilingRequestSchema
+from apps.administration.profiling.application.usecases.ProfilingUsecase import PROFILING_USECASES
+
+
+
+profiling_router = APIRouter()
+
+@profiling_router.post("/profiling", response_model=ResponseSchema, response_model_exclude_none=True, status_code=status.HTTP_200_OK)
+async def profiling(
+    request: ProfilingRequestSchema,
+    authenticated: Users = Depends(PERMISSION_HELPER.get_current_user)
+):
+    """
+        Profiles the worker that serves the request for the requested seconds.
+
+        Args:
+        - request (ProfilingRequestSchema): Duration, sampling interval, slow callback threshold and output format.
+        - authenticated (Users): Authenticated superuser, every /administration route requires one.
+
+        Returns:
+        - The whole report, or only the collapsed thread or task stacks for flamegraph tools.
+    """
+    result = await PROFILING_USECASES.profile(request)
+
+    if request.format == "collapsed":
+        return PlainTextResponse(result.stacks)
+
+    if request.format == "tasks":
+        return PlainTextResponse(result.tasks)
+
+    return ResponseSchema(
+        status = status.HTTP_200_OK,
+        detail = "Perfil del worker completado.",
+        result = result
+    )
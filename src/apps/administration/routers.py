@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+
+from apps.administration.profiling.interfaces.controllers.ProfilingController import profiling_router
+
+
+
+administration = APIRouter(prefix="/administration", tags=["Administration"])
+administration.include_router(profiling_router)
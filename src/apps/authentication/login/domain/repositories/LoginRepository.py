@@ -1,4 +1,5 @@
 from typing import Dict
+from collections import defaultdict
 
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
@@ -9,8 +10,13 @@ from apps.authentication.login.domain.schemas.LoginSchema import LoginRequestSch
 from apps.authentication.register.domain.schemas.RegisterSchema import RegisterRequestSchema
 from core.databases.Models import (
     Users,
+    Roles,
+    Groups,
     Systems,
-    Endpoints
+    Endpoints,
+    MicroServices,
+    endpoints_roles,
+    endpoints_groups
 )
 
 
@@ -22,7 +28,7 @@ class LoginRepository(BaseRepository):
 
             
     async def get_user_data(self, user_email: int) -> Dict:
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
 
                 # Obtener el usuario con el ID proporcionado
@@ -59,7 +65,7 @@ class LoginRepository(BaseRepository):
 
 
     async def get_endpoints_by_system_code(self, system_code: str) -> Dict:
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
 
                 # Obtener el sistema con el código proporcionado
@@ -70,22 +76,40 @@ class LoginRepository(BaseRepository):
                 if not system:
                     return {"endpoints": []}
 
-                # Obtener todos los endpoints asociados con ese sistema
-                statement = select(Endpoints).join(Endpoints.endpoint_microservice).filter(Systems.id == system.id).options(
-                    selectinload(Endpoints.roles),
-                    selectinload(Endpoints.groups),
+                # Obtener los endpoints de los microservicios del sistema, sin cargar los modelos completos
+                endpoint_ids = (
+                    select(Endpoints.id)
+                    .join(MicroServices, Endpoints.endpoint_microservice_id == MicroServices.id)
+                    .where(MicroServices.microservice_system_id == system.id)
                 )
-                endpoints = await session.execute(statement)
-                endpoints = endpoints.scalars().all()
+                statement = select(Endpoints.id, Endpoints.endpoint_name, Endpoints.endpoint_url).where(
+                    Endpoints.id.in_(endpoint_ids)
+                ).order_by(Endpoints.id)
+                endpoints = (await session.execute(statement)).all()
+
+                # Obtener los roles y grupos de todos los endpoints en una consulta cada uno
+                roles = defaultdict(list)
+                statement = select(endpoints_roles.c.endpoint_id, Roles.role_name).join(
+                    Roles, Roles.id == endpoints_roles.c.role_id
+                ).where(endpoints_roles.c.endpoint_id.in_(endpoint_ids))
+                for endpoint_id, role_name in await session.execute(statement):
+                    roles[endpoint_id].append(role_name)
+
+                groups = defaultdict(list)
+                statement = select(endpoints_groups.c.endpoint_id, Groups.group_name).join(
+                    Groups, Groups.id == endpoints_groups.c.group_id
+                ).where(endpoints_groups.c.endpoint_id.in_(endpoint_ids))
+                for endpoint_id, group_name in await session.execute(statement):
+                    groups[endpoint_id].append(group_name)
 
                 # Convertir a la estructura deseada
                 result = [
                     {
                         'endpoint_name': endpoint.endpoint_name,
                         'endpoint_url': endpoint.endpoint_url,
-                        'system_code': endpoint.endpoint_microservice.microservice_system.system_code,
-                        'roles': [role.role_name for role in endpoint.roles],
-                        'groups': [group.group_name for group in endpoint.groups]
+                        'system_code': system.system_code,
+                        'roles': roles[endpoint.id],
+                        'groups': groups[endpoint.id]
                     }
                     for endpoint in endpoints
                 ]
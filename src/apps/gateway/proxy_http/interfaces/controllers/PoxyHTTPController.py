@@ -1,3 +1,5 @@
+import time
+
 from fastapi import (
     APIRouter, 
     Depends, 
@@ -7,20 +9,41 @@ from fastapi import (
     status
 )
 
-from httpx import ConnectError
+from httpx import ConnectError, PoolTimeout
 
+from settings import SETTINGS
 from core.databases.Models import Users
 from core.utils.GetEndpoint import get_endpoint
-from core.utils.MakeRequest import make_request
+from core.bases.BaseResponses import DEFAULT_RESPONSE_CLASS, StreamingProxyResponse, http_exception_handler
+from core.utils.MakeRequest import open_request, is_streaming
 from core.utils.GetMicroservices import get_microservices
+from core.helpers.HeaderHelper import HEADER_HELPER
+from core.helpers.RouteCacheHelper import ROUTE_CACHE
+from core.helpers.MetricsHelper import METRICS_HELPER
+from core.helpers.TracingHelper import TRACING_HELPER
 from core.helpers.PermissionHelper import PERMISSION_HELPER
 
 
 
-ALLOWED_METHODS = {"GET", "POST", "PUT", "DELETE"}
+ALLOWED_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE"}
 
 reverse_proxy_http = APIRouter()
 
+@reverse_proxy_http.options("/{path:path}", include_in_schema=False)
+async def optionsProxy(path: str) -> Response:
+    """
+        Answers the OPTIONS requests at the gateway, without authentication nor a call to
+        the microservice. The CORS preflights never get here, CORSMiddleware answers them.
+
+        Args:
+        - path (str): The path to the endpoint.
+
+        Returns:
+        - Empty response with the methods the gateway proxies.
+    """
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"Allow": ", ".join(sorted(ALLOWED_METHODS | {"OPTIONS"}))})
+
+
 @reverse_proxy_http.api_route("/{path:path}", methods=ALLOWED_METHODS, include_in_schema=False)
 async def reverseProxy(
     path: str, 
@@ -36,31 +59,93 @@ async def reverseProxy(
         - authenticated (Users, optional): Authenticated user. Default is the result of PERMISSION_HELPER.get_current_user.
 
         Returns:
-        - JSON response or PDF response based on the microservice response.
+        - JSON response, PDF response or the relayed stream (Server-Sent Events, chunked
+          bodies) based on the microservice response, only its headers for HEAD.
     """
     path = f"/{path}"
 
-    await get_endpoint(path)
+    # The endpoint URL may be a template like /orders/{id:int}, the microservice still gets the requested path
+    template, parameters = await ROUTE_CACHE.match(path)
+    endpoint = await get_endpoint(template)
+    request.state.path_parameters = parameters
+    microservice = endpoint.endpoint_microservice
+    system = microservice.microservice_system if microservice else None
+    request.state.system = system.system_code if system else None
+    request.state.endpoint = endpoint.endpoint_url
+    request.state.microservice = microservice.microservice_name if microservice else None
     
-    microservices = await get_microservices(path)
+    microservices = await get_microservices(template)
     url = f"{microservices}{path}?{request.query_params}" if request.query_params else f"{microservices}{path}"
     body = await request.body()
+    rules = HEADER_HELPER.endpoint_rules(endpoint)
 
     try:
-        response = await make_request(request.method, url, dict(request.headers), body)
+        started = time.perf_counter()
+        upstream_status = "error"
+
+        try:
+            response, close = await open_request(
+                request.method,
+                url,
+                HEADER_HELPER.request_headers(request, authenticated, rules),
+                body,
+                http2=bool(microservice and microservice.microservice_http2),
+                max_streams=microservice.microservice_max_streams if microservice else None,
+                key=microservice.id if microservice else None
+            )
+            upstream_status = str(response.status_code)
+
+            # Only the headers, the microservice sends no body
+            if request.method == "HEAD":
+                await close()
+                proxied = Response(status_code=response.status_code)
+                proxied.raw_headers = [
+                    (name.encode("latin-1"), value.encode("latin-1"))
+                    for name, value in HEADER_HELPER.response_headers(response, rules, head=True)
+                ]
+                return proxied
+
+            if is_streaming(response):
+                return StreamingProxyResponse(
+                    response,
+                    close,
+                    HEADER_HELPER.response_headers(response, rules),
+                    SETTINGS.STREAM_HEARTBEAT_INTERVAL
+                )
+
+            try:
+                await response.aread()
+            finally:
+                await close()
+        finally:
+            METRICS_HELPER.upstream_duration.observe(
+                request.state.microservice or "",
+                request.method,
+                upstream_status,
+                value=time.perf_counter() - started
+            )
         
-        # Handle non-200 responses
+        # Handle non-200 responses, rendered like an HTTPException with the headers of the
+        # microservice appended one by one, so repeated ones such as Set-Cookie are kept
         if response.status_code != status.HTTP_200_OK:
-            raise HTTPException(status_code=response.status_code, detail=response.json().get("detail", "Unknown error"))
+            error = HTTPException(
+                status_code=response.status_code,
+                detail=response.json().get("detail", "Unknown error")
+            )
+            return HEADER_HELPER.forward(await http_exception_handler(request, error), response, rules)
 
         # Check if the response is a PDF and return appropriately
         if response.headers.get("content-type") == "application/pdf":
             response.headers["Content-Disposition"] = "inline; filename=documento_oficial.pdf"
-            return Response(content=response.content, media_type="application/pdf")
+            return HEADER_HELPER.forward(Response(content=response.content, media_type="application/pdf"), response, rules)
+
+        # Encode here, inside the span, instead of letting FastAPI serialize the returned value
+        with TRACING_HELPER.span("encode"):
+            proxied = DEFAULT_RESPONSE_CLASS(content=response.json())
 
-        return response.json()
+        return HEADER_HELPER.forward(proxied, response, rules)
 
-    except ConnectError:
+    except (ConnectError, PoolTimeout):
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE, 
             detail="The service is not available, please contact the support area."
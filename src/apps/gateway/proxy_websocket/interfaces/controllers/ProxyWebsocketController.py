@@ -1,19 +1,26 @@
-import asyncio
+import logging
 
-from fastapi import APIRouter, WebSocket, status, websockets
+from fastapi import APIRouter, WebSocket, status
+from websockets.exceptions import InvalidHandshake
 
-from core.utils.GetEndpoint import get_endpoint
-from core.helpers.WebsocketHelper import WS_HELPER
-from core.utils.GetMicroservices import get_microservices
+from core.helpers.WebsocketHelper import WS_HELPER, TOKEN_SUBPROTOCOL
+from core.helpers.RouteCacheHelper import ROUTE_CACHE
+from core.helpers.WebsocketSessionHelper import WS_SESSIONS
+from core.helpers.WebsocketMultiplexHelper import WS_MULTIPLEX
 
 
 
+LOGGER = logging.getLogger("fastapi")
+
 reverse_proxy_websocket = APIRouter()
 
 @reverse_proxy_websocket.websocket("/ws/{path:path}")
 async def websocketProxy(websocket: WebSocket, path: str):
     """
-        WebSocket proxy to forward data based on the path.
+        WebSocket proxy to forward data based on the path. The handshake is authenticated
+        and authorized from the cached routes, grants and keys, and admitted by the session
+        limits, then the microservice is connected, so the client is accepted with the
+        subprotocol it chose and rejected when it cannot be reached.
 
         Args:
         - websocket (WebSocket): FastAPI WebSocket object.
@@ -24,25 +31,59 @@ async def websocketProxy(websocket: WebSocket, path: str):
     """
     path = f"/{path}"
 
-    await get_endpoint(path)  # Reusing the previous function to handle errors
-    
-    microservices = await get_microservices(path)
-    url = f"{microservices}{path}"
-    wsUrl = await WS_HELPER.convert_url_to_ws(url)
-    
-    await websocket.accept()
-    
+    route = await ROUTE_CACHE.route(path)
+
+    if route is None:
+        await WS_HELPER.reject(websocket, status.WS_1008_POLICY_VIOLATION, "The requested endpoint was not found.")
+        return
+
+    token, subprotocols, query, from_subprotocol = WS_HELPER.handshake_credentials(websocket)
+    claims = None
+
+    # Same rules as JWTBearer: a token is always checked, public endpoints do not require one
+    if token is not None or route.authenticated:
+        claims = await WS_HELPER.authenticate(token) if token is not None else None
+
+        if claims is None or not await ROUTE_CACHE.authorize(claims["id"], path):
+            await WS_HELPER.reject(websocket, status.WS_1008_POLICY_VIOLATION, "Access denied.")
+            return
+
+    user = claims["id"] if claims is not None else None
+    ip = websocket.client.host if websocket.client else None
+
+    # Checked and registered without awaiting in between, so concurrent handshakes cannot exceed the limits
+    rejection = WS_SESSIONS.rejection(user, ip, route.base_url)
+
+    if rejection is not None:
+        await WS_HELPER.reject(websocket, *rejection)
+        return
+
+    session = WS_SESSIONS.acquire(user, ip, route.base_url)
+
     try:
-        async with websockets.connect(wsUrl) as ws:
-            consumer_task = asyncio.ensure_future(WS_HELPER.consume(ws, websocket))
-            producer_task = asyncio.ensure_future(WS_HELPER.produce(ws, websocket))
-            done, pending = await asyncio.wait(
-                [consumer_task, producer_task],
-                return_when=asyncio.FIRST_COMPLETED
-            )
-
-            for task in pending:
-                task.cancel()
-
-    except Exception as error:
-        await websocket.close(code=status.WS_1006_ABNORMAL_CLOSURE)
+        url = f"{route.base_url}{path}?{query}" if query else f"{route.base_url}{path}"
+        wsUrl = await WS_HELPER.convert_url_to_ws(url)
+
+        try:
+            if route.multiplex:
+                upstream = await WS_MULTIPLEX.open(route.base_url, path, query, subprotocols, user)
+            else:
+                upstream = await WS_HELPER.connect(wsUrl, subprotocols)
+
+        except (OSError, TimeoutError, InvalidHandshake) as error:
+            LOGGER.warning(f"WebSocket connection to {wsUrl} failed: {error!r}")
+            await WS_HELPER.reject(websocket, 1014, "The service is not available.")
+            return
+
+        # A browser fails the handshake unless one of the subprotocols it offered is selected
+        await websocket.accept(subprotocol=upstream.subprotocol or (TOKEN_SUBPROTOCOL if from_subprotocol else None))
+
+        await WS_HELPER.relay(
+            websocket,
+            upstream,
+            authorize=(lambda: WS_HELPER.authorize(token, path)) if token is not None else None,
+            session=session
+        )
+
+    finally:
+        WS_SESSIONS.release(session)
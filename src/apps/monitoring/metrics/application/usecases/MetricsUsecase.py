@@ -0,0 +1,20 @@
+from typing import Union
+
+from core.helpers.MetricsHelper import METRICS_HELPER
+
+
+
+class MetricsUsecase:
+
+    @staticmethod
+    async def export() -> str:
+        return await METRICS_HELPER.export()
+
+
+    @staticmethod
+    def authorized(authorization: Union[str, None], client: Union[str, None]) -> bool:
+        return METRICS_HELPER.authorized(authorization, client)
+
+
+
+METRICS_USECASES = MetricsUsecase()
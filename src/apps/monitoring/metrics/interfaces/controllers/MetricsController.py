@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException, Request, Response, status
+
+from apps.monitoring.metrics.application.usecases.MetricsUsecase import METRICS_USECASES
+
+
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics", status_code=status.HTTP_200_OK, include_in_schema=False)
+async def metrics(request: Request):
+    # Only scrapers with the METRICS_TOKEN or from METRICS_ALLOWED_IPS read the metrics
+    if not METRICS_USECASES.authorized(request.headers.get("authorization"), request.client.host if request.client else None):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                "status": status.HTTP_403_FORBIDDEN,
+                "message": "Access denied."
+            }
+        )
+
+    return Response(
+        content = await METRICS_USECASES.export(),
+        media_type = "text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+
+from apps.monitoring.metrics.interfaces.controllers.MetricsController import metrics_router
+
+
+
+monitoring = APIRouter(prefix="/monitoring", tags=["Monitoring"])
+monitoring.include_router(metrics_router)
@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from httpx import AsyncClient
+from cryptography.fernet import Fernet
+
+from benchmarks.environment import SOURCE_DIR, configure
+from benchmarks.stubs import ServerThread, VaultStub, upstream_app
+from benchmarks.scenarios import run_http, run_websocket
+
+
+
+SCENARIOS = ("proxy_public", "proxy_authenticated", "login", "large_body", "websocket_echo")
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Runs the gateway against a seeded database, a stub upstream and a stub Vault, and reports the results as JSON."
+    )
+    parser.add_argument("--database-url", help="Database to seed and benchmark against, it is dropped and recreated (default: a temporary SQLite file).")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated scenarios to run.")
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests per HTTP scenario.")
+    parser.add_argument("--login-requests", type=int, default=100, help="Measured requests of the login scenario (bcrypt bound).")
+    parser.add_argument("--ws-messages", type=int, default=200, help="Messages per WebSocket session.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients or sessions.")
+    parser.add_argument("--warmup", type=int, default=50, help="Requests sent before measuring each HTTP scenario.")
+    parser.add_argument("--body-size", type=int, default=1024 * 1024, help="Body size in bytes of the large_body scenario.")
+    parser.add_argument("--endpoints", type=int, default=100, help="Additional endpoints seeded in the database.")
+    parser.add_argument("--workers", type=int, default=1, help="Gateway worker processes.")
+    parser.add_argument("--output", help="File to write the results to (default: stdout).")
+    parser.add_argument("--baseline", help="Previous results to compare with, exits with status 1 on regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression of throughput and p99 latency.")
+    return parser.parse_args()
+
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+
+def wait_port(port: int, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The gateway exited with status {process.returncode}.")
+
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+
+    raise RuntimeError("The gateway did not start.")
+
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SOURCE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+
+async def run_scenarios(args: argparse.Namespace, port: int, credentials: Dict[str, str]) -> Dict[str, Any]:
+    """
+        Runs the selected scenarios one after the other against the running gateway.
+
+        Args:
+        - args (argparse.Namespace): Command line arguments.
+        - port (int): Port of the gateway.
+        - credentials (Dict[str, str]): Credentials of the seeded user.
+
+        Returns:
+        - Summary of every scenario.
+    """
+    base_url = f"http://127.0.0.1:{port}"
+    selected = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+    results = {}
+    headers = {}
+
+    if "proxy_authenticated" in selected:
+        async with AsyncClient(base_url=base_url, timeout=60.0) as client:
+            response = await client.post("/authentication/login", json=credentials)
+
+        if response.status_code == 200:
+            headers = {"Authorization": f"Bearer {response.json()['result']['token']}"}
+
+    body = os.urandom(args.body_size)
+    operations = {
+        "proxy_public": lambda client: client.get("/gateway/bench/public"),
+        "proxy_authenticated": lambda client: client.get("/gateway/bench/private", headers=headers),
+        "login": lambda client: client.post("/authentication/login", json=credentials),
+        "large_body": lambda client: client.post("/gateway/bench/upload", content=body),
+    }
+
+    for scenario in selected:
+        if scenario == "websocket_echo":
+            results[scenario] = await run_websocket(
+                f"ws://127.0.0.1:{port}/gateway/ws/bench/echo", args.ws_messages, args.concurrency, "x" * 128
+            )
+        elif scenario in operations:
+            results[scenario] = await run_http(
+                base_url,
+                operations[scenario],
+                args.login_requests if scenario == "login" else args.requests,
+                args.concurrency,
+                min(args.warmup, 5) if scenario == "login" else args.warmup
+            )
+        else:
+            results[scenario] = {"skipped": "unknown scenario"}
+
+        print(f"{scenario}: {json.dumps(results[scenario])}", file=sys.stderr)
+
+    return results
+
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+        Compares the results with a baseline run.
+
+        Args:
+        - results (Dict[str, Any]): Results of this run.
+        - baseline (Dict[str, Any]): Results of the baseline run.
+        - tolerance (float): Allowed relative regression.
+
+        Returns:
+        - Description of every regression found.
+    """
+    regressions = []
+
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+
+        if not previous or "skipped" in previous or "skipped" in current:
+            continue
+
+        if current["throughput_ops"] < previous["throughput_ops"] * (1 - tolerance):
+            regressions.append(f"{scenario}: throughput {previous['throughput_ops']} -> {current['throughput_ops']} ops/s")
+
+        if current["latency_ms"]["p99"] > previous["latency_ms"]["p99"] * (1 + tolerance):
+            regressions.append(f"{scenario}: p99 {previous['latency_ms']['p99']} -> {current['latency_ms']['p99']} ms")
+
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{scenario}: errors {previous['errors']} -> {current['errors']}")
+
+    return regressions
+
+
+
+def main() -> int:
+    args = parse_arguments()
+    workdir = tempfile.mkdtemp(prefix="gateway-benchmark-")
+    secret_key = Fernet.generate_key().decode()
+
+    vault = VaultStub(secret_key)
+    upstream_port = free_port()
+    upstream = ServerThread(upstream_app(), upstream_port)
+    upstream.start()
+    upstream.wait_started()
+
+    configure(workdir, args.database_url, secret_key, vault.start())
+
+    from benchmarks.seed import seed
+    credentials = asyncio.run(seed(f"http://127.0.0.1:{upstream_port}", args.endpoints))
+
+    port = free_port()
+    log = open(os.path.join(workdir, "gateway.log"), "w")
+    gateway = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        cwd=workdir,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+    try:
+        wait_port(port, gateway)
+        scenarios = asyncio.run(run_scenarios(args, port, credentials))
+    finally:
+        gateway.terminate()
+        gateway.wait(timeout=30)
+        log.close()
+        upstream.stop()
+        vault.stop()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "body_size": args.body_size,
+            "endpoints": args.endpoints,
+            "vault_calls": vault.calls,
+            "gateway_log": log.name,
+        },
+        "scenarios": scenarios,
+    }
+    output = json.dumps(results, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from cryptography.fernet import Fernet
+
+from benchmarks.stubs import VaultStub
+from benchmarks.environment import configure
+
+
+
+SCALES = (10, 100, 1000, 10000, 100000)
+
+# Budgets of a single call of each target: database round trips, median latency and
+# peak memory. The access control of a request must not grow with the size of the
+# permission graph, growth bounds its latency at the largest scale against the smallest.
+BUDGETS = {
+    "validate_token": {"queries": 0, "ms": 50.0, "memory_kb": 2048},
+    "user_access_control": {"queries": 4, "ms": 25.0, "memory_kb": 256, "growth": 4.0},
+    "get_endpoints_by_system_code": {"queries": 4, "ms": 250.0, "memory_kb": 4096},
+}
+
+TARGET_PATH = "/tenant/endpoint/0"
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.auth",
+        description="Measures the token validation and the access control of the gateway against synthetic permission graphs of growing size."
+    )
+    parser.add_argument("--database-url", help="Database to seed and benchmark against, it is dropped and recreated (default: a temporary SQLite file).")
+    parser.add_argument("--scales", default=",".join(map(str, SCALES)), help="Comma separated number of users and endpoints of each graph.")
+    parser.add_argument("--tenant-endpoints", type=int, default=200, help="Endpoints of the system the measured user logs in to.")
+    parser.add_argument("--repeat", type=int, default=50, help="Measured calls of each target, the median is reported.")
+    parser.add_argument("--budgets", help="JSON object overriding the default budgets, e.g. '{\"user_access_control\": {\"ms\": 10}}'.")
+    parser.add_argument("--output", help="File to write the results to (default: stdout).")
+    return parser.parse_args()
+
+
+
+async def build_graph(scale: int, tenant_endpoints: int) -> int:
+    """
+        Recreates the schema and bulk inserts a permission graph: scale users and
+        endpoints, a role and a group every ten of them, and a system every hundred.
+        The first system is the tenant of the measured user and holds tenant_endpoints
+        endpoints, the measured endpoint requires a role the user only has through a
+        group, which is the longest path of the access control.
+
+        Args:
+        - scale (int): Number of users and endpoints.
+        - tenant_endpoints (int): Endpoints of the tenant system.
+
+        Returns:
+        - ID of the measured user.
+    """
+    from sqlalchemy import insert
+
+    from core.bases import Base, CONNECTION_DATABASE
+    from core.helpers.HasingHelper import HASHING
+    from core.databases.Models import (
+        Users,
+        Roles,
+        Groups,
+        Systems,
+        Endpoints,
+        MicroServices,
+        groups_roles,
+        users_roles,
+        users_groups,
+        users_systems,
+        endpoints_roles,
+        endpoints_groups
+    )
+
+    systems = max(scale // 100, 1) + 1
+    roles = groups = max(scale // 10, 1)
+    tenant = min(scale, tenant_endpoints)
+    password = await HASHING.hash_password("benchmark-password")
+
+    def system_of(endpoint: int) -> int:
+        return 1 if endpoint < tenant else 2 + (endpoint - tenant) % (systems - 1)
+
+    async with CONNECTION_DATABASE.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+        rows = {
+            Systems: [
+                {"id": index + 1, "system_code": f"S{index}", "name_system": f"System {index}", "version_system": "1.0",
+                 "system_description": "Benchmark system", "system_host": "127.0.0.1", "system_status": True}
+                for index in range(systems)
+            ],
+            MicroServices: [
+                {"id": index + 1, "microservice_name": f"service_{index}", "microservice_base_url": f"http://127.0.0.1/{index}",
+                 "microservice_status": True, "microservice_system_id": index + 1}
+                for index in range(systems)
+            ],
+            Roles: [{"id": index + 1, "role_name": f"role_{index}", "role_status": True} for index in range(roles)],
+            Groups: [{"id": index + 1, "group_name": f"group_{index}", "group_status": True} for index in range(groups)],
+            Endpoints: [
+                {"id": index + 1, "endpoint_name": f"endpoint_{index}",
+                 "endpoint_url": TARGET_PATH if index == 0 else f"/system/{system_of(index)}/endpoint/{index}",
+                 "endpoint_request": "GET", "endpoint_status": True, "endpoint_authenticated": True,
+                 "endpoint_microservice_id": system_of(index)}
+                for index in range(scale)
+            ],
+            Users: [
+                {"id": index + 1, "email": f"user_{index}@example.com", "password": password, "is_active": True}
+                for index in range(scale)
+            ],
+        }
+        grants = {
+            groups_roles: [{"group_id": index % groups + 1, "role_id": (index + offset) % roles + 1} for index in range(groups) for offset in (0, 1)],
+            endpoints_roles: [{"endpoint_id": index + 1, "role_id": index % roles + 1} for index in range(1, scale)],
+            endpoints_groups: [{"endpoint_id": index + 1, "group_id": index % groups + 1} for index in range(scale)],
+            users_roles: [{"user_id": index + 1, "role_id": (index + 3) % roles + 1} for index in range(1, scale)],
+            users_groups: [{"user_id": index + 1, "group_id": index % groups + 1} for index in range(scale)],
+            users_systems: [{"user_id": index + 1, "system_id": system_of(index)} for index in range(scale)],
+        }
+
+        for model, values in rows.items():
+            await connection.execute(insert(model), values)
+
+        for table, values in grants.items():
+            await connection.execute(insert(table), values)
+
+    await CONNECTION_DATABASE.close()
+    return 1
+
+
+
+async def measure(operation: Callable[[], Awaitable[Any]], repeat: int, queries: List[str]) -> Dict[str, Any]:
+    """
+        Measures the database round trips, the median latency and the peak memory of an operation.
+        Memory is measured on a separate call, tracing the allocations distorts the latency.
+
+        Args:
+        - operation (Callable): Coroutine function to measure.
+        - repeat (int): Measured calls.
+        - queries (List[str]): List the statements executed on the database are appended to.
+
+        Returns:
+        - Measurements of the operation.
+    """
+    await operation()
+
+    queries.clear()
+    await operation()
+    statements = len(queries)
+
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await operation()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    await operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "queries": statements,
+        "ms": round(statistics.median(latencies), 3),
+        "memory_kb": round(peak / 1024, 1),
+    }
+
+
+
+async def run_scale(scale: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+        Builds the graph of a scale and measures every target against it.
+
+        Args:
+        - scale (int): Number of users and endpoints.
+        - args (argparse.Namespace): Command line arguments.
+
+        Returns:
+        - Measurements of every target.
+    """
+    from sqlalchemy import event
+
+    from core.bases import CONNECTION_DATABASE
+    from core.helpers.JwtManagerHelper import JwtManagerHelper
+    from core.helpers.PermissionHelper import PERMISSION_HELPER
+    from apps.authentication.login.domain.repositories.LoginRepository import LOGIN_REPOSITORY
+
+    started = time.perf_counter()
+    user_id = await build_graph(scale, args.tenant_endpoints)
+    seeded = time.perf_counter() - started
+
+    queries: List[str] = []
+
+    def count(connection, cursor, statement, parameters, context, executemany) -> None:
+        queries.append(statement)
+
+    event.listen(CONNECTION_DATABASE.engine.sync_engine, "before_cursor_execute", count)
+
+    try:
+        # The token carries the same claims as the one issued by the login
+        user = await LOGIN_REPOSITORY.get_user_data("user_0@example.com")
+        user.pop("password")
+        endpoints = await LOGIN_REPOSITORY.get_endpoints_by_system_code("S0")
+        token = await JwtManagerHelper(data={**user, **endpoints}).create_token()
+
+        results = {
+            "validate_token": await measure(JwtManagerHelper(token=token).validate_token, args.repeat, queries),
+            "user_access_control": await measure(
+                lambda: PERMISSION_HELPER.user_access_control(user_id, f"/gateway{TARGET_PATH}"), args.repeat, queries
+            ),
+            "get_endpoints_by_system_code": await measure(
+                lambda: LOGIN_REPOSITORY.get_endpoints_by_system_code("S0"), args.repeat, queries
+            ),
+        }
+
+        if not await PERMISSION_HELPER.user_access_control(user_id, f"/gateway{TARGET_PATH}"):
+            raise RuntimeError("The measured user was denied access to the measured endpoint.")
+
+    finally:
+        event.remove(CONNECTION_DATABASE.engine.sync_engine, "before_cursor_execute", count)
+        await CONNECTION_DATABASE.close()
+
+    results["meta"] = {"seed_seconds": round(seeded, 2), "token_bytes": len(token)}
+    return results
+
+
+
+def check(results: Dict[str, Dict[str, Any]], budgets: Dict[str, Dict[str, float]]) -> List[str]:
+    """
+        Compares the measurements with the budgets.
+
+        Args:
+        - results (Dict[str, Dict[str, Any]]): Measurements by scale.
+        - budgets (Dict[str, Dict[str, float]]): Budgets by target.
+
+        Returns:
+        - Description of every budget exceeded.
+    """
+    violations = []
+
+    for scale, targets in results.items():
+        for target, budget in budgets.items():
+            for metric in ("queries", "ms", "memory_kb"):
+                if metric in budget and targets[target][metric] > budget[metric]:
+                    violations.append(f"{target} at {scale}: {metric} {targets[target][metric]} > {budget[metric]}")
+
+    for target, budget in budgets.items():
+        if "growth" in budget and len(results) > 1:
+            smallest, largest = results[min(results, key=int)], results[max(results, key=int)]
+            growth = largest[target]["ms"] / max(smallest[target]["ms"], 0.001)
+
+            if growth > budget["growth"]:
+                violations.append(f"{target}: latency grew {growth:.1f}x from the smallest to the largest scale > {budget['growth']}x")
+
+    return violations
+
+
+
+def main() -> int:
+    args = parse_arguments()
+    workdir = tempfile.mkdtemp(prefix="gateway-auth-benchmark-")
+    secret_key = Fernet.generate_key().decode()
+    vault = VaultStub(secret_key)
+
+    configure(workdir, args.database_url, secret_key, vault.start())
+
+    budgets = {target: dict(budget) for target, budget in BUDGETS.items()}
+    for target, budget in json.loads(args.budgets or "{}").items():
+        budgets.setdefault(target, {}).update(budget)
+
+    results = {}
+
+    try:
+        for scale in (int(scale) for scale in args.scales.split(",") if scale.strip()):
+            results[str(scale)] = asyncio.run(run_scale(scale, args))
+            print(f"{scale}: {json.dumps(results[str(scale)])}", file=sys.stderr)
+    finally:
+        vault.stop()
+
+    violations = check(results, budgets)
+    output = json.dumps({
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "tenant_endpoints": args.tenant_endpoints,
+            "repeat": args.repeat,
+            "vault_calls": vault.calls,
+        },
+        "budgets": budgets,
+        "scales": results,
+        "violations": violations,
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    for violation in violations:
+        print(f"BUDGET {violation}", file=sys.stderr)
+
+    return 1 if violations else 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+import os
+from typing import Union
+
+
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configure(workdir: str, database_url: Union[str, None], secret_key: str, vault_address: str) -> None:
+    """
+        Exports the settings of the benchmarked gateway. They are read from the environment
+        when the gateway modules are imported, so this must run before importing any of them.
+
+        Args:
+        - workdir (str): Temporary directory of the run.
+        - database_url (str, optional): Database to benchmark against (default: a SQLite file in workdir).
+        - secret_key (str): Fernet key shared with the stub Vault.
+        - vault_address (str): Address of the stub Vault.
+    """
+    os.environ.update({
+        "PROJECT_NAME": "Gateway benchmark",
+        "ALGORITHM": "ES256",
+        "DATABASE_URL": database_url or f"sqlite+aiosqlite:///{os.path.join(workdir, 'gateway.db')}",
+        "DATABASE_ECHO": "False",
+        "SYSTEM_CODE": "SYSTEM_GAT",
+        "VAULT_SECRET_KEY": secret_key,
+        "GRPC_SERVER_ADDRESS": vault_address,
+        "REQUESTS_PER_SECOND": "1000000000",
+        "EXISTS_TABLES": "False",
+        "TRACING_EXPORTER": "none",
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+        "PYTHONPATH": SOURCE_DIR,
+    })
@@ -0,0 +1,149 @@
+import math
+import time
+import asyncio
+import statistics
+from typing import Any, Awaitable, Callable, Dict, List
+
+from httpx import AsyncClient, Limits
+
+
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    """
+        Summarizes the latencies of a scenario.
+
+        Args:
+        - latencies (List[float]): Latency of every successful operation, in seconds.
+        - errors (int): Number of failed operations.
+        - duration (float): Wall time of the scenario, in seconds.
+
+        Returns:
+        - Throughput and latency percentiles in milliseconds.
+    """
+    ordered = sorted(latencies)
+
+    def percentile(rank: float) -> float:
+        if not ordered:
+            return 0.0
+        return round(ordered[max(math.ceil(rank / 100 * len(ordered)) - 1, 0)] * 1000, 3)
+
+    return {
+        "operations": len(ordered),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_ops": round(len(ordered) / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            "p50": percentile(50),
+            "p90": percentile(90),
+            "p99": percentile(99),
+            "mean": round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+            "max": percentile(100),
+        },
+    }
+
+
+
+async def run_http(
+    base_url: str,
+    operation: Callable[[AsyncClient], Awaitable[Any]],
+    requests: int,
+    concurrency: int,
+    warmup: int
+) -> Dict[str, Any]:
+    """
+        Runs an HTTP operation a number of times with a fixed number of concurrent workers.
+        An operation counts as failed when it raises or its response is not 200.
+
+        Args:
+        - base_url (str): URL of the gateway.
+        - operation (Callable): Coroutine function that sends one request with the given client.
+        - requests (int): Number of measured operations.
+        - concurrency (int): Number of concurrent workers.
+        - warmup (int): Number of operations run before measuring.
+
+        Returns:
+        - Summary of the scenario.
+    """
+    limits = Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        for _ in range(warmup):
+            try:
+                await operation(client)
+            except Exception:
+                pass
+
+        latencies: List[float] = []
+        errors = 0
+        remaining = requests
+
+        async def worker() -> None:
+            nonlocal remaining, errors
+
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+
+                try:
+                    response = await operation(client)
+                    ok = response.status_code == 200
+                except Exception:
+                    ok = False
+
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return summarize(latencies, errors, time.perf_counter() - started)
+
+
+
+async def run_websocket(url: str, messages: int, concurrency: int, payload: str) -> Dict[str, Any]:
+    """
+        Opens concurrent WebSocket sessions through the gateway and measures the round
+        trip of every echoed message. A session that cannot be opened counts all its
+        messages as failed.
+
+        Args:
+        - url (str): WebSocket URL of the echo endpoint through the gateway.
+        - messages (int): Number of messages per session.
+        - concurrency (int): Number of concurrent sessions.
+        - payload (str): Message sent.
+
+        Returns:
+        - Summary of the scenario, or the reason it was skipped.
+    """
+    try:
+        import websockets
+    except ImportError:
+        return {"skipped": "the websockets package is not installed"}
+
+    latencies: List[float] = []
+    errors = 0
+
+    async def session() -> None:
+        nonlocal errors
+        done = 0
+
+        try:
+            async with websockets.connect(url, open_timeout=10) as websocket:
+                for _ in range(messages):
+                    started = time.perf_counter()
+                    await websocket.send(payload)
+                    echoed = await asyncio.wait_for(websocket.recv(), 10)
+                    done += 1
+
+                    if echoed == payload:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        errors += 1
+
+        except Exception:
+            errors += messages - done
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
@@ -0,0 +1,77 @@
+from typing import Dict
+
+from core.bases import Base, CONNECTION_DATABASE
+from core.helpers.HasingHelper import HASHING
+from core.databases.Models import Endpoints, MicroServices, Roles, Systems, Users
+
+
+
+SYSTEM_CODE = "BENCH"
+USER_EMAIL = "bench@example.com"
+USER_PASSWORD = "benchmark-password"
+
+
+async def seed(upstream_url: str, extra_endpoints: int = 100) -> Dict[str, str]:
+    """
+        Recreates the schema and seeds the data used by the scenarios: one system, one
+        microservice pointing to the stub upstream, the benchmarked endpoints plus
+        extra_endpoints unrelated ones, and a user with the role required by the
+        authenticated endpoint.
+
+        Args:
+        - upstream_url (str): Base URL of the stub microservice.
+        - extra_endpoints (int): Number of additional endpoints, to keep lookups realistic.
+
+        Returns:
+        - Credentials of the seeded user.
+    """
+    async with CONNECTION_DATABASE.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with CONNECTION_DATABASE.SessionLocal() as session:
+        async with session.begin():
+            system = Systems(
+                system_code=SYSTEM_CODE,
+                name_system="Benchmark",
+                version_system="1.0",
+                system_description="Benchmark system",
+                system_host="127.0.0.1",
+                system_status=True
+            )
+            role = Roles(role_name="bench_role", role_status=True, role_system=system)
+            microservice = MicroServices(
+                microservice_name="bench",
+                microservice_base_url=upstream_url,
+                microservice_status=True,
+                microservice_system=system
+            )
+            session.add_all([system, role, microservice])
+
+            endpoints = [
+                Endpoints(endpoint_name="bench_public", endpoint_url="/bench/public", endpoint_request="GET", endpoint_authenticated=False),
+                Endpoints(endpoint_name="bench_private", endpoint_url="/bench/private", endpoint_request="GET", endpoint_authenticated=True, roles=[role]),
+                Endpoints(endpoint_name="bench_upload", endpoint_url="/bench/upload", endpoint_request="POST", endpoint_authenticated=False),
+                Endpoints(endpoint_name="bench_echo", endpoint_url="/bench/echo", endpoint_request="GET", endpoint_authenticated=False),
+            ]
+            endpoints += [
+                Endpoints(endpoint_name=f"bench_extra_{index}", endpoint_url=f"/bench/extra/{index}", endpoint_request="GET", roles=[role])
+                for index in range(extra_endpoints)
+            ]
+
+            for endpoint in endpoints:
+                endpoint.endpoint_status = True
+                endpoint.endpoint_microservice = microservice
+
+            session.add_all(endpoints)
+            session.add(Users(
+                email=USER_EMAIL,
+                password=await HASHING.hash_password(USER_PASSWORD),
+                is_active=True,
+                roles=[role],
+                systems=[system]
+            ))
+
+    await CONNECTION_DATABASE.close()
+
+    return {"system_code": SYSTEM_CODE, "email": USER_EMAIL, "password": USER_PASSWORD}
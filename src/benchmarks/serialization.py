@@ -0,0 +1,190 @@
+import sys
+import json
+import timeit
+import argparse
+import platform
+import tempfile
+from datetime import date
+from typing import Any, Callable, Dict, List
+
+from cryptography.fernet import Fernet
+
+from benchmarks.environment import configure
+
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.serialization",
+        description="Compares the JSON rendering paths of the responses the gateway builds itself."
+    )
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma separated page sizes of the user listings.")
+    parser.add_argument("--number", type=int, default=0, help="Calls per measurement (default: enough for about 0.2 seconds).")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements of each path, the best one is reported.")
+    parser.add_argument("--output", help="File to write the results to (default: stdout).")
+    return parser.parse_args()
+
+
+
+def payloads(sizes: List[int]) -> Dict[str, Any]:
+    """
+        Builds the benchmarked contents: the login response, pages of the user listing,
+        the 429 body, an error detail and an upstream JSON document re-encoded by the proxy.
+
+        Args:
+        - sizes (List[int]): Page sizes of the user listings.
+
+        Returns:
+        - Contents by name, pydantic models for the routes with a response_model.
+    """
+    from core.bases.BaseSchemas import ResponseSchema, PaginationSchema
+    from core.helpers.PermissionHelper import UserResponseEntity
+    from apps.authentication.login.domain.schemas.LoginSchema import LoginResponseSchema
+
+    def user(index: int) -> UserResponseEntity:
+        return UserResponseEntity(
+            id=index,
+            email=f"user_{index}@example.com",
+            is_active=True,
+            roles=[{"id": role, "role_name": f"role_{role}"} for role in range(3)],
+            groups=[{"id": group, "group_name": f"group_{group}"} for group in range(2)],
+            systems=[{"id": 1, "name_system": "Gateway"}],
+            profile={"id": index, "first_name": "Name", "last_name": "Surname", "document": str(index), "birth_date": date(1990, 1, 1)},
+        )
+
+    contents = {
+        "login": ResponseSchema(
+            status=200,
+            detail="Se inició sesión correctamente.",
+            result=LoginResponseSchema(type="Bearer", token="t" * 1200, refresh_token="r" * 1200)
+        ),
+    }
+
+    for size in sizes:
+        contents[f"users_page_{size}"] = ResponseSchema(
+            status=200,
+            detail="Usuarios obtenidos.",
+            result=PaginationSchema[UserResponseEntity](
+                page_number=1, page_size=size, total_pages=1, total_record=size, content=[user(index) for index in range(size)]
+            )
+        )
+
+    contents["too_many_requests"] = {"code": 429, "message": "Too many requests from 127.0.0.1. Please try again after 42 seconds."}
+    contents["error_detail"] = {"detail": {"code": 403, "message": "No tiene permisos para acceder al sistema, comuníquese con el área de soporte."}}
+    contents["upstream_document"] = [
+        {"id": index, "name": f"item {index}", "price": index * 1.5, "tags": ["a", "b"], "active": index % 2 == 0}
+        for index in range(1000)
+    ]
+    return contents
+
+
+
+def paths(content: Any) -> Dict[str, Callable[[], bytes]]:
+    """
+        Builds the rendering paths of a content.
+
+        - fastapi_default: the route has a response_model and the default response class,
+          FastAPI dumps the model to bytes with pydantic.
+        - json_response: JSONResponse, either as explicit class of a route with a
+          response_model (FastAPI builds the dictionary first) or built by the gateway.
+        - fast_dictionary: FastJSONResponse as the class of the app on a route with a
+          response_model, FastAPI builds the dictionary and orjson dumps it.
+        - fast_model: FastJSONResponse given the model itself, dumped without a dictionary.
+
+        Args:
+        - content (Any): Content to render.
+
+        Returns:
+        - Rendering function of every path that applies to the content.
+    """
+    from pydantic import BaseModel, TypeAdapter
+    from fastapi.responses import JSONResponse
+
+    from core.bases.BaseResponses import FastJSONResponse
+
+    json_response = JSONResponse.__new__(JSONResponse)
+    fast_response = FastJSONResponse.__new__(FastJSONResponse)
+
+    if not isinstance(content, BaseModel):
+        return {
+            "json_response": lambda: json_response.render(content),
+            "fast_dictionary": lambda: fast_response.render(content),
+        }
+
+    adapter = TypeAdapter(type(content))
+
+    return {
+        "fastapi_default": lambda: adapter.dump_json(content, exclude_none=True),
+        "json_response": lambda: json_response.render(adapter.dump_python(content, mode="json", exclude_none=True)),
+        "fast_dictionary": lambda: fast_response.render(adapter.dump_python(content, mode="json", exclude_none=True)),
+        "fast_model": lambda: fast_response.render(content),
+    }
+
+
+
+def measure(render: Callable[[], bytes], number: int, repeat: int) -> Dict[str, Any]:
+    """
+        Measures a rendering function.
+
+        Args:
+        - render (Callable[[], bytes]): Function to measure.
+        - number (int): Calls per measurement, 0 to calibrate it.
+        - repeat (int): Measurements, the best one is reported.
+
+        Returns:
+        - Time per call in microseconds and size of the output.
+    """
+    timer = timeit.Timer(render)
+
+    if not number:
+        number, _ = timer.autorange()
+
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return {"us": round(best * 1e6, 2), "bytes": len(render())}
+
+
+
+def main() -> int:
+    args = parse_arguments()
+    secret_key = Fernet.generate_key().decode()
+
+    # Nothing connects to the database or the Vault, the settings only need to be present
+    configure(tempfile.mkdtemp(prefix="gateway-serialization-benchmark-"), None, secret_key, "127.0.0.1:1")
+
+    from core.bases import BaseResponses
+
+    results = {}
+    mismatches = []
+
+    for name, content in payloads([int(size) for size in args.sizes.split(",") if size.strip()]).items():
+        renders = paths(content)
+        expected = json.loads(next(iter(renders.values()))())
+
+        results[name] = {path: measure(render, args.number, args.repeat) for path, render in renders.items()}
+
+        # The fast paths must produce the same document, byte differences in whitespace are allowed
+        mismatches += [f"{name}: {path}" for path, render in renders.items() if json.loads(render()) != expected]
+        print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+
+    output = json.dumps({
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "orjson": BaseResponses.orjson.__version__ if BaseResponses.orjson else None,
+        },
+        "payloads": results,
+        "mismatches": mismatches,
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    return 1 if mismatches else 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import base64
+import asyncio
+import threading
+from concurrent import futures
+from typing import Dict
+
+import grpc
+import uvicorn
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+
+import core.services.external_services.vault.protobufs.keys_pairs_pb2 as keys_pairs_pb2
+from core.services.external_services.vault.protobufs.keys_pairs_pb2_grpc import (
+    KeysPairsServiceServicer,
+    add_KeysPairsServiceServicer_to_server
+)
+
+
+
+def generate_keys_pairs() -> Dict[str, str]:
+    """
+        Generates the ES256 key pairs served by the Vault stub, encoded the way Vault does.
+
+        Returns:
+        - Dictionary with the base64 encoded PEM keys.
+    """
+    keys = {}
+
+    for name in ("", "refresh_"):
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        private_pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        keys[f"{name}private_key"] = base64.b64encode(private_pem).decode()
+        keys[f"{name}public_key"] = base64.b64encode(public_pem).decode()
+
+    return keys
+
+
+
+class VaultStub(KeysPairsServiceServicer):
+    """
+        Local replacement of the Vault gRPC service. It answers keysPairs with
+        a fixed set of key pairs encrypted with the configured Fernet key.
+    """
+
+
+    def __init__(self, secret_key: str) -> None:
+        """
+            Initializes an instance of VaultStub.
+
+            Args:
+                secret_key (str): Fernet key shared with the gateway (VAULT_SECRET_KEY).
+        """
+        self.encrypted_data = Fernet(secret_key).encrypt(repr(generate_keys_pairs()).encode("utf-8"))
+        self.server = None
+        self.calls = 0
+
+
+    def keysPairs(self, request, context):
+        self.calls += 1
+        return keys_pairs_pb2.EncryptKeysResponse(encrypted_data=self.encrypted_data)
+
+
+    def start(self) -> str:
+        """
+            Starts the gRPC server on a free local port.
+
+            Returns:
+                str: Address of the server.
+        """
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+        add_KeysPairsServiceServicer_to_server(self, self.server)
+        port = self.server.add_insecure_port("127.0.0.1:0")
+        self.server.start()
+        return f"127.0.0.1:{port}"
+
+
+    def stop(self) -> None:
+        """
+            Stops the gRPC server.
+        """
+        if self.server is not None:
+            self.server.stop(grace=None)
+
+
+
+def upstream_app() -> FastAPI:
+    """
+        Builds the stub microservice proxied by the benchmarks.
+
+        Returns:
+        - FastAPI application.
+    """
+    app = FastAPI()
+
+    @app.get("/bench/public")
+    @app.get("/bench/private")
+    async def echo():
+        return {"ok": True}
+
+    @app.post("/bench/upload")
+    async def upload(request: Request):
+        size = 0
+
+        async for chunk in request.stream():
+            size += len(chunk)
+
+        return {"size": size}
+
+    @app.websocket("/bench/echo")
+    async def websocket_echo(websocket: WebSocket):
+        await websocket.accept()
+
+        try:
+            while True:
+                await websocket.send_text(await websocket.receive_text())
+        except WebSocketDisconnect:
+            pass
+
+    return app
+
+
+
+class ServerThread(threading.Thread):
+    """
+        Runs an ASGI application with uvicorn in a background thread.
+    """
+
+
+    def __init__(self, app: FastAPI, port: int) -> None:
+        """
+            Initializes an instance of ServerThread.
+
+            Args:
+                app (FastAPI): Application to serve.
+                port (int): Local port.
+        """
+        super().__init__(daemon=True)
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error", lifespan="off"))
+
+
+    def run(self) -> None:
+        asyncio.run(self.server.serve())
+
+
+    def wait_started(self, timeout: float = 10.0) -> None:
+        """
+            Waits until the server accepts connections.
+
+            Args:
+                timeout (float): Maximum seconds to wait.
+        """
+        for _ in range(int(timeout * 20)):
+            if self.server.started:
+                return
+            threading.Event().wait(0.05)
+
+        raise RuntimeError("The stub server did not start.")
+
+
+    def stop(self) -> None:
+        """
+            Asks the server to exit.
+        """
+        self.server.should_exit = True
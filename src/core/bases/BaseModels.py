@@ -1,20 +1,116 @@
 from datetime import datetime
+from typing import Union
 
-from sqlalchemy import DateTime, Integer
+from sqlalchemy import Column, DateTime, Integer, PrimaryKeyConstraint, Table
 from sqlalchemy.sql import func
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.compiler import compiles
 
 from sqlalchemy.orm import (
     Mapped, 
+    declared_attr,
     mapped_column
 )
 
 from . import Base
+from core.databases.SearchIndexes import search_indexes
+
+
+
+def sqlite_rowid_column(table: Table) -> Union[Column, None]:
+    """
+        Obtains the autoincrement id of a table partitioned on PostgreSQL, whose
+        primary key is (id, partition key). SQLite only autoincrements a single
+        INTEGER PRIMARY KEY, so there the id alone is declared as the key while
+        the mapped key stays composite.
+
+        Args:
+            table (Table): Table being created.
+
+        Returns:
+            Union[Column, None]: Autoincrement id, None if the table is not partitioned.
+    """
+    if not table.dialect_options["postgresql"]["partition_by"]:
+        return None
+
+    return table.autoincrement_column
+
+
+
+@compiles(CreateColumn, "sqlite")
+def sqlite_create_column(create: CreateColumn, compiler, **kwargs) -> str:
+    """
+        Renders the autoincrement id of a partitioned table as the rowid alias on SQLite.
+    """
+    column = create.element
+
+    if column is sqlite_rowid_column(column.table):
+        return f"{compiler.preparer.format_column(column)} INTEGER NOT NULL PRIMARY KEY"
+
+    return compiler.visit_create_column(create, **kwargs)
+
+
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def sqlite_primary_key(constraint: PrimaryKeyConstraint, compiler, **kwargs) -> Union[str, None]:
+    """
+        Omits the composite primary key of a partitioned table on SQLite, the id carries it inline.
+    """
+    if sqlite_rowid_column(constraint.table) is not None:
+        return None
+
+    return compiler.visit_primary_key_constraint(constraint, **kwargs)
 
 
 
 class BaseModel(Base):
     __abstract__ = True
 
+    ## search: columns searched by substring (pg_trgm) and by words (tsvector)
+    __trigram_search__ = ()
+    __fulltext_search__ = ()
+
+    ## partitioning: column used to range partition the table by month on PostgreSQL
+    __partition_by__ = None
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
\ No newline at end of file
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+    @classmethod
+    def table_args(cls, declared: Union[tuple, dict] = ()) -> tuple:
+        """
+            Builds the table arguments of a model: its search indexes and its partitioning,
+            merged with the arguments the model declares itself.
+
+            Args:
+                declared (Union[tuple, dict]): __table_args__ declared by the model.
+
+            Returns:
+                tuple: Table arguments, with the keyword options last.
+        """
+        declared = declared if isinstance(declared, tuple) else (declared,)
+        keywords = bool(declared) and isinstance(declared[-1], dict)
+        options = dict(declared[-1]) if keywords else {}
+        positional = declared[:-1] if keywords else declared
+
+        if cls.__partition_by__:
+            options.setdefault("postgresql_partition_by", f"RANGE ({cls.__partition_by__})")
+
+        indexes = search_indexes(cls.__tablename__, cls.__trigram_search__, cls.__fulltext_search__)
+
+        return (*indexes, *positional, options) if options else (*indexes, *positional)
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        # A model declaring its own __table_args__ hides the directive below, so
+        # its arguments get the search indexes and the partitioning merged in
+        declared = cls.__dict__.get("__table_args__")
+
+        if isinstance(declared, (tuple, dict)) and not cls.__dict__.get("__abstract__", False):
+            cls.__table_args__ = cls.table_args(declared)
+
+        super().__init_subclass__(**kwargs)
+
+    @declared_attr.directive
+    def __table_args__(cls):
+        return cls.table_args()
\ No newline at end of file
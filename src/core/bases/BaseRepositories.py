@@ -1,12 +1,17 @@
+import functools
 import contextlib
-from typing import TypeVar, Type, Dict, Any, List, Union
+from datetime import datetime
+from typing import TypeVar, Type, Dict, Any, List, Tuple, Union, Optional, AsyncIterator
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, or_, exc, func
+from sqlalchemy import select, insert, update, exc, func, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 
-from .BaseSchemas import PaginationSchema
+from .BaseSchemas import PaginationSchema, CursorPaginationSchema
 from core.bases import Base, CONNECTION_DATABASE
+from core.helpers.CursorHelper import CURSOR_HELPER
+from core.helpers.SearchHelper import SEARCH_HELPER
 
 
 
@@ -14,6 +19,26 @@ ModelType = TypeVar("ModelType", bound=Base)
 RequestSchemaType = TypeVar("RequestSchemaType", bound=BaseModel)
 ResponseSchemaType = TypeVar("ResponseSchemaType", bound=BaseModel)
 
+@functools.lru_cache(maxsize=None)
+def list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    """
+        Builds (once per schema) the adapter used to validate lists of objects in a single call.
+    """
+    return TypeAdapter(List[schema])
+
+def row_key(row: Dict[str, Any], fields: List[str]) -> Tuple[Any, ...]:
+    """
+        Builds the unique key of a row from the values of its key fields.
+    """
+    return tuple(row[field] for field in fields)
+
+def object_key(object: Any, fields: List[str]) -> Tuple[Any, ...]:
+    """
+        Builds the unique key of a SQLAlchemy object from the values of its key fields.
+    """
+    return tuple(getattr(object, field) for field in fields)
+
+
 class BaseRepository:
     """
         Base class for performing CRUD (Create, Read, Update, Delete, and List) 
@@ -23,17 +48,37 @@ class BaseRepository:
     model: Type[ModelType] = None
     request_schema: Type[RequestSchemaType] = None
     response_schema: Type[RequestSchemaType] = None
+    replica_max_lag: Optional[float] = None
 
     @contextlib.asynccontextmanager
-    async def get_connection(self) -> AsyncSession:
+    async def get_connection(self, read_only: bool = False) -> AsyncSession:
         """
-            Obtains a connection to the database.
+            Obtains a connection to the database. Read-only connections are routed to a 
+            read replica when one is available, writes always go to the primary. A replica
+            that cannot be connected to is skipped for the primary, one that loses the
+            connection during the read is taken out of rotation for the next reads.
+
+            Args:
+                read_only (bool, optional): True if the connection only performs reads.
         """
-        async with CONNECTION_DATABASE.SessionLocal() as session:
-            try:
-                yield session
-            finally:
-                await session.close()
+        if read_only:
+            session_local, connection = await CONNECTION_DATABASE.open_reader(self.replica_max_lag)
+        else:
+            session_local, connection = CONNECTION_DATABASE.SessionLocal, None
+
+        try:
+            async with session_local(bind=connection) if connection is not None else session_local() as session:
+                try:
+                    yield session
+                except Exception as error:
+                    if connection is not None and CONNECTION_DATABASE.connection_lost(error):
+                        CONNECTION_DATABASE.replica_failed(session_local)
+                    raise
+                finally:
+                    await session.close()
+        finally:
+            if connection is not None:
+                await connection.close()
 
 
     async def create(self, schema: RequestSchemaType, **kwargs: Dict[str, Any]) -> ResponseSchemaType:
@@ -53,9 +98,9 @@ class BaseRepository:
                 session.add(object)
                 await session.commit()
 
-                result = await self.get(id=object.id)
-            
-            return self.response_schema.model_validate(obj=result, from_attributes=True)
+            # Read back from the primary, a replica could not have the new row yet
+            result = await session.execute(select(self.model).filter_by(id=object.id))
+            return self.response_schema.model_validate(obj=result.scalar_one(), from_attributes=True)
 
 
     async def update(self, schema: RequestSchemaType, **kwargs: Dict[int, Any]) -> ResponseSchemaType:
@@ -71,12 +116,10 @@ class BaseRepository:
         """
         async with self.get_connection() as session:
             async with session.begin():
-                statement = update(self.model).filter_by(**kwargs).values(**schema.model_dump(exclude_unset=True))
-                await session.execute(statement)
-    
-                object = await session.execute(select(self.model).filter_by(**kwargs))
+                statement = update(self.model).filter_by(**kwargs).values(**schema.model_dump(exclude_unset=True)).returning(self.model)
+                object = await session.scalars(statement, execution_options={"populate_existing": True})
 
-                return self.response_schema.model_validate(obj=object.scalar_one(), from_attributes=True)
+                return self.response_schema.model_validate(obj=object.one(), from_attributes=True)
 
 
     async def delete(self, **kwargs: Dict[int, Any]) -> None:
@@ -95,6 +138,220 @@ class BaseRepository:
                 await session.commit()
 
 
+    async def validate_rows(
+        self, 
+        schemas: List[Union[RequestSchemaType, Dict[str, Any]]], 
+        **kwargs: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+            Validates a batch of request data and converts it into rows to insert. 
+            Dictionaries are validated against the request schema in a single call.
+
+            Args:
+                schemas: Pydantic objects or dictionaries containing the data.
+                **kwargs: Additional values added to every row.
+
+            Returns:
+                A list of dictionaries ready to be inserted.
+        """
+        if any(isinstance(schema, dict) for schema in schemas):
+            schemas = list_adapter(self.request_schema).validate_python(
+                [schema if isinstance(schema, dict) else schema.model_dump(exclude_unset=True) for schema in schemas]
+            )
+
+        return [{**schema.model_dump(exclude_unset=True), **kwargs} for schema in schemas]
+
+
+    def validate_many(self, objects: List[ModelType]) -> List[ResponseSchemaType]:
+        """
+            Validates a list of SQLAlchemy objects against the response schema in a single call.
+
+            Args:
+                objects: SQLAlchemy objects.
+
+            Returns:
+                A list of Pydantic objects.
+        """
+        return list_adapter(self.response_schema).validate_python(objects, from_attributes=True)
+
+
+    async def bulk_create(
+        self, 
+        schemas: List[Union[RequestSchemaType, Dict[str, Any]]], 
+        **kwargs: Dict[str, Any]
+    ) -> List[ResponseSchemaType]:
+        """
+            Creates many objects in the database with multi-row INSERT ... RETURNING 
+            statements in a single transaction.
+
+            Args:
+                schemas: Pydantic objects or dictionaries containing the data to insert.
+                **kwargs: Additional arguments added to every object.
+
+            Returns:
+                A list of Pydantic objects created from the inserted rows, in the same order.
+        """
+        rows = await self.validate_rows(schemas, **kwargs)
+
+        if not rows:
+            return []
+
+        async with self.get_connection() as session:
+            async with session.begin():
+                objects = await session.scalars(insert(self.model).returning(self.model, sort_by_parameter_order=True), rows)
+                return self.validate_many(objects.all())
+
+
+    async def bulk_upsert(
+        self, 
+        schemas: List[Union[RequestSchemaType, Dict[str, Any]]], 
+        index_elements: List[str],
+        update_fields: Union[List[str], None] = None,
+        **kwargs: Dict[str, Any]
+    ) -> List[ResponseSchemaType]:
+        """
+            Inserts many objects, updating the existing ones on conflict, with 
+            INSERT ... ON CONFLICT DO UPDATE ... RETURNING statements. Databases 
+            without ON CONFLICT select the existing objects and insert or update 
+            them in the same transaction. Objects sharing the same key are written 
+            once, with the values of the last one.
+
+            Args:
+                schemas: Pydantic objects or dictionaries containing the data to insert.
+                index_elements: Field names of the unique constraint that detects the conflict.
+                update_fields: Field names updated on conflict (default is every provided field except the index elements).
+                **kwargs: Additional arguments added to every object.
+
+            Returns:
+                A list of Pydantic objects created from the inserted or updated rows, in the 
+                same order, objects sharing a key get the same row.
+
+            Raises:
+                ValueError: If the objects do not provide the same fields, or they lack a field 
+                of the index elements or of the update fields.
+        """
+        rows = await self.validate_rows(schemas, **kwargs)
+
+        if not rows:
+            return []
+
+        fields = set(rows[0])
+        if any(set(row) != fields for row in rows):
+            raise ValueError("Upsert requires every object to provide the same fields.")
+
+        if update_fields is None:
+            update_fields = [field for field in rows[0] if field not in index_elements]
+
+        missing = [field for field in [*index_elements, *update_fields] if field not in fields]
+        if missing:
+            raise ValueError(f"Upsert requires every object to provide the fields [{', '.join(missing)}].")
+
+        # A statement cannot update the same row twice, the last object of each key wins
+        unique_rows = list({row_key(row, index_elements): row for row in rows}.values())
+
+        async with self.get_connection() as session:
+            async with session.begin():
+                dialect = session.bind.dialect.name
+
+                if dialect == "postgresql":
+                    statement = postgresql.insert(self.model)
+                elif dialect == "sqlite":
+                    statement = sqlite.insert(self.model)
+                else:
+                    objects = await self.upsert_rows(session, unique_rows, index_elements, update_fields)
+                    return self.validate_many([objects[row_key(row, index_elements)] for row in rows])
+
+                values = {field: statement.excluded[field] for field in update_fields}
+                if "updated_at" in self.model.__table__.c:
+                    values["updated_at"] = func.now()
+
+                statement = statement.on_conflict_do_update(index_elements=index_elements, set_=values)
+                objects = await session.scalars(
+                    statement.returning(self.model, sort_by_parameter_order=True), 
+                    unique_rows,
+                    execution_options={"populate_existing": True}
+                )
+                objects = {object_key(object, index_elements): object for object in objects.all()}
+                return self.validate_many([objects[row_key(row, index_elements)] for row in rows])
+
+
+    async def upsert_rows(
+        self, 
+        session: AsyncSession, 
+        rows: List[Dict[str, Any]], 
+        index_elements: List[str], 
+        update_fields: List[str]
+    ) -> Dict[Tuple[Any, ...], ModelType]:
+        """
+            Upserts rows on databases without ON CONFLICT: the existing objects are 
+            selected by their unique key, then the missing ones are inserted and the 
+            others updated, within the transaction of the session.
+
+            Args:
+                session: Session with an open transaction.
+                rows: Validated rows to upsert, one per key.
+                index_elements: Field names of the unique constraint that detects the conflict.
+                update_fields: Field names updated on the existing objects.
+
+            Returns:
+                The inserted or updated SQLAlchemy objects by key.
+        """
+        columns = [getattr(self.model, field) for field in index_elements]
+        keys = [row_key(row, index_elements) for row in rows]
+        condition = columns[0].in_([key[0] for key in keys]) if len(columns) == 1 else tuple_(*columns).in_(keys)
+
+        existing = await session.scalars(select(self.model).where(condition))
+        objects = {object_key(object, index_elements): object for object in existing}
+
+        for key, row in zip(keys, rows):
+            object = objects.get(key)
+
+            if object is None:
+                session.add(self.model(**row))
+            else:
+                for field in update_fields:
+                    setattr(object, field, row[field])
+
+        await session.flush()
+
+        refreshed = await session.scalars(
+            select(self.model).where(condition), 
+            execution_options={"populate_existing": True}
+        )
+        return {object_key(object, index_elements): object for object in refreshed}
+
+
+    async def bulk_update(
+        self, 
+        schema: RequestSchemaType, 
+        keys: List[Any], 
+        key: str = "id"
+    ) -> List[ResponseSchemaType]:
+        """
+            Applies the same update to every object whose key is in the list, 
+            with a single UPDATE ... RETURNING statement.
+
+            Args:
+                schema: A Pydantic object containing the data to update.
+                keys: Values of the key of the objects to update.
+                key: Field name used to match the objects (default is id).
+
+            Returns:
+                A list of updated Pydantic objects.
+        """
+        if not keys:
+            return []
+
+        async with self.get_connection() as session:
+            async with session.begin():
+                statement = update(self.model).where(
+                    getattr(self.model, key).in_(keys)
+                ).values(**schema.model_dump(exclude_unset=True)).returning(self.model)
+
+                objects = await session.scalars(statement, execution_options={"populate_existing": True})
+                return self.validate_many(objects.all())
+
+
     async def filter(self, **kwargs: Dict[int, Any]) -> List[ResponseSchemaType]:
         """
             Filters objects in the database based on certain criteria.
@@ -105,13 +362,68 @@ class BaseRepository:
             Returns:
                 A list of Pydantic objects that meet the filtering criteria.
         """
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
                 statement = select(self.model).filter_by(**kwargs)
                 result = await session.execute(statement)
                 return [self.response_schema.model_validate(obj=object, from_attributes=True) for object in result.scalars()]
 
 
+    async def stream_filter(
+        self, 
+        chunk_size: int = 1000, 
+        created_from: Union[datetime, None] = None, 
+        created_to: Union[datetime, None] = None, 
+        **kwargs: Dict[int, Any]
+    ) -> AsyncIterator[List[ResponseSchemaType]]:
+        """
+            Filters objects in the database like filter, but reads them through a 
+            server-side cursor and yields them in chunks, so the whole result set 
+            is never held in memory.
+
+            Args:
+                chunk_size: Number of objects fetched and yielded at a time.
+                created_from: Start of the creation period, inclusive (optional).
+                created_to: End of the creation period, exclusive (optional).
+                **kwargs: Arguments to filter the objects.
+
+            Yields:
+                Lists of at most chunk_size Pydantic objects that meet the filtering criteria.
+        """
+        async with self.get_connection(read_only=True) as session:
+            async with session.begin():
+                statement = self.period(select(self.model).filter_by(**kwargs), created_from, created_to)
+                statement = statement.execution_options(yield_per=chunk_size)
+                result = await session.stream_scalars(statement)
+
+                async for objects in result.partitions(chunk_size):
+                    yield self.validate_many(objects)
+
+
+    async def stream_ndjson(
+        self, 
+        chunk_size: int = 1000, 
+        created_from: Union[datetime, None] = None, 
+        created_to: Union[datetime, None] = None, 
+        **kwargs: Dict[int, Any]
+    ) -> AsyncIterator[bytes]:
+        """
+            Streams the filtered objects as newline delimited JSON, to be used as the 
+            body of a StreamingResponse with the application/x-ndjson media type.
+
+            Args:
+                chunk_size: Number of objects fetched and encoded at a time.
+                created_from: Start of the creation period, inclusive (optional).
+                created_to: End of the creation period, exclusive (optional).
+                **kwargs: Arguments to filter the objects.
+
+            Yields:
+                One NDJSON encoded chunk per fetched chunk of objects.
+        """
+        async for objects in self.stream_filter(chunk_size, created_from, created_to, **kwargs):
+            yield b"".join(object.model_dump_json().encode("utf-8") + b"\n" for object in objects)
+
+
     async def get(self, **kwargs: Dict[int, Any]) -> ResponseSchemaType:
         """
             Gets an object from the database based on certain criteria.
@@ -122,7 +434,7 @@ class BaseRepository:
             Returns:
                 A Pydantic object found in the database.
         """
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
                 statement = select(self.model).filter_by(**kwargs)
             
@@ -135,6 +447,35 @@ class BaseRepository:
                     return None
 
 
+    def period(
+        self, 
+        query, 
+        created_from: Union[datetime, None] = None, 
+        created_to: Union[datetime, None] = None
+    ):
+        """
+            Restricts a query to a creation period. On partitioned models the filter is
+            applied to the partition key, so PostgreSQL only scans the partitions of the period.
+
+            Args:
+                query: The SQL query to restrict.
+                created_from: Start of the period, inclusive (optional).
+                created_to: End of the period, exclusive (optional).
+
+            Returns:
+                The restricted query.
+        """
+        column = getattr(self.model, self.model.__partition_by__ or "created_at")
+
+        if created_from is not None:
+            query = query.filter(column >= created_from)
+
+        if created_to is not None:
+            query = query.filter(column < created_to)
+
+        return query
+
+
     async def count_records(self, session: CONNECTION_DATABASE, query) -> int:
         """
             Counts the number of records in a query.
@@ -156,6 +497,8 @@ class BaseRepository:
         page_size: int,
         search: Union[str, None] = None,
         search_fields: List[str] = [],
+        created_from: Union[datetime, None] = None,
+        created_to: Union[datetime, None] = None,
     ) -> PaginationSchema:
         """
             Lists objects from the database with pagination and search options.
@@ -165,21 +508,22 @@ class BaseRepository:
                 page_size: Page size.
                 search: Search term (optional).
                 search_fields: List of field names where the search will be performed (optional).
+                created_from: Start of the creation period, inclusive (optional).
+                created_to: End of the creation period, exclusive (optional).
 
             Returns:
                 A dictionary with pagination information and page content.
         """
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             # Create a single transaction for all operations
             async with session.begin():
-                query = select(self.model)
+                query = self.period(select(self.model), created_from, created_to)
+                rank = None
 
                 if search and search_fields:
-                    # Apply search on specified fields
-                    filters = []
-                    for field in search_fields:
-                        filters.append(getattr(self.model, field).ilike(f"%{search}%"))
-                    query = query.filter(or_(*filters))
+                    # Apply search on specified fields, backed by the search indexes
+                    filters, rank = SEARCH_HELPER.build(self.model, search, search_fields, session.bind.dialect.name)
+                    query = query.filter(filters)
 
                 # Calculate pagination limits
                 total_record = await self.count_records(session, query)
@@ -187,6 +531,11 @@ class BaseRepository:
 
                 # Apply pagination
                 offset = max((page_number - 1), 0) * page_size
+
+                if rank is not None:
+                    # Most relevant results first
+                    query = query.order_by(rank.desc(), self.model.id)
+
                 query = query.limit(page_size).offset(offset)
 
                 # Execute the query and get results
@@ -199,4 +548,140 @@ class BaseRepository:
                     total_pages=total_pages,
                     total_record=total_record,
                     content=content
-                )
\ No newline at end of file
+                )
+
+
+    async def estimate_records(self, session: AsyncSession) -> Union[int, None]:
+        """
+            Estimates the number of records of the model table from the planner 
+            statistics instead of counting them.
+
+            Args:
+                session: The SQLAlchemy session in which the query will be executed.
+
+            Returns:
+                The estimated number of records, or None if no statistics are available.
+        """
+        if session.bind.dialect.name != "postgresql":
+            return None
+
+        # A partitioned table has no statistics of its own, its partitions are added up
+        result = await session.execute(
+            text(
+                "SELECT CASE WHEN parent.relkind = 'p' THEN ("
+                "SELECT SUM(GREATEST(child.reltuples, 0)) FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = parent.oid"
+                ") ELSE parent.reltuples END::bigint "
+                "FROM pg_class parent WHERE parent.oid = CAST(:table AS regclass)"
+            ),
+            {"table": self.model.__tablename__}
+        )
+        estimated = result.scalar()
+
+        return int(estimated) if estimated is not None and estimated >= 0 else None
+
+
+    def sort_keys(self, order_by: str) -> List[Any]:
+        """
+            Builds the keyset used to sort and paginate by cursor. The id is added 
+            as a tiebreaker so the keyset is always unique.
+
+            Args:
+                order_by: Field name of an indexed column.
+
+            Returns:
+                The list of columns of the keyset.
+
+            Raises:
+                ValueError: If the column is not indexed.
+        """
+        table = self.model.__table__
+        column = table.c[order_by]
+        indexed = column.primary_key or column.index or column.unique or any(
+            list(index.columns)[0] is column for index in table.indexes if len(index.columns)
+        )
+
+        if not indexed:
+            raise ValueError(f"Cursor pagination requires an indexed sort key, [{order_by}] is not indexed.")
+
+        if column is table.c.id:
+            return [getattr(self.model, order_by)]
+
+        return [getattr(self.model, order_by), self.model.id]
+
+
+    async def list_cursor(
+        self,
+        page_size: int,
+        cursor: Union[str, None] = None,
+        search: Union[str, None] = None,
+        search_fields: List[str] = [],
+        order_by: str = "id",
+        descending: bool = False,
+        total: Union[str, None] = None,
+        created_from: Union[datetime, None] = None,
+        created_to: Union[datetime, None] = None,
+    ) -> CursorPaginationSchema:
+        """
+            Lists objects from the database with keyset (cursor) pagination. Unlike list, 
+            the cost of a page does not depend on how deep the page is.
+
+            Args:
+                page_size: Page size.
+                cursor: Cursor returned as next_cursor by the previous page (optional).
+                search: Search term (optional).
+                search_fields: List of field names where the search will be performed (optional).
+                order_by: Field name of the indexed column used to sort (default is id).
+                descending: True to sort from the highest to the lowest value.
+                total: None to skip the total, "exact" to count it or "estimated" to read it from the planner statistics.
+                created_from: Start of the creation period, inclusive (optional).
+                created_to: End of the creation period, exclusive (optional).
+
+            Returns:
+                A dictionary with the cursor of the next page and the page content.
+        """
+        keys = self.sort_keys(order_by)
+        sort = f"{order_by}:{'desc' if descending else 'asc'}"
+
+        async with self.get_connection(read_only=True) as session:
+            async with session.begin():
+                query = self.period(select(self.model), created_from, created_to)
+
+                if search and search_fields:
+                    # Apply search on specified fields, the keyset order takes precedence over the rank
+                    filters, _ = SEARCH_HELPER.build(self.model, search, search_fields, session.bind.dialect.name)
+                    query = query.filter(filters)
+
+                total_record = None
+                total_estimated = False
+
+                if total == "exact":
+                    total_record = await self.count_records(session, query)
+                elif total == "estimated" and not (search or created_from or created_to):
+                    total_record = await self.estimate_records(session)
+                    total_estimated = total_record is not None
+
+                if cursor:
+                    values = CURSOR_HELPER.decode(cursor, [key.type.python_type for key in keys], sort)
+                    keyset, position = (keys[0], values[0]) if len(keys) == 1 else (tuple_(*keys), tuple_(*values))
+                    query = query.filter(keyset < position if descending else keyset > position)
+
+                # Fetch one extra row to know if there is a next page
+                query = query.order_by(*[key.desc() if descending else key.asc() for key in keys]).limit(page_size + 1)
+
+                result = await session.execute(query)
+                objects = result.scalars().all()
+                next_cursor = None
+
+                if len(objects) > page_size:
+                    objects = objects[:page_size]
+                    next_cursor = CURSOR_HELPER.encode([getattr(objects[-1], key.key) for key in keys], sort)
+
+                return CursorPaginationSchema(
+                    page_size=page_size,
+                    next_cursor=next_cursor,
+                    total_record=total_record,
+                    total_estimated=total_estimated,
+                    content=[self.response_schema.model_validate(obj=object, from_attributes=True) for object in objects]
+                )
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Tuple, Type, Union
+
+import httpx
+from pydantic import BaseModel
+from fastapi import Request, Response
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.utils import is_body_allowed_for_status_code
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from starlette.exceptions import HTTPException
+from starlette.types import Receive, Scope, Send
+
+from settings import SETTINGS
+from core.helpers.MetricsHelper import METRICS_HELPER
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+# Ends of a Server-Sent Event, a heartbeat is only written between events
+EVENT_BOUNDARIES = (b"\n\n", b"\r\n\r\n", b"\r\r")
+
+
+
+def default(value: Any) -> Any:
+    """
+        Converts the values orjson does not serialize natively.
+
+        Args:
+        - value (Any): Value to convert.
+
+        Returns:
+        - A value orjson can serialize.
+    """
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+
+    return jsonable_encoder(value)
+
+
+
+class FastJSONResponse(JSONResponse):
+    """
+        JSON response rendered straight to bytes. Pydantic models are dumped by
+        pydantic-core without building an intermediate dictionary and any other
+        content is dumped by orjson. Without orjson, or for content orjson rejects
+        such as integers beyond 64 bits, it renders like JSONResponse.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode("utf-8")
+
+        if orjson is None:
+            return super().render(content)
+
+        try:
+            return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            return super().render(jsonable_encoder(content))
+
+
+
+class StreamingProxyResponse(Response):
+    """
+        Response that relays the body of a streaming microservice response chunk by
+        chunk, as soon as each one arrives, so every Server-Sent Event reaches the client
+        without waiting for the next one. An event stream that stays silent for the
+        heartbeat interval gets an SSE comment between two events, which keeps proxies
+        and load balancers from closing it as idle. When the client disconnects the
+        upstream response is closed, so the microservice sees the disconnect too.
+    """
+
+
+    def __init__(
+        self,
+        upstream: httpx.Response,
+        close: Callable[[], Awaitable[None]],
+        headers: List[Tuple[str, str]],
+        heartbeat: float = 0.0
+    ) -> None:
+        """
+            Initializes an instance of StreamingProxyResponse.
+
+            Args:
+                upstream (httpx.Response): Microservice response, with its body not read yet.
+                close (Callable): Closes the client of the microservice response.
+                headers (List[Tuple[str, str]]): Headers for the client, without the hop-by-hop ones.
+                heartbeat (float): Seconds of silence before a heartbeat is written, 0 disables them.
+        """
+        self.upstream = upstream
+        self.close = close
+        self.status_code = upstream.status_code
+        self.background = None
+
+        media_type = upstream.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+
+        # A comment cannot be added to a compressed stream
+        self.heartbeat = heartbeat if media_type == "text/event-stream" and "content-encoding" not in upstream.headers else 0.0
+
+        self.raw_headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+        # Disables the response buffering of nginx, which would hold the events back
+        self.raw_headers.append((b"x-accel-buffering", b"no"))
+
+
+    async def relay(self, send: Send) -> None:
+        """
+            Sends the chunks of the microservice as they arrive, and the heartbeats.
+
+            Args:
+                send (Send): ASGI send function.
+        """
+        chunks = self.upstream.aiter_raw().__aiter__()
+        pending = asyncio.ensure_future(chunks.__anext__())
+        boundary = True
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({pending}, timeout=self.heartbeat or None)
+
+                if not done:
+                    if boundary:
+                        await send({"type": "http.response.body", "body": b": heartbeat\n\n", "more_body": True})
+                    continue
+
+                try:
+                    chunk = pending.result()
+                except StopAsyncIteration:
+                    return
+                except httpx.HTTPError as error:
+                    LOGGER.warning(f"Stream from {self.upstream.request.url} interrupted: {error!r}")
+                    return
+
+                boundary = chunk.endswith(EVENT_BOUNDARIES)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                pending = asyncio.ensure_future(chunks.__anext__())
+
+        finally:
+            pending.cancel()
+
+
+    @staticmethod
+    async def wait_disconnect(receive: Receive) -> None:
+        """
+            Waits until the client disconnects.
+
+            Args:
+                receive (Receive): ASGI receive function.
+        """
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        METRICS_HELPER.streams.inc()
+        relay = disconnect = None
+
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+            relay = asyncio.create_task(self.relay(send))
+            disconnect = asyncio.create_task(self.wait_disconnect(receive))
+            done, _ = await asyncio.wait({relay, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+
+            if relay in done:
+                relay.result()
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        except OSError:
+            # The client disconnected while a chunk was being sent
+            pass
+
+        finally:
+            for task in (relay, disconnect):
+                if task is not None:
+                    task.cancel()
+
+            await asyncio.gather(*(task for task in (relay, disconnect) if task is not None), return_exceptions=True)
+            await self.upstream.aclose()
+            await self.close()
+            METRICS_HELPER.streams.dec()
+
+
+
+DEFAULT_RESPONSE_CLASS: Type[JSONResponse] = FastJSONResponse if SETTINGS.JSON_RESPONSE_FAST else JSONResponse
+
+# Routes with a response_model are dumped to bytes by pydantic only while the response
+# class of the app is the placeholder, an explicit class makes FastAPI build the
+# dictionary first. That is why FastJSONResponse is opt-in and JSONResponse is never
+# passed explicitly.
+APP_RESPONSE_CLASS: Union[Type[JSONResponse], DefaultPlaceholder] = (
+    FastJSONResponse if SETTINGS.JSON_RESPONSE_FAST else Default(JSONResponse)
+)
+
+
+async def http_exception_handler(request: Request, exception: HTTPException) -> Response:
+    """
+        Same as the FastAPI handler of HTTPException, rendered with the default response class.
+    """
+    headers = getattr(exception, "headers", None)
+
+    if not is_body_allowed_for_status_code(exception.status_code):
+        return Response(status_code=exception.status_code, headers=headers)
+
+    return DEFAULT_RESPONSE_CLASS({"detail": exception.detail}, status_code=exception.status_code, headers=headers)
+
+
+async def validation_exception_handler(request: Request, exception: RequestValidationError) -> Response:
+    """
+        Same as the FastAPI handler of RequestValidationError, rendered with the default response class.
+    """
+    return DEFAULT_RESPONSE_CLASS({"detail": jsonable_encoder(exception.errors())}, status_code=422)
@@ -22,4 +22,12 @@ class PaginationSchema(BaseModel, Generic[T]):
     page_size: int
     total_pages: int
     total_record: int
-    content: List[T]
\ No newline at end of file
+    content: List[T]
+
+
+class CursorPaginationSchema(BaseModel, Generic[T]):
+    page_size: int
+    next_cursor: Optional[str] = None
+    total_record: Optional[int] = None
+    total_estimated: bool = False
+    content: List[T]
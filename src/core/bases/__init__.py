@@ -1,5 +1,12 @@
+import time
+import asyncio
+import itertools
+from typing import List, Optional, Tuple, Union
+
+from decouple import Csv
+from sqlalchemy import exc, text
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncConnection, AsyncSession, AsyncEngine
 
 from settings import SETTINGS
 
@@ -12,6 +19,97 @@ class Base(DeclarativeBase):
     pass
 
 
+class DatabaseReplica:
+    """
+        Read replica of the primary database together with its health state.
+
+        Attributes:
+            url (str): The URL of the replica.
+            engine (AsyncEngine): The SQLAlchemy engine for the replica.
+            SessionLocal (sessionmaker): The SQLAlchemy session generator for the replica.
+            healthy (bool): Result of the last health check.
+            lag (float): Replication lag in seconds measured on the last health check.
+            checked_at (float): Monotonic time of the last health check.
+    """
+
+    LAG_STATEMENT = text(
+        "SELECT CASE "
+        "WHEN NOT pg_is_in_recovery() THEN 0 "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    )
+
+
+    def __init__(self, url: str) -> None:
+        """
+            Initializes an instance of DatabaseReplica.
+
+            Args:
+                url (str): The replica database URL.
+        """
+        self.url = url
+        self.engine: AsyncEngine = create_async_engine(url, pool_pre_ping=True)
+        self.SessionLocal = sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False
+        )
+        self.healthy: bool = True
+        self.lag: float = 0.0
+        self.checked_at: float = float("-inf")
+        self.lock = asyncio.Lock()
+
+
+    async def check(self) -> None:
+        """
+            Measures the replication lag of the replica and updates its health state.
+            Any error while connecting marks the replica as unhealthy until the next check.
+        """
+        try:
+            async with self.engine.connect() as connection:
+                if self.engine.dialect.name == "postgresql":
+                    self.lag = float((await connection.execute(self.LAG_STATEMENT)).scalar() or 0)
+                else:
+                    await connection.execute(text("SELECT 1"))
+                    self.lag = 0.0
+            self.healthy = True
+
+        except Exception:
+            self.healthy = False
+
+        self.checked_at = time.monotonic()
+
+
+    async def available(self, max_lag: float) -> bool:
+        """
+            Checks if the replica can serve reads with the given staleness tolerance.
+            The health check is repeated at most once per configured interval.
+
+            Args:
+                max_lag (float): Maximum replication lag tolerated in seconds.
+
+            Returns:
+                bool: True if the replica is healthy and within the tolerated lag.
+        """
+        if time.monotonic() - self.checked_at >= SETTINGS.DATABASE_REPLICA_CHECK_INTERVAL:
+            async with self.lock:
+                if time.monotonic() - self.checked_at >= SETTINGS.DATABASE_REPLICA_CHECK_INTERVAL:
+                    await self.check()
+
+        return self.healthy and self.lag <= max_lag
+
+
+    def mark_unhealthy(self) -> None:
+        """
+            Takes the replica out of rotation until the next health check.
+        """
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+
 class AsyncDatabaseSession:
     """
         Class providing an interface for working with asynchronous SQLAlchemy database sessions.
@@ -20,18 +118,25 @@ class AsyncDatabaseSession:
             url (str): The URL of the database to connect to.
             engine (AsyncEngine): The SQLAlchemy engine for the database.
             SessionLocal (sessionmaker): The SQLAlchemy session generator.
+            replicas (List[DatabaseReplica]): Read replicas used for read-only operations.
             session (AsyncSession): The active session.
     """
 
 
-    def __init__(self, url: str = SETTINGS.DATABASE_URL) -> None:
+    def __init__(
+        self, 
+        url: str = SETTINGS.DATABASE_URL, 
+        replica_urls: str = SETTINGS.DATABASE_REPLICA_URLS
+    ) -> None:
         """
             Initializes an instance of AsyncDatabaseSession.
 
             Args:
                 url (str, optional): The database URL (default is the configuration URL).
+                replica_urls (str, optional): Comma separated read replica URLs (default is the configuration URLs).
         """
-        self.engine: AsyncEngine = create_async_engine(url, echo=True)
+        # SQL echo goes through the sqlalchemy.engine logger, see core.utils.Logger
+        self.engine: AsyncEngine = create_async_engine(url)
         self.SessionLocal = sessionmaker(
             bind=self.engine,
             class_=AsyncSession,
@@ -39,6 +144,87 @@ class AsyncDatabaseSession:
             autoflush=False,
             expire_on_commit=False
         )
+        self.replicas: List[DatabaseReplica] = [DatabaseReplica(replica_url) for replica_url in Csv()(replica_urls)]
+        self._replica_cycle = itertools.cycle(self.replicas)
+
+
+    async def reader(self, max_lag: Optional[float] = None) -> sessionmaker:
+        """
+            Selects the session generator for a read-only operation. Replicas are used
+            in round robin order and the primary is used when no replica is available
+            within the tolerated replication lag.
+
+            Args:
+                max_lag (float, optional): Maximum replication lag tolerated in seconds (default is the configuration value).
+
+            Returns:
+                sessionmaker: The session generator of a replica or of the primary.
+        """
+        if max_lag is None:
+            max_lag = SETTINGS.DATABASE_REPLICA_MAX_LAG
+
+        for _ in range(len(self.replicas)):
+            replica = next(self._replica_cycle)
+            if await replica.available(max_lag):
+                return replica.SessionLocal
+
+        return self.SessionLocal
+
+
+    async def open_reader(self, max_lag: Optional[float] = None) -> Tuple[sessionmaker, Union[AsyncConnection, None]]:
+        """
+            Selects the session generator for a read-only operation and opens the connection
+            to the replica up front. A replica that cannot be reached is taken out of rotation
+            and the read goes to the primary instead.
+
+            Args:
+                max_lag (float, optional): Maximum replication lag tolerated in seconds (default is the configuration value).
+
+            Returns:
+                Tuple[sessionmaker, AsyncConnection]: The session generator and the open connection
+                    to the replica, None when the read goes to the primary.
+        """
+        session_local = await self.reader(max_lag)
+        replica = next((replica for replica in self.replicas if replica.SessionLocal is session_local), None)
+
+        if replica is None:
+            return session_local, None
+
+        try:
+            return session_local, await replica.engine.connect()
+        except (exc.DBAPIError, OSError):
+            replica.mark_unhealthy()
+            return self.SessionLocal, None
+
+
+    @staticmethod
+    def connection_lost(error: BaseException) -> bool:
+        """
+            Checks whether an error means the connection to the database was lost. Errors of
+            the statement itself, like a statement timeout, leave the connection usable.
+
+            Args:
+                error (BaseException): The error raised while using a session.
+
+            Returns:
+                bool: True if the connection was lost.
+        """
+        if isinstance(error, exc.DBAPIError):
+            return error.connection_invalidated
+
+        return isinstance(error, OSError)
+
+
+    def replica_failed(self, session_local: sessionmaker) -> None:
+        """
+            Takes the replica owning the session generator out of rotation after a connection error.
+
+            Args:
+                session_local (sessionmaker): The session generator returned by reader.
+        """
+        for replica in self.replicas:
+            if replica.SessionLocal is session_local:
+                replica.mark_unhealthy()
 
 
     async def create_all(self) -> None:
@@ -55,6 +241,9 @@ class AsyncDatabaseSession:
         """
         await self.engine.dispose()
 
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
 
     async def __aenter__(self) -> AsyncSession:
         """
@@ -4,6 +4,14 @@ from fastapi import FastAPI
 
 from settings import SETTINGS
 from core.bases import CONNECTION_DATABASE
+from core.helpers.AuditHelper import AUDIT_HELPER
+from core.helpers.MetricsHelper import METRICS_HELPER
+from core.helpers.TracingHelper import TRACING_HELPER
+from core.helpers.WatchdogHelper import WATCHDOG_HELPER
+from core.helpers.PartitionHelper import PARTITION_HELPER
+from core.helpers.UpstreamHelper import UPSTREAM_HELPER
+from core.helpers.WebsocketSessionHelper import WS_SESSIONS
+from core.helpers.WebsocketMultiplexHelper import WS_MULTIPLEX
 
 
 
@@ -22,6 +30,25 @@ async def lifespan(app: FastAPI) -> None:
     if SETTINGS.EXISTS_TABLES:
         await CONNECTION_DATABASE.create_all()
 
+    await PARTITION_HELPER.start()
+    await AUDIT_HELPER.start()
+    await METRICS_HELPER.start()
+    await TRACING_HELPER.start()
+    await WATCHDOG_HELPER.start()
+    await WS_SESSIONS.start()
+
     yield
 
-    await CONNECTION_DATABASE.close()
\ No newline at end of file
+    # First, the sessions still relay messages while they drain
+    await WS_SESSIONS.stop()
+    await WS_MULTIPLEX.stop()
+    await UPSTREAM_HELPER.stop()
+
+    await TRACING_HELPER.stop()
+    await METRICS_HELPER.stop()
+    await AUDIT_HELPER.stop()
+    await PARTITION_HELPER.stop()
+    await CONNECTION_DATABASE.close()
+
+    # Last, so the shutdown of the other helpers is also watched and completes in strict mode
+    await WATCHDOG_HELPER.stop()
\ No newline at end of file
@@ -1,5 +1,5 @@
 from typing import List
-from datetime import date
+from datetime import date, datetime
 
 from sqlalchemy.orm import (
     relationship, 
@@ -13,10 +13,12 @@ from sqlalchemy import (
     Integer, 
     String, 
     Date,
+    DateTime,
     Boolean, 
     ForeignKey, 
     JSON
 )
+from sqlalchemy.sql import func
 
 from core.bases.BaseModels import BaseModel
 
@@ -25,8 +27,8 @@ from core.bases.BaseModels import BaseModel
 groups_roles = Table(
     "groups_roles",
     BaseModel.metadata,
-    Column("group_id", ForeignKey("groups.id")),
-    Column("role_id", ForeignKey("roles.id")),
+    Column("group_id", ForeignKey("groups.id"), index=True),
+    Column("role_id", ForeignKey("roles.id"), index=True),
 )
 
 
@@ -34,8 +36,8 @@ groups_roles = Table(
 endpoints_roles = Table(
     "endpoints_roles",
     BaseModel.metadata,
-    Column("endpoint_id", ForeignKey("endpoints.id")),
-    Column("role_id", ForeignKey("roles.id")),
+    Column("endpoint_id", ForeignKey("endpoints.id"), index=True),
+    Column("role_id", ForeignKey("roles.id"), index=True),
 )
 
 
@@ -43,8 +45,8 @@ endpoints_roles = Table(
 endpoints_groups = Table(
     "endpoints_groups",
     BaseModel.metadata,
-    Column("endpoint_id", ForeignKey("endpoints.id")),
-    Column("group_id", ForeignKey("groups.id")),
+    Column("endpoint_id", ForeignKey("endpoints.id"), index=True),
+    Column("group_id", ForeignKey("groups.id"), index=True),
 )
 
 
@@ -52,8 +54,8 @@ endpoints_groups = Table(
 users_roles = Table(
     "users_roles",
     BaseModel.metadata,
-    Column("user_id", ForeignKey("users.id")),
-    Column("role_id", ForeignKey("roles.id")),
+    Column("user_id", ForeignKey("users.id"), index=True),
+    Column("role_id", ForeignKey("roles.id"), index=True),
 )
 
 
@@ -61,8 +63,8 @@ users_roles = Table(
 users_groups = Table(
     "users_groups",
     BaseModel.metadata,
-    Column("user_id", ForeignKey("users.id")),
-    Column("group_id", ForeignKey("groups.id")),
+    Column("user_id", ForeignKey("users.id"), index=True),
+    Column("group_id", ForeignKey("groups.id"), index=True),
 )
 
 
@@ -70,14 +72,15 @@ users_groups = Table(
 users_systems = Table(
     "users_systems",
     BaseModel.metadata,
-    Column("user_id", ForeignKey("users.id")),
-    Column("system_id", ForeignKey("systems.id")),
+    Column("user_id", ForeignKey("users.id"), index=True),
+    Column("system_id", ForeignKey("systems.id"), index=True),
 )
 
 
 
 class Systems(BaseModel):
     __tablename__ = "systems"
+    __trigram_search__ = ("system_code", "name_system")
 
     system_code: Mapped[str] = mapped_column(String(10), index=True, nullable=False, unique=True)
     name_system: Mapped[str] = mapped_column(String(75), index=True, nullable=False, unique=True)
@@ -185,14 +188,18 @@ class Groups(BaseModel):
 
 class MicroServices(BaseModel):
     __tablename__ = "micro_services"
+    __trigram_search__ = ("microservice_name",)
 
     microservice_name: Mapped[str] = mapped_column(String(255), index=True, nullable=False, unique=True)
     microservice_base_url: Mapped[str] = mapped_column(String(512), index=True, nullable=False, unique=True)
     microservice_status: Mapped[bool] = mapped_column(Boolean, default=False)
     weight: Mapped[int] = mapped_column(Integer, default=1)
+    microservice_websocket_multiplex: Mapped[bool] = mapped_column(Boolean, default=False)
+    microservice_http2: Mapped[bool] = mapped_column(Boolean, default=False)
+    microservice_max_streams: Mapped[int] = mapped_column(Integer, nullable=True)
 
     ## relationship
-    microservice_system_id: Mapped[int] = mapped_column(Integer, ForeignKey("systems.id"), nullable=True)
+    microservice_system_id: Mapped[int] = mapped_column(Integer, ForeignKey("systems.id"), index=True, nullable=True)
     microservice_system: Mapped["Systems"] = relationship(back_populates="back_micro_services_microservice_system", lazy="selectin")
 
     ## back_populates
@@ -205,6 +212,8 @@ class MicroServices(BaseModel):
 
 class Endpoints(BaseModel):
     __tablename__ = "endpoints"
+    __trigram_search__ = ("endpoint_name", "endpoint_url")
+    __fulltext_search__ = ("endpoint_description",)
 
     endpoint_name: Mapped[str] = mapped_column(String(255), index=True, nullable=True, unique=True)
     endpoint_url: Mapped[str] = mapped_column(String(512), index=True, nullable=False, unique=True)
@@ -213,9 +222,10 @@ class Endpoints(BaseModel):
     endpoint_description: Mapped[str] = mapped_column(String(512), index=True, nullable=True)
     endpoint_status: Mapped[bool] = mapped_column(Boolean, default=False)
     endpoint_authenticated: Mapped[bool] = mapped_column(Boolean, default=True)
+    endpoint_headers: Mapped[dict] = mapped_column(JSON, nullable=True)
 
     ## relationship
-    endpoint_microservice_id: Mapped[int] = mapped_column(Integer, ForeignKey("micro_services.id"), nullable=False)
+    endpoint_microservice_id: Mapped[int] = mapped_column(Integer, ForeignKey("micro_services.id"), index=True, nullable=False)
     endpoint_microservice: Mapped["MicroServices"] = relationship(back_populates="back_endpoints_endpoint_microservice", lazy="selectin")
     roles: Mapped[List["Roles"]] = relationship(secondary=endpoints_roles, back_populates="back_endpoints_roles", lazy="selectin")
     groups: Mapped[List["Groups"]] = relationship(secondary=endpoints_groups, back_populates="back_endpoints_groups", lazy="selectin")
@@ -227,6 +237,7 @@ class Endpoints(BaseModel):
 
 class Profiles(BaseModel):
     __tablename__ = "profiles"
+    __trigram_search__ = ("first_name", "last_name", "document")
 
     first_name: Mapped[str] = mapped_column(String(250), nullable=False)
     last_name: Mapped[str] = mapped_column(String(250), nullable=False)
@@ -244,6 +255,7 @@ class Profiles(BaseModel):
 
 class Users(BaseModel):
     __tablename__ = "users"
+    __trigram_search__ = ("email",)
 
     email: Mapped[str] = mapped_column(String(255), index=True, nullable=False, unique=True)
     password: Mapped[str] = mapped_column(String(512), nullable=False)
@@ -266,6 +278,13 @@ class Users(BaseModel):
 
 class HistoricalMovements(BaseModel):
     __tablename__ = "historical_movements"
+    __trigram_search__ = ("url_request", "system", "user_ip")
+    __fulltext_search__ = ("details",)
+    __partition_by__ = "created_at"
+
+    ## partition key, PostgreSQL requires it in the primary key of a partitioned table
+    ## (SQLite keeps the autoincrement id alone in its DDL, see BaseModels)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, default=func.now())
 
     url_request: Mapped[str] = mapped_column(String(255), nullable=True)
     type_request: Mapped[str] = mapped_column(String(10), nullable=True)
@@ -0,0 +1,120 @@
+from typing import Sequence, Tuple
+
+from sqlalchemy import DDL, Index, event, func, literal_column, text
+from sqlalchemy.sql.elements import ColumnElement
+
+from core.bases import Base
+
+
+
+TEXT_SEARCH_CONFIG = "simple"
+
+# The pg_trgm extension must exist before the trigram indexes are created
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
+
+def trigram_index_name(table: str, column: str) -> str:
+    """
+        Builds the name of the trigram index of a column.
+
+        Args:
+        - table (str): Table name.
+        - column (str): Column name.
+
+        Returns:
+        - Index name.
+    """
+    return f"ix_{table}_{column}_trgm"
+
+
+
+def fulltext_index_name(table: str, column: str) -> str:
+    """
+        Builds the name of the full-text index of a column.
+
+        Args:
+        - table (str): Table name.
+        - column (str): Column name.
+
+        Returns:
+        - Index name.
+    """
+    return f"ix_{table}_{column}_tsv"
+
+
+
+def fulltext_vector(column: ColumnElement) -> ColumnElement:
+    """
+        Builds the tsvector expression of a column. It must be the same
+        expression the full-text index was created on so the planner uses it.
+
+        Args:
+        - column (ColumnElement): Column to search.
+
+        Returns:
+        - tsvector expression.
+    """
+    return func.to_tsvector(
+        literal_column(f"'{TEXT_SEARCH_CONFIG}'"),
+        func.coalesce(column, literal_column("''"))
+    )
+
+
+
+def fulltext_query(search: str) -> ColumnElement:
+    """
+        Builds the tsquery expression of a search term.
+
+        Args:
+        - search (str): Search term.
+
+        Returns:
+        - tsquery expression.
+    """
+    return func.plainto_tsquery(literal_column(f"'{TEXT_SEARCH_CONFIG}'"), search)
+
+
+
+def search_indexes(
+    table: str,
+    trigram_fields: Sequence[str],
+    fulltext_fields: Sequence[str]
+) -> Tuple[Index, ...]:
+    """
+        Declares the GIN indexes backing the search of a model. Trigram indexes
+        serve ILIKE '%term%' predicates, full-text indexes serve tsvector matches.
+        They are only created on PostgreSQL.
+
+        Args:
+        - table (str): Table name.
+        - trigram_fields (Sequence[str]): Columns searched by substring.
+        - fulltext_fields (Sequence[str]): Columns searched by words.
+
+        Returns:
+        - Indexes to add to the table arguments.
+    """
+    indexes = [
+        Index(
+            trigram_index_name(table, field),
+            field,
+            postgresql_using="gin",
+            postgresql_ops={field: "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql")
+        for field in trigram_fields
+    ]
+
+    indexes += [
+        Index(
+            fulltext_index_name(table, field),
+            text(f"to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce({field}, ''))"),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql")
+        for field in fulltext_fields
+    ]
+
+    return tuple(indexes)
@@ -0,0 +1,220 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Union
+from datetime import datetime, timezone
+
+from settings import SETTINGS
+from core.bases import CONNECTION_DATABASE
+from core.databases.Models import HistoricalMovements
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+# Nine bound parameters per record, keeps every INSERT below the 32767 parameters of PostgreSQL
+MAX_ROWS_PER_INSERT = 3000
+
+
+class AuditHelper:
+    """
+        Class that records the audit trail of the gateway requests in
+        historical_movements. Records are buffered in a bounded in-memory
+        queue and written by a background task with multi-row inserts,
+        so no database write happens on the request path.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of AuditHelper.
+        """
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SETTINGS.AUDIT_QUEUE_SIZE)
+        self.task: Union[asyncio.Task, None] = None
+        self.flushing: Union[asyncio.Future, None] = None
+        self.batch: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {
+            "enqueued": 0,
+            "dropped": 0,
+            "written": 0,
+            "failed": 0,
+            "batches": 0,
+            "flush_errors": 0,
+            "last_flush_seconds": 0.0,
+        }
+
+
+    def record(
+        self,
+        url_request: str,
+        type_request: str,
+        system: Union[str, None] = None,
+        user_ip: Union[str, None] = None,
+        user_browser: Union[str, None] = None,
+        query: Union[str, None] = None,
+        details: Union[str, None] = None,
+        user_id: Union[int, None] = None,
+    ) -> bool:
+        """
+            Queues an audit record without waiting. When the queue is full the
+            configured overflow policy drops either this record or the oldest one.
+
+            Args:
+                url_request (str): Requested path.
+                type_request (str): HTTP method.
+                system (str, optional): Code of the system that owns the endpoint.
+                user_ip (str, optional): Client IP address.
+                user_browser (str, optional): Client user agent.
+                query (str, optional): Query string.
+                details (str, optional): Additional details of the request.
+                user_id (int, optional): ID of the authenticated user.
+
+            Returns:
+                bool: True if the record was queued, False if it was dropped.
+        """
+        if not SETTINGS.AUDIT_ENABLED:
+            return False
+
+        row = {
+            "url_request": url_request[:255],
+            "type_request": type_request[:10],
+            "system": system[:255] if system else None,
+            "user_ip": user_ip[:255] if user_ip else None,
+            "user_browser": user_browser,
+            "query": query or None,
+            "details": details,
+            "user_id": user_id,
+            "created_at": datetime.now(timezone.utc),
+        }
+
+        if self.queue.full():
+            self.counters["dropped"] += 1
+
+            if SETTINGS.AUDIT_OVERFLOW_POLICY != "drop_oldest":
+                return False
+
+            self.queue.get_nowait()
+
+        self.queue.put_nowait(row)
+        self.counters["enqueued"] += 1
+        return True
+
+
+    async def start(self) -> None:
+        """
+            Starts the background task that writes the queued records.
+        """
+        if SETTINGS.AUDIT_ENABLED and self.task is None:
+            self.task = asyncio.create_task(self.run(), name="audit-writer")
+
+
+    async def stop(self) -> None:
+        """
+            Stops the background task and writes the records still pending.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        if self.flushing is not None:
+            await self.flushing
+            self.flushing = None
+
+        rows, self.batch = self.batch, []
+        await self.flush(rows)
+
+        while not self.queue.empty():
+            await self.flush(self.take(SETTINGS.AUDIT_BATCH_SIZE))
+
+
+    def take(self, size: int) -> List[Dict[str, Any]]:
+        """
+            Takes up to size records already in the queue.
+
+            Args:
+                size (int): Maximum number of records.
+
+            Returns:
+                List[Dict[str, Any]]: Records taken.
+        """
+        rows = []
+
+        while len(rows) < size and not self.queue.empty():
+            rows.append(self.queue.get_nowait())
+
+        return rows
+
+
+    async def run(self) -> None:
+        """
+            Waits for records and writes them when a full batch is available or
+            when the oldest record has waited for the flush interval. Writes are
+            shielded so stopping the task never interrupts an INSERT.
+        """
+        while True:
+            self.batch = [await self.queue.get()]
+            deadline = time.monotonic() + SETTINGS.AUDIT_FLUSH_INTERVAL
+
+            while len(self.batch) < SETTINGS.AUDIT_BATCH_SIZE:
+                self.batch += self.take(SETTINGS.AUDIT_BATCH_SIZE - len(self.batch))
+                timeout = deadline - time.monotonic()
+
+                if len(self.batch) >= SETTINGS.AUDIT_BATCH_SIZE or timeout <= 0:
+                    break
+
+                try:
+                    self.batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            rows, self.batch = self.batch, []
+            self.flushing = asyncio.ensure_future(self.flush(rows))
+            await asyncio.shield(self.flushing)
+            self.flushing = None
+
+
+    async def flush(self, rows: List[Dict[str, Any]]) -> None:
+        """
+            Writes a batch of records with a single multi-row INSERT. A batch that
+            cannot be written is discarded and counted, it is never retried so a
+            database outage cannot make the queue grow without bound.
+
+            Args:
+                rows (List[Dict[str, Any]]): Records to write.
+        """
+        if not rows:
+            return
+
+        started = time.perf_counter()
+
+        try:
+            async with CONNECTION_DATABASE.SessionLocal() as session:
+                async with session.begin():
+                    for start in range(0, len(rows), MAX_ROWS_PER_INSERT):
+                        chunk = rows[start:start + MAX_ROWS_PER_INSERT]
+                        await session.execute(HistoricalMovements.__table__.insert().values(chunk))
+
+            self.counters["written"] += len(rows)
+
+        except Exception as error:
+            self.counters["failed"] += len(rows)
+            self.counters["flush_errors"] += 1
+            LOGGER.error(f"Audit trail batch of {len(rows)} records could not be written: {error}")
+
+        self.counters["batches"] += 1
+        self.counters["last_flush_seconds"] = time.perf_counter() - started
+
+
+    def metrics(self) -> Dict[str, float]:
+        """
+            Obtains the counters of the audit pipeline.
+
+            Returns:
+                Dict[str, float]: Counters and the current queue size.
+        """
+        return {**self.counters, "queued": self.queue.qsize()}
+
+
+
+AUDIT_HELPER = AuditHelper()
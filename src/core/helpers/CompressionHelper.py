@@ -0,0 +1,280 @@
+import time
+import zlib
+import asyncio
+import hashlib
+import logging
+from fnmatch import fnmatch
+from collections import OrderedDict
+from typing import AsyncIterator, List, Tuple, Union
+
+from settings import SETTINGS
+from core.helpers.MetricsHelper import METRICS_HELPER
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+# Bodies from this size are compressed in a thread, the codecs release the GIL and the event loop keeps serving
+THREAD_SIZE = 256 * 1024
+
+
+class StreamCompressor:
+    """
+        Incremental compressor of one response body with gzip, br or zstd.
+    """
+
+    __slots__ = ("encoding", "compressor")
+
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=SETTINGS.COMPRESSION_BROTLI_QUALITY)
+        elif encoding == "zstd":
+            self.compressor = zstandard.ZstdCompressor(level=SETTINGS.COMPRESSION_ZSTD_LEVEL).compressobj()
+        else:
+            self.compressor = zlib.compressobj(SETTINGS.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """
+            Args:
+                data (bytes): Next part of the body.
+                flush (bool): Whether everything compressed so far must be emitted, so the
+                    client can decode it without waiting for the rest of the body.
+
+            Returns:
+                bytes: Compressed data available.
+        """
+        if self.encoding == "br":
+            return self.compressor.process(data) + (self.compressor.flush() if flush else b"")
+
+        if self.encoding == "zstd":
+            return self.compressor.compress(data) + (self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else b"")
+
+        return self.compressor.compress(data) + (self.compressor.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+
+    def finish(self) -> bytes:
+        """
+            Returns:
+                bytes: End of the compressed body.
+        """
+        if self.encoding == "br":
+            return self.compressor.finish()
+
+        return self.compressor.flush()
+
+
+
+class CompressionHelper:
+    """
+        Class that compresses the responses of the gateway. It negotiates the encoding
+        with the Accept-Encoding of the client among the configured ones whose codec is
+        installed, keeps the time spent compressing within a CPU budget per second and,
+        when enabled, keeps the compressed copies of repeated bodies, like the listings
+        many clients request, in a LRU cache.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of CompressionHelper.
+        """
+        self.cache: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self.window = 0.0
+        self.spent = 0.0
+        self.supported: Union[List[str], None] = None
+
+
+    def encodings(self) -> List[str]:
+        """
+            Returns:
+                List[str]: Configured encodings whose codec is installed, in order of preference.
+        """
+        if self.supported is None:
+            codecs = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+            self.supported = [encoding for encoding in SETTINGS.COMPRESSION_ENCODINGS if codecs.get(encoding)]
+
+            for encoding in SETTINGS.COMPRESSION_ENCODINGS:
+                if not codecs.get(encoding):
+                    LOGGER.warning(f"The {encoding} response compression is configured but its codec is not installed, it is not offered")
+
+        return self.supported
+
+
+    def negotiate(self, accept_encoding: str) -> Union[str, None]:
+        """
+            Chooses the encoding of a response.
+
+            Args:
+                accept_encoding (str): Accept-Encoding header of the request.
+
+            Returns:
+                str: The accepted encoding with the highest q-value, the configured order
+                breaking ties, None if the client accepts none of them.
+        """
+        qualities = {}
+
+        for item in accept_encoding.lower().split(","):
+            name, _, parameters = item.partition(";")
+            quality = 1.0
+
+            for parameter in parameters.split(";"):
+                key, _, value = parameter.partition("=")
+
+                if key.strip() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+
+            if name.strip():
+                qualities[name.strip()] = quality
+
+        chosen, best = None, 0.0
+
+        for encoding in self.encodings():
+            quality = qualities.get(encoding, qualities.get("*", 0.0))
+
+            if quality > best:
+                chosen, best = encoding, quality
+
+        return chosen
+
+
+    @staticmethod
+    def compressible(media_type: str) -> bool:
+        """
+            Args:
+                media_type (str): Media type of the response, without parameters.
+
+            Returns:
+                bool: True if the media type is in COMPRESSION_MEDIA_TYPES.
+        """
+        return any(fnmatch(media_type, pattern) for pattern in SETTINGS.COMPRESSION_MEDIA_TYPES)
+
+
+    def spend(self, seconds: float) -> None:
+        """
+            Charges time spent compressing to the budget of the current second.
+
+            Args:
+                seconds (float): Time spent.
+        """
+        now = time.monotonic()
+
+        if now - self.window >= 1.0:
+            self.window, self.spent = now, 0.0
+
+        self.spent += seconds
+
+
+    def within_budget(self) -> bool:
+        """
+            Returns:
+                bool: False if the compression of this second used up COMPRESSION_CPU_BUDGET,
+                the new responses are then sent uncompressed, the ones started keep going.
+        """
+        if SETTINGS.COMPRESSION_CPU_BUDGET <= 0 or time.monotonic() - self.window >= 1.0:
+            return True
+
+        return self.spent < SETTINGS.COMPRESSION_CPU_BUDGET
+
+
+    @staticmethod
+    def compress_body(body: bytes, encoding: str) -> Tuple[bytes, float]:
+        """
+            Args:
+                body (bytes): Whole body.
+                encoding (str): Encoding.
+
+            Returns:
+                Tuple[bytes, float]: Compressed body and time spent compressing it.
+        """
+        started = time.perf_counter()
+        compressor = StreamCompressor(encoding)
+        compressed = compressor.compress(body) + compressor.finish()
+        return compressed, time.perf_counter() - started
+
+
+    async def compress(self, body: bytes, encoding: str) -> Union[bytes, None]:
+        """
+            Compresses a whole body, reusing its cached copy when present.
+
+            Args:
+                body (bytes): Whole body.
+                encoding (str): Encoding.
+
+            Returns:
+                bytes: Compressed body, None if the CPU budget is used up.
+        """
+        cacheable = SETTINGS.COMPRESSION_CACHE_SIZE > 0 and len(body) <= SETTINGS.COMPRESSION_CACHE_MAX_BODY
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest()) if cacheable else None
+        compressed = self.cache.get(key) if cacheable else None
+
+        if compressed is not None:
+            self.cache.move_to_end(key)
+            METRICS_HELPER.compression.inc(encoding, "cached")
+            return compressed
+
+        if not self.within_budget():
+            METRICS_HELPER.compression.inc(encoding, "budget")
+            return None
+
+        if len(body) >= THREAD_SIZE:
+            compressed, spent = await asyncio.to_thread(self.compress_body, body, encoding)
+        else:
+            compressed, spent = self.compress_body(body, encoding)
+
+        self.spend(spent)
+        METRICS_HELPER.compression.inc(encoding, "compressed")
+
+        if cacheable:
+            self.cache[key] = compressed
+
+            while len(self.cache) > SETTINGS.COMPRESSION_CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+        return compressed
+
+
+    async def stream(self, chunks: AsyncIterator[bytes], encoding: str) -> AsyncIterator[bytes]:
+        """
+            Compresses a body as it is produced, flushing after every part so events and
+            chunks reach the client as soon as they reach the gateway.
+
+            Args:
+                chunks (AsyncIterator[bytes]): Parts of the body.
+                encoding (str): Encoding.
+
+            Yields:
+                bytes: Compressed parts.
+        """
+        compressor = StreamCompressor(encoding)
+        METRICS_HELPER.compression.inc(encoding, "streamed")
+
+        async for chunk in chunks:
+            started = time.perf_counter()
+            data = compressor.compress(chunk, flush=True)
+            self.spend(time.perf_counter() - started)
+
+            if data:
+                yield data
+
+        yield compressor.finish()
+
+
+
+COMPRESSION_HELPER = CompressionHelper()
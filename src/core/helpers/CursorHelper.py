@@ -0,0 +1,128 @@
+import json
+import base64
+from typing import Any, List
+from datetime import date, datetime
+
+from fastapi import HTTPException, status
+
+
+
+class CursorHelper:
+    """
+        Helper class for encoding and decoding the opaque cursors 
+        used by keyset pagination.
+    """
+
+    def encode(self, values: List[Any], sort: str) -> str:
+        """
+            Encodes the sort key values of the last row of a page into an opaque cursor,
+            bound to the sort it was issued for.
+
+            Args:
+                values (List[Any]): Sort key values, datetimes and dates are supported, and
+                    other types (UUID, Decimal) are encoded as text.
+                sort (str): Sort of the page, such as "created_at:desc".
+
+            Returns:
+                str: URL safe cursor.
+        """
+        encoded = []
+
+        for value in values:
+            if isinstance(value, datetime):
+                encoded.append({"dt": value.isoformat()})
+            elif isinstance(value, date):
+                encoded.append({"d": value.isoformat()})
+            elif value is None or isinstance(value, (bool, int, float, str)):
+                encoded.append(value)
+            else:
+                encoded.append(str(value))
+
+        payload = json.dumps({"s": sort, "v": encoded}, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+    @staticmethod
+    def coerce(value: Any, kind: type) -> Any:
+        """
+            Converts a decoded value into the Python type of its sort column.
+
+            Args:
+                value (Any): Value read from the cursor.
+                kind (type): Python type of the sort column.
+
+            Returns:
+                Any: Value of the column type.
+
+            Raises:
+                ValueError: If the value does not belong to the column type.
+        """
+        if value is None:
+            return None
+
+        if issubclass(kind, datetime):
+            if isinstance(value, dict) and isinstance(value.get("dt"), str):
+                return datetime.fromisoformat(value["dt"])
+        elif issubclass(kind, date):
+            if isinstance(value, dict) and isinstance(value.get("d"), str):
+                return date.fromisoformat(value["d"])
+        elif issubclass(kind, bool):
+            if isinstance(value, bool):
+                return value
+        elif issubclass(kind, int):
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+        elif issubclass(kind, float):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return float(value)
+        elif issubclass(kind, str):
+            if isinstance(value, str):
+                return value
+        elif isinstance(value, str):
+            return kind(value)
+
+        raise ValueError(value)
+
+
+    def decode(self, cursor: str, kinds: List[type], sort: str) -> List[Any]:
+        """
+            Decodes an opaque cursor into the sort key values it was built from.
+
+            Args:
+                cursor (str): Cursor returned by a previous page.
+                kinds (List[type]): Python types of the sort key columns, in order.
+                sort (str): Sort of the requested page, it must be the one of the cursor.
+
+            Returns:
+                List[Any]: Sort key values.
+
+            Raises:
+                HTTPException: If the cursor is malformed, was issued for another sort or
+                    holds a value of another type than its column.
+        """
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+
+            if not isinstance(payload, dict) or payload.get("s") != sort:
+                raise ValueError(cursor)
+
+            encoded = payload.get("v")
+
+            if not isinstance(encoded, list) or len(encoded) != len(kinds):
+                raise ValueError(cursor)
+
+            values = [self.coerce(value, kind) for value, kind in zip(encoded, kinds)]
+
+        except (ValueError, TypeError, ArithmeticError):
+            raise HTTPException(
+                status_code = status.HTTP_400_BAD_REQUEST, 
+                detail = {
+                    "code":status.HTTP_400_BAD_REQUEST, 
+                    "message":"The pagination cursor is not valid."
+                }
+            )
+
+        return values
+
+
+CURSOR_HELPER = CursorHelper()
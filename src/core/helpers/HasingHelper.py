@@ -1,3 +1,5 @@
+import asyncio
+
 from passlib.context import CryptContext
 
 
@@ -26,7 +28,8 @@ class HashingHelper:
             Returns:
                 str: The hashed password.
         """
-        return self.password_context.hash(password)
+        # bcrypt is deliberately slow, hashing on the event loop would stall every other request of the worker
+        return await asyncio.to_thread(self.password_context.hash, password)
 
 
     async def verify_password(self, hashed_password: str, plain_password: str) -> bool:
@@ -40,7 +43,7 @@ class HashingHelper:
             Returns:
                 bool: True if the passwords match, False otherwise.
         """
-        return self.password_context.verify(plain_password, hashed_password)
+        return await asyncio.to_thread(self.password_context.verify, plain_password, hashed_password)
 
 
 
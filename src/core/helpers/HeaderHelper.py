@@ -0,0 +1,329 @@
+import logging
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple, Union
+
+from fastapi import Request, Response as ClientResponse
+from httpx import Response
+
+from settings import SETTINGS
+from core.helpers.CompressionHelper import brotli, zstandard
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+# Headers of a single connection, never forwarded in either direction
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "content-length",
+}
+
+# Headers the upstream client computes again for its own connection
+REQUEST_COMPUTED_HEADERS = {"host", "content-length"}
+
+# Headers describing the client as seen by the proxies in front of the microservice
+FORWARDED_HEADERS = {"forwarded", "x-forwarded-for", "x-forwarded-proto", "x-forwarded-host"}
+
+# Headers of the server that answers the client, the gateway sends its own
+SERVER_HEADERS = {"date", "server"}
+
+# Headers describing a body the gateway decoded and rendered again
+RENDERED_HEADERS = {"content-type", "content-encoding"}
+
+
+class HeaderRules:
+    """
+        Header rules of an endpoint compiled from Endpoints.endpoint_headers, a JSON
+        object like {"request": {"set": {"X-Api-Version": "2"}, "remove": ["Cookie"]},
+        "response": {"set": {"Cache-Control": "no-store"}, "remove": ["Server"]}}.
+    """
+
+    __slots__ = ("source", "request_set", "request_remove", "response_set", "response_remove")
+
+
+    def __init__(self, source: Any) -> None:
+        self.source = source
+        self.request_set, self.request_remove = self.compile(source, "request")
+        self.response_set, self.response_remove = self.compile(source, "response")
+
+
+    @staticmethod
+    def compile(source: Any, direction: str) -> Tuple[List[Tuple[str, str]], FrozenSet[str]]:
+        """
+            Args:
+                source (Any): Rules of the endpoint.
+                direction (str): request or response.
+
+            Returns:
+                Tuple: Headers to set, with lowercase names, and names of the headers to remove.
+        """
+        rules = source.get(direction) if isinstance(source, dict) else None
+
+        if not isinstance(rules, dict):
+            return [], frozenset()
+
+        to_set = rules.get("set") if isinstance(rules.get("set"), dict) else {}
+        to_remove = rules.get("remove") if isinstance(rules.get("remove"), list) else []
+
+        return (
+            [(str(name).lower(), str(value)) for name, value in to_set.items()],
+            frozenset(str(name).lower() for name in to_remove),
+        )
+
+
+    @staticmethod
+    def apply(headers: Iterable[Tuple[str, str]], to_set: List[Tuple[str, str]], to_remove: FrozenSet[str]) -> List[Tuple[str, str]]:
+        """
+            Args:
+                headers (Iterable[Tuple[str, str]]): Headers with lowercase names.
+                to_set (List[Tuple[str, str]]): Headers replacing the ones with the same name.
+                to_remove (FrozenSet[str]): Names of the headers to remove.
+
+            Returns:
+                List[Tuple[str, str]]: Headers after the rules.
+        """
+        if not to_set and not to_remove:
+            return list(headers)
+
+        replaced = to_remove.union(name for name, _ in to_set)
+        return [(name, value) for name, value in headers if name not in replaced] + to_set
+
+
+
+class HeaderHelper:
+    """
+        Class that builds the headers of the proxied requests and responses. It strips
+        the hop-by-hop headers and the ones the upstream client computes itself, so the
+        pooled connections are reused, adds the X-Forwarded-* and Forwarded headers of
+        the client, optionally replaces the bearer token with the verified identity of
+        the user, and applies the header rules of the endpoint, compiled once per change.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of HeaderHelper.
+        """
+        self.rules: Dict[int, HeaderRules] = {}
+        self.decodable = frozenset(
+            ["gzip", "deflate", "identity"] + (["br"] if brotli is not None else []) + (["zstd"] if zstandard is not None else [])
+        )
+
+
+    def accept_encoding(self, value: str) -> str:
+        """
+            Filters an Accept-Encoding header down to the encodings the gateway can
+            decode. A wildcard is expanded to the decodable encodings the client did
+            not name, with the parameters of the wildcard.
+
+            Args:
+                value (str): Accept-Encoding header of the client.
+
+            Returns:
+                str: Accept-Encoding header for the microservice.
+        """
+        items = [item.strip() for item in value.split(",") if item.strip()]
+        named = {item.split(";", 1)[0].strip().lower() for item in items}
+        accepted = []
+
+        for item in items:
+            coding, _, parameters = item.partition(";")
+            coding = coding.strip().lower()
+
+            if coding in self.decodable:
+                accepted.append(item)
+            elif coding == "*":
+                accepted.extend(
+                    f"{decodable};{parameters}" if parameters else decodable
+                    for decodable in sorted(self.decodable - named)
+                )
+
+        return ",".join(accepted) or "identity"
+
+
+    def endpoint_rules(self, endpoint: Any) -> Union[HeaderRules, None]:
+        """
+            Obtains the compiled header rules of an endpoint.
+
+            Args:
+                endpoint (Endpoints): Endpoint of the request.
+
+            Returns:
+                HeaderRules: Compiled rules, None if the endpoint has none.
+        """
+        source = getattr(endpoint, "endpoint_headers", None)
+
+        if not source:
+            self.rules.pop(endpoint.id, None)
+            return None
+
+        rules = self.rules.get(endpoint.id)
+
+        # Recompiled only when the rules of the endpoint changed
+        if rules is None or rules.source != source:
+            if not isinstance(source, dict):
+                LOGGER.warning(f"The header rules of the endpoint {endpoint.endpoint_url} are not a JSON object, they are ignored")
+
+            rules = self.rules[endpoint.id] = HeaderRules(source)
+
+        return rules
+
+
+    @staticmethod
+    def connection_headers(connection: str) -> FrozenSet[str]:
+        """
+            Args:
+                connection (str): Connection header.
+
+            Returns:
+                FrozenSet[str]: Hop-by-hop headers named in it.
+        """
+        return frozenset(token.strip().lower() for token in connection.split(",") if token.strip())
+
+
+    @staticmethod
+    def forwarded_element(ip: str, proto: str, host: str) -> str:
+        """
+            Builds the element of the gateway in the Forwarded header (RFC 7239).
+
+            Args:
+                ip (str): IP of the client.
+                proto (str): Scheme of the request.
+                host (str): Host requested by the client.
+
+            Returns:
+                str: Forwarded element.
+        """
+        node = f'"[{ip}]"' if ":" in ip else ip
+        element = f"for={node};proto={proto}"
+        return f'{element};host="{host}"' if host else element
+
+
+    def request_headers(self, request: Request, user: Any, rules: Union[HeaderRules, None]) -> Dict[str, str]:
+        """
+            Builds the headers of an upstream request.
+
+            Args:
+                request (Request): Request of the client.
+                user (UserResponseEntity, optional): Authenticated user, True if the endpoint is public.
+                rules (HeaderRules, optional): Header rules of the endpoint.
+
+            Returns:
+                Dict[str, str]: Headers with lowercase names.
+        """
+        dropped = HOP_BY_HOP_HEADERS | REQUEST_COMPUTED_HEADERS | self.connection_headers(request.headers.get("connection", ""))
+        identity = SETTINGS.HEADERS_IDENTITY and getattr(user, "id", None) is not None
+        prefix = SETTINGS.HEADERS_IDENTITY_PREFIX.lower()
+
+        if not SETTINGS.HEADERS_TRUST_FORWARDED:
+            dropped = dropped | FORWARDED_HEADERS
+
+        if identity:
+            dropped = dropped | {"authorization"}
+
+        headers: Dict[str, str] = {}
+
+        for name, value in request.headers.items():
+            if name in dropped or (SETTINGS.HEADERS_IDENTITY and name.startswith(prefix)):
+                continue
+
+            if name in headers:
+                headers[name] = f"{headers[name]}{'; ' if name == 'cookie' else ', '}{value}"
+            else:
+                headers[name] = value
+
+        # Only the encodings the gateway can decode, it reads the JSON bodies itself
+        if "accept-encoding" in headers:
+            headers["accept-encoding"] = self.accept_encoding(headers["accept-encoding"])
+
+        ip = request.client.host if request.client else ""
+        host = request.headers.get("host", "")
+        proto = request.url.scheme
+
+        headers["x-forwarded-for"] = f"{headers['x-forwarded-for']}, {ip}" if headers.get("x-forwarded-for") else ip
+        headers["x-forwarded-proto"] = headers.get("x-forwarded-proto") or proto
+        headers["x-forwarded-host"] = headers.get("x-forwarded-host") or host
+
+        element = self.forwarded_element(ip, proto, host)
+        headers["forwarded"] = f"{headers['forwarded']}, {element}" if headers.get("forwarded") else element
+
+        if identity:
+            headers[f"{prefix}id"] = str(user.id)
+            headers[f"{prefix}email"] = user.email
+            headers[f"{prefix}roles"] = ",".join(role.role_name for role in user.roles or [])
+
+        if rules is not None:
+            headers = dict(HeaderRules.apply(headers.items(), rules.request_set, rules.request_remove))
+
+        return headers
+
+
+    def response_headers(
+        self,
+        response: Response,
+        rules: Union[HeaderRules, None],
+        rendered: bool = False,
+        head: bool = False
+    ) -> List[Tuple[str, str]]:
+        """
+            Builds the headers of the response to the client from the ones of the microservice.
+
+            Args:
+                response (Response): Response of the microservice.
+                rules (HeaderRules, optional): Header rules of the endpoint.
+                rendered (bool): Whether the gateway decoded and rendered the body again, its
+                    type and encoding are then the ones of the gateway and a strong ETag
+                    becomes weak.
+                head (bool): Whether it answers a HEAD request, its Content-Length announces
+                    the body of a GET and is kept.
+
+            Returns:
+                List[Tuple[str, str]]: Headers with lowercase names, repeated ones kept.
+        """
+        dropped = HOP_BY_HOP_HEADERS | SERVER_HEADERS | self.connection_headers(response.headers.get("connection", ""))
+
+        if rendered:
+            dropped = dropped | RENDERED_HEADERS
+
+        if head:
+            dropped = dropped - {"content-length"}
+
+        headers = []
+
+        for name, value in response.headers.multi_items():
+            name = name.lower()
+
+            if name in dropped:
+                continue
+
+            if rendered and name == "etag" and not value.startswith("W/"):
+                value = f"W/{value}"
+
+            headers.append((name, value))
+
+        if rules is not None:
+            headers = HeaderRules.apply(headers, rules.response_set, rules.response_remove)
+
+        return headers
+
+
+    def forward(self, proxied: ClientResponse, response: Response, rules: Union[HeaderRules, None]) -> ClientResponse:
+        """
+            Adds the headers of the microservice to the response the gateway built from its body.
+
+            Args:
+                proxied (Response): Response to the client.
+                response (Response): Response of the microservice, already read.
+                rules (HeaderRules, optional): Header rules of the endpoint.
+
+            Returns:
+                Response: The response to the client.
+        """
+        proxied.raw_headers.extend(
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in self.response_headers(response, rules, rendered=True)
+        )
+        return proxied
+
+
+
+HEADER_HELPER = HeaderHelper()
@@ -1,5 +1,7 @@
+import time
 import base64
-from typing import Dict, Union
+import asyncio
+from typing import Any, Dict, Union
 
 import grpc
 from cryptography.fernet import Fernet
@@ -14,10 +16,37 @@ from core.services.external_services.vault.protobufs.keys_pairs_pb2_grpc import
 class KeyCodeHelper:
     """
         Class that provides methods for obtaining 
-        and managing key pairs securely.
+        and managing key pairs securely. The key pairs
+        are reused for the configured TTL, so validating
+        a token does not call the Vault.
     """
 
 
+    def __init__(self) -> None:
+        """
+            Initializes an instance of KeyCodeHelper.
+        """
+        self.keys_pairs: Dict = {}
+        self.loaded_keys: Dict[str, Any] = {}
+        self.expires_at = 0.0
+        self.lock = asyncio.Lock()
+
+
+    @staticmethod
+    def request_keys_pairs() -> keys_pairs_pb2.EncryptKeysResponse:
+        """
+            Calls the gRPC service for the encrypted key pairs. The call is blocking.
+
+            Returns:
+                keys_pairs_pb2.EncryptKeysResponse: Response of the service.
+        """
+        with grpc.insecure_channel(SETTINGS.GRPC_SERVER_ADDRESS) as channel:
+            stub = KeysPairsServiceStub(channel)
+
+            request = keys_pairs_pb2.EncryptKeysRequest(system_code=SETTINGS.SYSTEM_CODE)
+            return stub.keysPairs(request)
+
+
     async def get_keys_pairs(self) -> Dict:
         """
             Obtains key pairs from the gRPC service.
@@ -25,11 +54,8 @@ class KeyCodeHelper:
             Returns:
                 Dict: Dictionary with key pairs.
         """
-        channel = grpc.insecure_channel(SETTINGS.GRPC_SERVER_ADDRESS)
-        stub = KeysPairsServiceStub(channel)
-        
-        request = keys_pairs_pb2.EncryptKeysRequest(system_code=SETTINGS.SYSTEM_CODE)
-        response = stub.keysPairs(request)
+        # The gRPC stub is synchronous, it runs in a thread so the event loop keeps serving requests
+        response = await asyncio.to_thread(self.request_keys_pairs)
 
         cipher_suite = Fernet(SETTINGS.VAULT_SECRET_KEY)
         decrypted_data = cipher_suite.decrypt(response.encrypted_data)
@@ -53,13 +79,23 @@ class KeyCodeHelper:
                 cryptography.hazmat.primitives.asymmetric.rsa.RSAPrivateKey or
                 cryptography.hazmat.primitives.asymmetric.rsa.RSAPublicKey: The loaded PEM key.
         """
-        _key = await self.get_keys_pairs()
-        decode_key = base64.b64decode(_key[key])
-
-        if private:
-            return serialization.load_pem_private_key(decode_key, password=None)
-
-        return serialization.load_pem_public_key(decode_key)
+        if time.monotonic() >= self.expires_at:
+            async with self.lock:
+                # Concurrent callers wait for the first one instead of all calling the Vault
+                if time.monotonic() >= self.expires_at:
+                    self.keys_pairs = await self.get_keys_pairs()
+                    self.loaded_keys = {}
+                    self.expires_at = time.monotonic() + SETTINGS.VAULT_KEYS_CACHE_TTL
+
+        if key not in self.loaded_keys:
+            decode_key = base64.b64decode(self.keys_pairs[key])
+
+            if private:
+                self.loaded_keys[key] = serialization.load_pem_private_key(decode_key, password=None)
+            else:
+                self.loaded_keys[key] = serialization.load_pem_public_key(decode_key)
+
+        return self.loaded_keys[key]
 
 
     async def private_key(self) -> serialization.load_pem_private_key:
@@ -0,0 +1,630 @@
+import os
+import hmac
+import json
+import time
+import asyncio
+import logging
+import ipaddress
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from settings import SETTINGS
+from core.bases import CONNECTION_DATABASE
+from core.helpers.AuditHelper import AUDIT_HELPER
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, 30.0, 60.0)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Metric:
+    """
+        Base class of the metrics. Values are kept in a plain dictionary keyed by the
+        tuple of label values; every update runs on the event loop thread of the
+        worker, so the hot path needs no lock.
+    """
+
+    type = "untyped"
+
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> None:
+        """
+            Initializes an instance of Metric.
+
+            Args:
+                name (str): Metric name.
+                documentation (str): Help text of the metric.
+                labels (Tuple[str, ...]): Label names.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], Any] = {}
+
+
+    def set(self, *labels: str, value: float) -> None:
+        """
+            Sets the value of a series.
+
+            Args:
+                *labels (str): Label values, in the order of the label names.
+                value (float): New value.
+        """
+        self.values[labels] = value
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+            Obtains a JSON serializable copy of the metric.
+
+            Returns:
+                Dict[str, Any]: Type, help, label names and series of the metric.
+        """
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labels": list(self.labels),
+            "values": [[list(labels), value] for labels, value in self.values.items()],
+        }
+
+
+
+class Counter(Metric):
+    """
+        Monotonic counter, summed across workers.
+    """
+
+    type = "counter"
+
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """
+            Increments a series.
+
+            Args:
+                *labels (str): Label values, in the order of the label names.
+                amount (float): Increment.
+        """
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+
+class Gauge(Metric):
+    """
+        Value that goes up and down, summed across workers.
+    """
+
+    type = "gauge"
+
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """
+            Increments a series.
+
+            Args:
+                *labels (str): Label values, in the order of the label names.
+                amount (float): Increment.
+        """
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        """
+            Decrements a series.
+
+            Args:
+                *labels (str): Label values, in the order of the label names.
+                amount (float): Decrement.
+        """
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+
+class Histogram(Metric):
+    """
+        Distribution of observations in fixed buckets. Each series keeps the
+        non-cumulative count of every bucket followed by the sum and the count.
+    """
+
+    type = "histogram"
+
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        """
+            Initializes an instance of Histogram.
+
+            Args:
+                name (str): Metric name.
+                documentation (str): Help text of the metric.
+                labels (Tuple[str, ...]): Label names.
+                buckets (Tuple[float, ...]): Upper bounds of the buckets, sorted.
+        """
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+
+
+    def observe(self, *labels: str, value: float) -> None:
+        """
+            Records an observation.
+
+            Args:
+                *labels (str): Label values, in the order of the label names.
+                value (float): Observed value.
+        """
+        series = self.values.get(labels)
+
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 3)
+
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **super().snapshot(),
+            "values": [[list(labels), list(series)] for labels, series in self.values.items()],
+            "buckets": list(self.buckets),
+        }
+
+
+
+class MetricsHelper:
+    """
+        Class that holds the metrics of the gateway. Every worker updates its own
+        metrics and periodically dumps them to a file named after its PID; the
+        worker that serves the scrape merges the files of the live workers.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of MetricsHelper.
+        """
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+        self.task: Union[asyncio.Task, None] = None
+
+        self.requests = self.register(Counter(
+            "gateway_requests_total",
+            "Requests handled by the gateway.",
+            ("endpoint", "microservice", "method", "status")
+        ))
+        self.request_duration = self.register(Histogram(
+            "gateway_request_duration_seconds",
+            "Time to answer a request, from the gateway point of view.",
+            ("endpoint", "microservice", "method", "status")
+        ))
+        self.upstream_duration = self.register(Histogram(
+            "gateway_upstream_duration_seconds",
+            "Time spent waiting for the microservices.",
+            ("microservice", "method", "status")
+        ))
+        self.upstream_protocol = self.register(Counter(
+            "gateway_upstream_responses_total",
+            "Responses of the microservices by HTTP version.",
+            ("version",)
+        ))
+        self.compression = self.register(Counter(
+            "gateway_compressed_responses_total",
+            "Responses compressed by the gateway by encoding and outcome.",
+            ("encoding", "outcome")
+        ))
+        self.in_flight = self.register(Gauge(
+            "gateway_requests_in_flight",
+            "Requests currently being handled."
+        ))
+        self.streams = self.register(Gauge(
+            "gateway_streams",
+            "Streaming responses currently relayed."
+        ))
+        self.websocket_sessions = self.register(Gauge(
+            "gateway_websocket_sessions",
+            "WebSocket sessions currently open."
+        ))
+        self.websocket_messages = self.register(Counter(
+            "gateway_websocket_messages_total",
+            "WebSocket messages relayed by destination.",
+            ("direction",)
+        ))
+        self.websocket_bytes = self.register(Counter(
+            "gateway_websocket_bytes_total",
+            "Bytes of the WebSocket messages relayed by destination.",
+            ("direction",)
+        ))
+        self.websocket_multiplexed = self.register(Gauge(
+            "gateway_websocket_multiplexed_connections",
+            "Upstream WebSocket connections shared by multiplexed sessions."
+        ))
+        self.websocket_rejections = self.register(Counter(
+            "gateway_websocket_rejections_total",
+            "WebSocket handshakes rejected by the session limits, by the limit reached or draining.",
+            ("reason",)
+        ))
+        self.websocket_closes = self.register(Counter(
+            "gateway_websocket_closes_total",
+            "WebSocket sessions closed by the gateway, by close code.",
+            ("code",)
+        ))
+        self.route_cache = self.register(Counter(
+            "gateway_route_cache_lookups_total",
+            "Lookups of the cached routes and user grants by outcome.",
+            ("cache", "outcome")
+        ))
+        self.database_pool = self.register(Gauge(
+            "gateway_database_pool_connections",
+            "Connections of the database pools by state.",
+            ("pool", "state")
+        ))
+        self.audit_records = self.register(Counter(
+            "gateway_audit_records_total",
+            "Audit records by outcome.",
+            ("outcome",)
+        ))
+        self.audit_queue = self.register(Gauge(
+            "gateway_audit_queue_records",
+            "Audit records waiting to be written."
+        ))
+        self.audit_flush_errors = self.register(Counter(
+            "gateway_audit_flush_errors_total",
+            "Audit batches that could not be written."
+        ))
+        self.loop_lag = self.register(Histogram(
+            "gateway_event_loop_lag_seconds",
+            "Delay of the event loop heartbeat over its schedule.",
+            buckets=LAG_BUCKETS
+        ))
+        self.loop_stalls = self.register(Counter(
+            "gateway_event_loop_stalls_total",
+            "Times the event loop was blocked longer than the watchdog threshold."
+        ))
+
+        self.collectors += [self.collect_database_pool, self.collect_audit]
+
+
+    def register(self, metric: Metric) -> Any:
+        """
+            Registers a metric so it is exported.
+
+            Args:
+                metric (Metric): Metric to register.
+
+            Returns:
+                Metric: The registered metric.
+        """
+        self.metrics[metric.name] = metric
+        return metric
+
+
+    def collect_database_pool(self) -> None:
+        """
+            Reads the usage of the primary and replica connection pools.
+        """
+        engines = [("primary", CONNECTION_DATABASE.engine)]
+        engines += [(f"replica{index}", replica.engine) for index, replica in enumerate(CONNECTION_DATABASE.replicas)]
+
+        for name, engine in engines:
+            pool = engine.pool
+
+            if not hasattr(pool, "checkedout"):
+                continue
+
+            self.database_pool.set(name, "checked_out", value=pool.checkedout())
+            self.database_pool.set(name, "idle", value=pool.checkedin())
+            self.database_pool.set(name, "overflow", value=max(pool.overflow(), 0))
+            self.database_pool.set(name, "size", value=pool.size())
+
+
+    def collect_audit(self) -> None:
+        """
+            Reads the counters of the audit pipeline.
+        """
+        counters = AUDIT_HELPER.metrics()
+
+        for outcome in ("enqueued", "dropped", "written", "failed"):
+            self.audit_records.set(outcome, value=counters[outcome])
+
+        self.audit_queue.set(value=counters["queued"])
+        self.audit_flush_errors.set(value=counters["flush_errors"])
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+            Runs the collectors and copies the metrics of this worker.
+
+            Returns:
+                Dict[str, Any]: Metrics of the worker by name.
+        """
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as error:
+                LOGGER.error(f"Metrics collector {collector.__name__} failed: {error}")
+
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+
+    @staticmethod
+    def snapshot_path(pid: int) -> str:
+        """
+            Builds the path of the snapshot file of a worker.
+
+            Args:
+                pid (int): PID of the worker.
+
+            Returns:
+                str: Path of the snapshot file.
+        """
+        return os.path.join(SETTINGS.METRICS_DIR, f"{pid}.json")
+
+
+    def write_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        """
+            Writes the snapshot of this worker, replacing the previous one atomically.
+
+            Args:
+                snapshot (Dict[str, Any]): Metrics of the worker.
+        """
+        os.makedirs(SETTINGS.METRICS_DIR, exist_ok=True)
+        path = self.snapshot_path(os.getpid())
+
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(snapshot, file)
+
+        os.replace(f"{path}.tmp", path)
+
+
+    @staticmethod
+    def alive(pid: int) -> bool:
+        """
+            Checks whether a process exists.
+
+            Args:
+                pid (int): PID of the process.
+
+            Returns:
+                bool: True if the process exists.
+        """
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+
+    @staticmethod
+    def stale(path: str) -> bool:
+        """
+            Checks whether a snapshot file missed several refreshes.
+
+            Args:
+                path (str): Path of the snapshot file.
+
+            Returns:
+                bool: True if the file is older than three snapshot intervals.
+        """
+        try:
+            return time.time() - os.path.getmtime(path) > 3 * max(SETTINGS.METRICS_SNAPSHOT_INTERVAL, 1.0)
+        except OSError:
+            return True
+
+
+    def read_snapshots(self) -> List[Dict[str, Any]]:
+        """
+            Reads the snapshots of the other live workers and removes the ones of dead workers.
+
+            Returns:
+                List[Dict[str, Any]]: Metrics of the other workers.
+        """
+        if not os.path.isdir(SETTINGS.METRICS_DIR):
+            return []
+
+        snapshots = []
+
+        for filename in os.listdir(SETTINGS.METRICS_DIR):
+            pid, extension = os.path.splitext(filename)
+
+            if extension != ".json" or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+
+            path = os.path.join(SETTINGS.METRICS_DIR, filename)
+
+            # A snapshot that stopped being refreshed belongs to a dead worker, even if its PID was reused
+            if not self.alive(int(pid)) or self.stale(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+
+        return snapshots
+
+
+    @staticmethod
+    def merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+            Merges the snapshots of several workers by summing their series.
+
+            Args:
+                snapshots (List[Dict[str, Any]]): Metrics of every worker.
+
+            Returns:
+                Dict[str, Any]: Metrics of the whole gateway.
+        """
+        merged: Dict[str, Any] = {}
+
+        for snapshot in snapshots:
+            for name, metric in snapshot.items():
+                target = merged.setdefault(name, {**metric, "series": {}})
+
+                for labels, value in metric["values"]:
+                    key = tuple(labels)
+                    current = target["series"].get(key)
+
+                    if current is None:
+                        target["series"][key] = list(value) if isinstance(value, list) else value
+                    elif isinstance(value, list):
+                        target["series"][key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        target["series"][key] = current + value
+
+        return merged
+
+
+    @staticmethod
+    def format_labels(names: List[str], values: Tuple[str, ...], extra: str = "") -> str:
+        """
+            Formats the labels of a series in the exposition format.
+
+            Args:
+                names (List[str]): Label names.
+                values (Tuple[str, ...]): Label values.
+                extra (str): Additional label already formatted.
+
+            Returns:
+                str: Labels between braces, or an empty string.
+        """
+        pairs = [
+            '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for name, value in zip(names, values)
+        ]
+
+        if extra:
+            pairs.append(extra)
+
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+    def render(self, merged: Dict[str, Any]) -> str:
+        """
+            Renders the metrics in the Prometheus text exposition format.
+
+            Args:
+                merged (Dict[str, Any]): Metrics of the whole gateway.
+
+            Returns:
+                str: Exposition text.
+        """
+        lines = []
+
+        for name, metric in merged.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+
+            for labels, value in metric["series"].items():
+                if metric["type"] != "histogram":
+                    lines.append(f"{name}{self.format_labels(metric['labels'], labels)} {value}")
+                    continue
+
+                cumulative = 0
+
+                for bound, count in zip(metric["buckets"] + ["+Inf"], value[:-2]):
+                    cumulative += count
+                    bucket = self.format_labels(metric["labels"], labels, f'le="{bound}"')
+                    lines.append(f"{name}_bucket{bucket} {cumulative}")
+
+                lines.append(f"{name}_sum{self.format_labels(metric['labels'], labels)} {value[-2]}")
+                lines.append(f"{name}_count{self.format_labels(metric['labels'], labels)} {value[-1]}")
+
+        return "\n".join(lines) + "\n"
+
+
+    @staticmethod
+    def authorized(authorization: Union[str, None], client: Union[str, None]) -> bool:
+        """
+            Checks whether a scrape may read the metrics, which name the endpoints and the
+            microservices: it must carry the METRICS_TOKEN as a bearer token or come from
+            one of the METRICS_ALLOWED_IPS networks.
+
+            Args:
+                authorization (str, optional): Authorization header of the scrape.
+                client (str, optional): IP of the client.
+
+            Returns:
+                bool: True if the scrape is allowed.
+        """
+        scheme, _, token = (authorization or "").partition(" ")
+
+        if SETTINGS.METRICS_TOKEN and scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), SETTINGS.METRICS_TOKEN.encode()):
+            return True
+
+        try:
+            address = ipaddress.ip_address(client or "")
+        except ValueError:
+            return False
+
+        return any(
+            address in ipaddress.ip_network(network.strip(), strict=False)
+            for network in SETTINGS.METRICS_ALLOWED_IPS.split(",") if network.strip()
+        )
+
+
+    async def export(self) -> str:
+        """
+            Builds the exposition of the metrics of every live worker. The metrics of this
+            worker are current, the ones of the other workers are as old as their last snapshot.
+
+            Returns:
+                str: Exposition text.
+        """
+        snapshot = self.snapshot()
+        others = await asyncio.to_thread(self.read_snapshots)
+        return self.render(self.merge([snapshot] + others))
+
+
+    async def start(self) -> None:
+        """
+            Starts the background task that dumps the snapshots of this worker.
+        """
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name="metrics-snapshot")
+
+
+    async def stop(self) -> None:
+        """
+            Stops the background task and removes the snapshot of this worker.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        try:
+            os.remove(self.snapshot_path(os.getpid()))
+        except OSError:
+            pass
+
+
+    async def run(self) -> None:
+        """
+            Dumps the snapshot of this worker on the configured interval.
+        """
+        while True:
+            try:
+                await asyncio.to_thread(self.write_snapshot, self.snapshot())
+            except Exception as error:
+                LOGGER.error(f"Metrics snapshot could not be written: {error}")
+
+            await asyncio.sleep(SETTINGS.METRICS_SNAPSHOT_INTERVAL)
+
+
+
+METRICS_HELPER = MetricsHelper()
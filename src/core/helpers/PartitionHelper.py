@@ -0,0 +1,231 @@
+import re
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from typing import List, Type, Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from settings import SETTINGS
+from core.bases import Base, CONNECTION_DATABASE
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+
+class PartitionHelper:
+    """
+        Class that maintains the monthly range partitions of the models that
+        declare __partition_by__: it creates the partitions ahead of time and
+        drops the ones older than the retention period.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of PartitionHelper.
+        """
+        self.task: Union[asyncio.Task, None] = None
+
+
+    @staticmethod
+    def month_start(day: date, offset: int = 0) -> date:
+        """
+            Obtains the first day of the month of a date, moved by a number of months.
+
+            Args:
+                day (date): Reference date.
+                offset (int): Months to move, negative to move back.
+
+            Returns:
+                date: First day of the resulting month.
+        """
+        months = day.year * 12 + day.month - 1 + offset
+        return date(months // 12, months % 12 + 1, 1)
+
+
+    @staticmethod
+    def partition_name(table: str, month: date) -> str:
+        """
+            Builds the name of the partition holding a month.
+
+            Args:
+                table (str): Name of the partitioned table.
+                month (date): First day of the month.
+
+            Returns:
+                str: Partition name.
+        """
+        return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+    def partitioned_models(self) -> List[Type[Base]]:
+        """
+            Obtains the models that declare a partition key.
+
+            Returns:
+                List[Type[Base]]: Partitioned models.
+        """
+        return [
+            mapper.class_ for mapper in Base.registry.mappers
+            if getattr(mapper.class_, "__partition_by__", None)
+        ]
+
+
+    @staticmethod
+    def month_bound(month: date) -> str:
+        """
+            Builds the bound of a partition, the start of a month in UTC whatever the
+            TimeZone of the database session.
+
+            Args:
+                month (date): First day of the month.
+
+            Returns:
+                str: Timestamp literal with its offset.
+        """
+        return f"{month.isoformat()} 00:00:00+00"
+
+
+    async def ensure_partitions(self, connection: AsyncConnection, model: Type[Base], today: date) -> None:
+        """
+            Creates the DEFAULT partition, which takes the rows outside every monthly
+            partition, and the partitions from the current month up to the configured
+            number of months ahead. The rows a new month already has in the DEFAULT
+            partition are moved into it before it is attached.
+
+            Args:
+                connection (AsyncConnection): Connection to the primary database.
+                model (Type[Base]): Partitioned model.
+                today (date): Current date.
+        """
+        table, column = model.__tablename__, model.__partition_by__
+        default = f"{table}_default"
+
+        await connection.execute(text(f'CREATE TABLE IF NOT EXISTS "{default}" PARTITION OF "{table}" DEFAULT'))
+
+        for offset in range(SETTINGS.PARTITION_PREMAKE_MONTHS + 1):
+            month = self.month_start(today, offset)
+            partition = self.partition_name(table, month)
+            start, end = self.month_bound(month), self.month_bound(self.month_start(month, 1))
+
+            if await connection.scalar(text("SELECT to_regclass(:partition) IS NOT NULL"), {"partition": f'"{partition}"'}):
+                continue
+
+            await connection.execute(text(f'CREATE TABLE "{partition}" (LIKE "{table}" INCLUDING DEFAULTS)'))
+            await connection.execute(
+                text(
+                    f'WITH moved AS (DELETE FROM "{default}" WHERE "{column}" >= CAST(:start AS timestamptz) '
+                    f'AND "{column}" < CAST(:end AS timestamptz) RETURNING *) '
+                    f'INSERT INTO "{partition}" SELECT * FROM moved'
+                ),
+                {"start": start, "end": end}
+            )
+            await connection.execute(text(
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{partition}" '
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+
+
+    async def drop_expired(self, connection: AsyncConnection, table: str, today: date) -> List[str]:
+        """
+            Drops the partitions whose whole month is older than the retention period.
+            Dropping a partition is instant and leaves no dead rows to vacuum.
+
+            Args:
+                connection (AsyncConnection): Connection to the primary database.
+                table (str): Name of the partitioned table.
+                today (date): Current date.
+
+            Returns:
+                List[str]: Names of the dropped partitions.
+        """
+        if SETTINGS.PARTITION_RETENTION_MONTHS <= 0:
+            return []
+
+        cutoff = self.month_start(today, -SETTINGS.PARTITION_RETENTION_MONTHS)
+        pattern = re.compile(rf"^{re.escape(table)}_y(\d{{4}})m(\d{{2}})$")
+        partitions = await connection.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = CAST(:table AS regclass)"
+            ),
+            {"table": table}
+        )
+        dropped = []
+
+        for partition, in partitions.all():
+            match = pattern.match(partition)
+
+            if match and self.month_start(date(int(match[1]), int(match[2]), 1), 1) <= cutoff:
+                await connection.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{partition}"'))
+                await connection.execute(text(f'DROP TABLE "{partition}"'))
+                dropped.append(partition)
+
+        return dropped
+
+
+    async def maintain(self) -> None:
+        """
+            Creates the upcoming partitions and drops the expired ones of every
+            partitioned model. Workers are serialized with an advisory lock.
+        """
+        if CONNECTION_DATABASE.engine.dialect.name != "postgresql":
+            return
+
+        today = datetime.now(timezone.utc).date()
+
+        async with CONNECTION_DATABASE.engine.begin() as connection:
+            await connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('partition_maintenance'))"))
+
+            for model in self.partitioned_models():
+                table = model.__tablename__
+                await self.ensure_partitions(connection, model, today)
+                dropped = await self.drop_expired(connection, table, today)
+
+                if dropped:
+                    LOGGER.info(f"Dropped expired partitions of {table}: {', '.join(dropped)}")
+
+
+    async def start(self) -> None:
+        """
+            Runs the maintenance once and starts the background task that repeats it.
+            A failure is logged and the gateway keeps serving, the task retries it.
+        """
+        try:
+            await self.maintain()
+        except Exception as error:
+            LOGGER.error(f"Partition maintenance failed: {error}")
+
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name="partition-maintenance")
+
+
+    async def stop(self) -> None:
+        """
+            Stops the background maintenance task.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+    async def run(self) -> None:
+        """
+            Repeats the maintenance on the configured interval.
+        """
+        while True:
+            await asyncio.sleep(SETTINGS.PARTITION_MAINTENANCE_INTERVAL)
+
+            try:
+                await self.maintain()
+            except Exception as error:
+                LOGGER.error(f"Partition maintenance failed: {error}")
+
+
+
+PARTITION_HELPER = PartitionHelper()
@@ -4,12 +4,27 @@ from typing import List, Optional, Union, Set
 from fastapi import Depends, HTTPException, status
 
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import select, exists, union
 from sqlalchemy.orm import joinedload
 
 from core.middlewares.JwtMiddleware import OAUTH2
 from core.bases.BaseRepositories import BaseRepository
-from core.databases.Models import Users, Roles, Groups, Systems, Endpoints
+from core.databases.Models import (
+    Users,
+    Roles,
+    Groups,
+    Systems,
+    Endpoints,
+    MicroServices,
+    groups_roles,
+    users_roles,
+    users_groups,
+    users_systems,
+    endpoints_roles,
+    endpoints_groups
+)
+from core.helpers.TracingHelper import TRACING_HELPER
+from core.helpers.RouteCacheHelper import ROUTE_CACHE
 
 
 
@@ -64,7 +79,7 @@ class PermissionHelper(BaseRepository):
         if token is True:
             return True
 
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
                 user_data = await session.execute(select(Users).where(Users.email == token.get("email")))
                 user = user_data.scalar()
@@ -83,12 +98,12 @@ class PermissionHelper(BaseRepository):
             Returns:
                 Set[str]: Set of roles.
         """
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
                 roles = await session.execute(
-                    select(Roles.role_name).join(Users, Users.id == user_id)
+                    select(Roles.role_name).join(Roles.back_users_roles).where(Users.id == user_id)
                 )
-                return set(role for role, in roles.scalars())
+                return set(roles.scalars())
 
 
     async def get_user_groups(self, user_id: str) -> Set[str]:
@@ -101,12 +116,12 @@ class PermissionHelper(BaseRepository):
             Returns:
                 Set[str]: Set of roles.
         """
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
                 groups = await session.execute(
-                    select(Groups).join(Users, Users.id == user_id).options(joinedload(Groups.roles))
+                    select(Groups).join(Groups.back_users_groups).where(Users.id == user_id).options(joinedload(Groups.roles))
                 )
-                return set(role.role_name for group in groups.scalars() for role in group.roles)
+                return set(role.role_name for group in groups.unique().scalars() for role in group.roles)
 
 
     async def get_endpoint_roles(self, path: str) -> Set[str]:
@@ -119,11 +134,13 @@ class PermissionHelper(BaseRepository):
             Returns:
                 Set[str]: Set of roles.
         """
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
                 endpoint = await session.execute(select(Endpoints).where(Endpoints.endpoint_url == path).options(joinedload(Endpoints.roles)))
+                endpoint = endpoint.unique().scalar()
+
                 if endpoint:
-                    return set(role.role_name for role in endpoint.scalar().roles)
+                    return set(role.role_name for role in endpoint.roles)
                 else:
                     return set()
 
@@ -138,11 +155,10 @@ class PermissionHelper(BaseRepository):
             Returns:
                 Set[str]: Set of roles.
         """
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
-                endpoint_id = await session.execute(select(Endpoints.id).where(Endpoints.endpoint_url == path))
                 groups = await session.execute(
-                    select(Groups).join(Groups, Groups.endpoints_group_id == endpoint_id.scalar())
+                    select(Groups).join(Groups.back_endpoints_groups).where(Endpoints.endpoint_url == path)
                 )
                 return set(role.role_name for group in groups.scalars() for role in group.roles)
 
@@ -157,7 +173,7 @@ class PermissionHelper(BaseRepository):
             Returns:
                 Set[str]: Set of systems.
         """
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
                 user_systems = await session.execute(
                     select(Systems).join(Users.systems).where(Users.id == user_id)
@@ -181,14 +197,18 @@ class PermissionHelper(BaseRepository):
             Returns:
                 Set[str]: Set of systems.
         """
-        async with self.get_connection() as session:
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
                 systems = await session.execute(
-                    select(Systems.system_code).join(Endpoints, Systems.microservices_systems.any(Endpoints.endpoint_url == path))
+                    select(Systems.system_code)
+                    .join(MicroServices, MicroServices.microservice_system_id == Systems.id)
+                    .join(Endpoints, Endpoints.endpoint_microservice_id == MicroServices.id)
+                    .where(Endpoints.endpoint_url == path)
                 )
-                return set(system for system, in systems.scalars())
+                return set(systems.scalars())
 
 
+    @TRACING_HELPER.trace("user_access_control")
     async def user_access_control(self, user_id: int, path: str) -> bool:
         """
             Validates the access control of a user to a protected route.
@@ -203,41 +223,66 @@ class PermissionHelper(BaseRepository):
         if path in ["/administration/users/get_current_user", "/authentication/renew/token", "/authentication/keys/public_key"]:
             return True
 
-        async with self.get_connection() as session:
+        # Endpoints are registered without the prefix of the gateway router, by URL template
+        path = await ROUTE_CACHE.resolve(path)
+
+        async with self.get_connection(read_only=True) as session:
             async with session.begin():
-                user = await session.execute(
-                    select(Users).filter((Users.id == user_id) & (Users.is_active == True) & (Users.is_superuser == True))
+                superuser = await session.scalar(
+                    select(Users.id).where((Users.id == user_id) & (Users.is_active == True) & (Users.is_superuser == True))
                 )
-                if user.scalar():
+                if superuser:
                     return True
 
-                endpoint = await session.execute(select(Endpoints.endpoint_url).where(Endpoints.endpoint_url == path.replace("/gateway", "")))
-                if not endpoint.scalar():
+                endpoint = (
+                    await session.execute(
+                        select(Endpoints.id, MicroServices.microservice_system_id)
+                        .join(MicroServices, Endpoints.endpoint_microservice_id == MicroServices.id)
+                        .where(Endpoints.endpoint_url == path)
+                    )
+                ).first()
+                if endpoint is None:
                     raise HTTPException(
                         status_code=status.HTTP_404_NOT_FOUND,
                         detail={"message": "Endpoint not found."}
                     )
 
-        user_systems = await self.get_user_systems(user_id)
-
-        if not user_systems:
-            return False
-
-        microservice_system = await self.get_microservice_systems(path)
-
-        if user_systems & microservice_system:
-            user_roles = await self.get_user_roles(user_id)
-            user_groups = await self.get_user_groups(user_id)
-            endpoint_roles = await self.get_endpoint_roles(path)
-            endpoint_groups = await self.get_endpoint_groups(path)
-
-            if not (endpoint_roles or endpoint_groups):
-                return True
-
-            return bool((user_roles | user_groups) & (endpoint_roles | endpoint_groups))
-
-        return False
+                # The user must belong to the system of the microservice that serves the endpoint
+                in_system = await session.scalar(
+                    select(
+                        exists().where(
+                            (users_systems.c.user_id == user_id) &
+                            (users_systems.c.system_id == endpoint.microservice_system_id)
+                        )
+                    )
+                )
+                if not in_system:
+                    return False
+
+                # Roles of the endpoint and of its groups against roles of the user and of its groups,
+                # resolved by the database through the indexed association tables
+                required = union(
+                    select(endpoints_roles.c.role_id).where(endpoints_roles.c.endpoint_id == endpoint.id),
+                    select(groups_roles.c.role_id)
+                    .join(endpoints_groups, endpoints_groups.c.group_id == groups_roles.c.group_id)
+                    .where(endpoints_groups.c.endpoint_id == endpoint.id)
+                )
+                granted = union(
+                    select(users_roles.c.role_id).where(users_roles.c.user_id == user_id),
+                    select(groups_roles.c.role_id)
+                    .join(users_groups, users_groups.c.group_id == groups_roles.c.group_id)
+                    .where(users_groups.c.user_id == user_id)
+                )
+                restricted, allowed = (
+                    await session.execute(
+                        select(
+                            exists().where(Roles.id.in_(required)),
+                            exists().where(Roles.id.in_(required) & Roles.id.in_(granted))
+                        )
+                    )
+                ).one()
 
+                return not restricted or allowed
 
 
 PERMISSION_HELPER = PermissionHelper()
@@ -0,0 +1,230 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import statistics
+from types import FrameType
+from collections import Counter
+from typing import Any, Dict, List, Union
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+
+class SlowCallbackHandler(logging.Handler):
+    """
+        Collects the slow callback warnings asyncio logs in debug mode. The record
+        arguments are the formatted handle, which names the coroutine of the task,
+        and the duration of the callback in seconds.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.callbacks: List[Dict[str, Any]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.msg.startswith("Executing") and isinstance(record.args, tuple) and len(record.args) == 2:
+            handle, seconds = record.args
+            self.callbacks.append({"callback": str(handle), "duration_ms": round(seconds * 1000, 3)})
+
+
+
+class ProfilingHelper:
+    """
+        Class that profiles the worker it runs on for a bounded time: a thread samples
+        the Python stacks of every thread, a task samples what each asyncio task is
+        awaiting and measures the scheduling lag of the event loop, and the asyncio
+        debug mode reports the callbacks that blocked the loop. Stacks are returned in
+        the collapsed format read by flamegraph.pl, speedscope and most flamegraph tools.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of ProfilingHelper.
+        """
+        self.lock = asyncio.Lock()
+
+
+    @staticmethod
+    def frame_name(frame: FrameType) -> str:
+        """
+            Names a frame by its function and the file and line where the function starts,
+            so every sample of the same function aggregates under one name.
+
+            Args:
+                frame (FrameType): Stack frame.
+
+            Returns:
+                str: Frame name.
+        """
+        code = frame.f_code
+        return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+    def collapse(self, frame: Union[FrameType, None], limit: int = 128) -> List[str]:
+        """
+            Converts a stack into the list of its frame names, outermost first.
+
+            Args:
+                frame (FrameType, optional): Innermost frame of the stack.
+                limit (int): Maximum number of frames kept, the outermost are discarded.
+
+            Returns:
+                List[str]: Frame names.
+        """
+        names = []
+
+        while frame is not None and len(names) < limit:
+            names.append(self.frame_name(frame))
+            frame = frame.f_back
+
+        return names[::-1]
+
+
+    @staticmethod
+    def coroutine_stack(task: asyncio.Task) -> List[str]:
+        """
+            Follows the chain of awaited coroutines of a task down to the one currently suspended.
+
+            Args:
+                task (asyncio.Task): Task to inspect.
+
+            Returns:
+                List[str]: Names of the coroutines, outermost first.
+        """
+        names = []
+        awaitable = task.get_coro()
+
+        while awaitable is not None and len(names) < 128:
+            names.append(getattr(awaitable, "__qualname__", type(awaitable).__name__))
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+
+        return names
+
+
+    def sample_threads(self, stop: threading.Event, interval: float, stacks: Counter) -> None:
+        """
+            Samples the stacks of every thread but its own until stopped. Runs in its own
+            thread, so it also captures the event loop while it is blocked.
+
+            Args:
+                stop (threading.Event): Event that ends the sampling.
+                interval (float): Seconds between samples.
+                stacks (Counter): Counter the collapsed stacks are added to.
+        """
+        own = threading.get_ident()
+
+        while not stop.wait(interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    stacks[";".join([names.get(ident, str(ident)), *self.collapse(frame)])] += 1
+
+
+    async def sample_loop(self, deadline: float, interval: float, tasks: Counter, lags: List[float]) -> None:
+        """
+            Samples the awaited coroutines of the asyncio tasks and the scheduling lag of
+            the event loop, the delay between when a sleep should end and when it ends.
+
+            Args:
+                deadline (float): Monotonic time at which the sampling ends.
+                interval (float): Seconds between samples.
+                tasks (Counter): Counter the collapsed coroutine stacks are added to.
+                lags (List[float]): List the lags in milliseconds are appended to.
+        """
+        current = asyncio.current_task()
+
+        while time.monotonic() < deadline:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            lags.append(max(time.monotonic() - expected, 0.0) * 1000)
+
+            for task in asyncio.all_tasks():
+                if task is not current and not task.done():
+                    tasks[";".join([task.get_name(), *self.coroutine_stack(task)])] += 1
+
+
+    @staticmethod
+    def render(stacks: Counter) -> str:
+        """
+            Renders stacks in the collapsed format, one "frame;frame;frame count" line per stack.
+
+            Args:
+                stacks (Counter): Samples of every stack.
+
+            Returns:
+                str: Collapsed stacks.
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+    async def profile(self, seconds: float, interval: float, slow_callback: float) -> Dict[str, Any]:
+        """
+            Profiles this worker for a number of seconds while it keeps serving requests.
+
+            Args:
+                seconds (float): Duration of the profile.
+                interval (float): Seconds between samples.
+                slow_callback (float): Seconds a callback may run before it is reported as blocking the loop.
+
+            Returns:
+                Dict[str, Any]: Collapsed thread and task stacks, event loop lag and slow callbacks.
+        """
+        loop = asyncio.get_running_loop()
+        debug, duration = loop.get_debug(), loop.slow_callback_duration
+        handler = SlowCallbackHandler()
+        asyncio_logger = logging.getLogger("asyncio")
+
+        stacks: Counter = Counter()
+        tasks: Counter = Counter()
+        lags: List[float] = []
+
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self.sample_threads, args=(stop, interval, stacks), name="profiling-sampler", daemon=True
+        )
+
+        asyncio_logger.addHandler(handler)
+        loop.slow_callback_duration = slow_callback
+        loop.set_debug(True)
+        sampler.start()
+        started = time.monotonic()
+
+        try:
+            await self.sample_loop(started + seconds, interval, tasks, lags)
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+            loop.set_debug(debug)
+            loop.slow_callback_duration = duration
+            asyncio_logger.removeHandler(handler)
+
+        if handler.callbacks:
+            LOGGER.warning(f"{len(handler.callbacks)} callbacks blocked the event loop during the profile")
+
+        lags.sort()
+
+        return {
+            "pid": os.getpid(),
+            "seconds": round(time.monotonic() - started, 3),
+            "interval": interval,
+            "samples": sum(stacks.values()),
+            "stacks": self.render(stacks),
+            "tasks": self.render(tasks),
+            "loop_lag_ms": {
+                "samples": len(lags),
+                "mean": round(statistics.fmean(lags), 3) if lags else 0.0,
+                "p99": round(lags[min(int(len(lags) * 0.99), len(lags) - 1)], 3) if lags else 0.0,
+                "max": round(lags[-1], 3) if lags else 0.0,
+            },
+            "slow_callbacks": sorted(handler.callbacks, key=lambda callback: callback["duration_ms"], reverse=True),
+        }
+
+
+
+PROFILING_HELPER = ProfilingHelper()
@@ -0,0 +1,493 @@
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Tuple, Union
+
+from sqlalchemy import select, union
+
+from settings import SETTINGS
+from core.bases.BaseRepositories import BaseRepository
+from core.helpers.MetricsHelper import METRICS_HELPER
+from core.databases.Models import (
+    Users,
+    Endpoints,
+    MicroServices,
+    groups_roles,
+    users_roles,
+    users_groups,
+    users_systems,
+    endpoints_roles,
+    endpoints_groups
+)
+
+
+LOGGER = logging.getLogger("fastapi")
+
+
+def to_int(segment: str) -> Union[int, None]:
+    return int(segment) if segment.isascii() and segment.isdigit() else None
+
+
+def to_uuid(segment: str) -> Union[uuid.UUID, None]:
+    try:
+        return uuid.UUID(segment)
+    except ValueError:
+        return None
+
+
+# Types of the template parameters ({name:type}) by priority, a segment is tried
+# against the static segments first, then against each type in this order
+PARAMETER_TYPES: Dict[str, Callable[[str], Any]] = {
+    "int": to_int,
+    "uuid": to_uuid,
+    "str": lambda segment: segment or None,
+}
+
+
+class RouteNode:
+    """
+        Node of the route tree: one segment of the path.
+    """
+
+    __slots__ = ("static", "parameters", "catch_all", "template", "names")
+
+
+    def __init__(self) -> None:
+        self.static: Dict[str, "RouteNode"] = {}
+        self.parameters: Dict[str, "RouteNode"] = {}
+        self.catch_all: Union[Tuple[str, List[str]], None] = None
+        self.template: Union[str, None] = None
+        self.names: List[str] = []
+
+
+
+class RouteTree:
+    """
+        Radix tree of the endpoint URLs split by segment. Templates like
+        /orders/{id:int}/items/{item} have typed parameters (int, uuid and str, the
+        default) and can end with a {name:path} parameter that takes the rest of the
+        path. A lookup walks one node per segment, so its cost depends on the length of
+        the path and not on the number of endpoints. At every segment a static match
+        wins over a parameter, and the parameter types are tried by their priority in
+        PARAMETER_TYPES, going back to the next candidate when a branch does not match.
+    """
+
+
+    def __init__(self, templates: Iterable[str]) -> None:
+        """
+            Initializes an instance of RouteTree.
+
+            Args:
+                templates (Iterable[str]): Endpoint URLs, with or without parameters.
+        """
+        self.root = RouteNode()
+
+        for template in templates:
+            if "{" in template:
+                try:
+                    self.insert(template)
+                except ValueError as error:
+                    LOGGER.warning(f"The endpoint URL {template} is not a valid template, it only matches itself: {error}")
+                    self.insert_static(template)
+            else:
+                self.insert_static(template)
+
+
+    def insert_static(self, template: str) -> None:
+        """
+            Args:
+                template (str): Endpoint URL matched as is.
+        """
+        node = self.root
+
+        for segment in template.split("/")[1:]:
+            node = node.static.setdefault(segment, RouteNode())
+
+        node.template, node.names = template, []
+
+
+    def insert(self, template: str) -> None:
+        """
+            Args:
+                template (str): Endpoint URL with parameters.
+
+            Raises:
+                ValueError: If a parameter has an unknown type, or a path parameter is not the last segment.
+        """
+        node, names = self.root, []
+        segments = template.split("/")[1:]
+
+        for index, segment in enumerate(segments):
+            if not (segment.startswith("{") and segment.endswith("}")):
+                node = node.static.setdefault(segment, RouteNode())
+                continue
+
+            name, _, kind = segment[1:-1].partition(":")
+            kind = kind or "str"
+            names.append(name)
+
+            if kind == "path":
+                if index != len(segments) - 1:
+                    raise ValueError("a path parameter must be the last segment")
+
+                node.catch_all = (template, names)
+                return
+
+            if kind not in PARAMETER_TYPES:
+                raise ValueError(f"unknown parameter type {kind}")
+
+            node = node.parameters.setdefault(kind, RouteNode())
+
+        node.template, node.names = template, names
+
+
+    def match(self, path: str) -> Union[Tuple[str, Dict[str, Any]], None]:
+        """
+            Finds the endpoint of a path.
+
+            Args:
+                path (str): Requested path, without the prefix of the gateway router.
+
+            Returns:
+                Tuple[str, Dict[str, Any]]: Matched endpoint URL and the typed values of its
+                parameters, None if no endpoint matches.
+        """
+        return self.walk(self.root, path.split("/")[1:], 0, [])
+
+
+    def walk(self, node: RouteNode, segments: List[str], index: int, values: List[Any]) -> Union[Tuple[str, Dict[str, Any]], None]:
+        """
+            Matches the segments from index on below a node.
+
+            Args:
+                node (RouteNode): Node of the previous segment.
+                segments (List[str]): Segments of the path.
+                index (int): First segment to match.
+                values (List[Any]): Values of the parameters matched so far.
+
+            Returns:
+                Tuple[str, Dict[str, Any]]: Matched endpoint URL and its parameters, None if none matches.
+        """
+        if index == len(segments):
+            return (node.template, dict(zip(node.names, values))) if node.template is not None else None
+
+        segment = segments[index]
+        child = node.static.get(segment)
+
+        if child is not None:
+            matched = self.walk(child, segments, index + 1, values)
+
+            if matched is not None:
+                return matched
+
+        for kind in PARAMETER_TYPES:
+            child = node.parameters.get(kind)
+
+            if child is not None:
+                value = PARAMETER_TYPES[kind](segment)
+
+                if value is not None:
+                    matched = self.walk(child, segments, index + 1, values + [value])
+
+                    if matched is not None:
+                        return matched
+
+        if node.catch_all is not None:
+            template, names = node.catch_all
+            return template, dict(zip(names, values + ["/".join(segments[index:])]))
+
+        return None
+
+
+
+class CachedRoute:
+    """
+        Endpoint as seen by the access control: its microservice, its system and the
+        roles that grant access to it, directly or through its groups.
+    """
+
+    __slots__ = ("endpoint_id", "url", "authenticated", "base_url", "system_id", "multiplex", "roles")
+
+
+    def __init__(
+        self,
+        endpoint_id: int,
+        url: str,
+        authenticated: bool,
+        base_url: str,
+        system_id: Union[int, None],
+        multiplex: bool = False
+    ) -> None:
+        self.endpoint_id = endpoint_id
+        self.url = url
+        self.authenticated = authenticated
+        self.base_url = base_url
+        self.system_id = system_id
+        self.multiplex = multiplex
+        self.roles: FrozenSet[int] = frozenset()
+
+
+
+class CachedUser:
+    """
+        User as seen by the access control: its flags, its roles, directly or through
+        its groups, and its systems.
+    """
+
+    __slots__ = ("superuser", "roles", "systems", "expires_at")
+
+
+    def __init__(self, superuser: bool, roles: FrozenSet[int], systems: FrozenSet[int]) -> None:
+        self.superuser = superuser
+        self.roles = roles
+        self.systems = systems
+        self.expires_at = time.monotonic() + SETTINGS.ROUTE_CACHE_TTL
+
+
+
+class RouteCacheHelper(BaseRepository):
+    """
+        Class that keeps the routes and the grants of the recently seen users in memory,
+        so the access control of a WebSocket handshake, and of its periodic re-checks,
+        does not query the database. The routes are reloaded as a whole and the users
+        one by one once they are older than the TTL, and concurrent misses of the same
+        entry share a single load, so a reconnect storm costs one query per user. The
+        routes are also compiled into a RouteTree, which resolves a requested path to the
+        endpoint URL template it matches for every lookup by endpoint.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of RouteCacheHelper.
+        """
+        super().__init__()
+        self.routes: Dict[str, CachedRoute] = {}
+        self.tree = RouteTree([])
+        self.routes_expire_at = 0.0
+        self.routes_lock = asyncio.Lock()
+        self.users: "OrderedDict[int, CachedUser]" = OrderedDict()
+        self.loading: Dict[int, asyncio.Future] = {}
+
+
+    def invalidate(self) -> None:
+        """
+            Discards every cached entry, the next lookups reload them.
+        """
+        self.routes_expire_at = 0.0
+        self.users.clear()
+
+
+    async def load_routes(self) -> Dict[str, CachedRoute]:
+        """
+            Loads every endpoint with its microservice and the roles that grant access to it.
+
+            Returns:
+                Dict[str, CachedRoute]: Routes by endpoint URL.
+        """
+        async with self.get_connection(read_only=True) as session:
+            async with session.begin():
+                endpoints = await session.execute(
+                    select(
+                        Endpoints.id,
+                        Endpoints.endpoint_url,
+                        Endpoints.endpoint_authenticated,
+                        MicroServices.microservice_base_url,
+                        MicroServices.microservice_system_id,
+                        MicroServices.microservice_websocket_multiplex
+                    ).join(MicroServices, Endpoints.endpoint_microservice_id == MicroServices.id)
+                )
+                grants = await session.execute(
+                    union(
+                        select(endpoints_roles.c.endpoint_id, endpoints_roles.c.role_id),
+                        select(endpoints_groups.c.endpoint_id, groups_roles.c.role_id)
+                        .join(groups_roles, groups_roles.c.group_id == endpoints_groups.c.group_id)
+                    )
+                )
+
+                routes, by_id, roles = {}, {}, {}
+
+                for endpoint_id, url, authenticated, base_url, system_id, multiplex in endpoints:
+                    routes[url] = by_id[endpoint_id] = CachedRoute(
+                        endpoint_id, url, authenticated is not False, base_url, system_id, bool(multiplex)
+                    )
+
+                for endpoint_id, role_id in grants:
+                    roles.setdefault(endpoint_id, set()).add(role_id)
+
+                for endpoint_id, role_ids in roles.items():
+                    if endpoint_id in by_id:
+                        by_id[endpoint_id].roles = frozenset(role_ids)
+
+                return routes
+
+
+    async def load_user(self, user_id: int) -> Union[CachedUser, None]:
+        """
+            Loads the grants of a user and caches them.
+
+            Args:
+                user_id (int): User ID.
+
+            Returns:
+                CachedUser: Grants of the user, None if the user does not exist.
+        """
+        async with self.get_connection(read_only=True) as session:
+            async with session.begin():
+                user = (
+                    await session.execute(select(Users.is_active, Users.is_superuser).where(Users.id == user_id))
+                ).first()
+
+                if user is None:
+                    self.users.pop(user_id, None)
+                    return None
+
+                roles = await session.execute(
+                    union(
+                        select(users_roles.c.role_id).where(users_roles.c.user_id == user_id),
+                        select(groups_roles.c.role_id)
+                        .join(users_groups, users_groups.c.group_id == groups_roles.c.group_id)
+                        .where(users_groups.c.user_id == user_id)
+                    )
+                )
+                systems = await session.execute(select(users_systems.c.system_id).where(users_systems.c.user_id == user_id))
+
+                cached = CachedUser(
+                    bool(user.is_active and user.is_superuser),
+                    frozenset(roles.scalars()),
+                    frozenset(systems.scalars())
+                )
+
+        self.users[user_id] = cached
+        self.users.move_to_end(user_id)
+
+        while len(self.users) > SETTINGS.ROUTE_CACHE_USERS:
+            self.users.popitem(last=False)
+
+        return cached
+
+
+    async def refresh_routes(self) -> None:
+        """
+            Reloads the routes and their tree when they are older than the TTL.
+        """
+        if time.monotonic() >= self.routes_expire_at:
+            async with self.routes_lock:
+                if time.monotonic() >= self.routes_expire_at:
+                    METRICS_HELPER.route_cache.inc("routes", "miss")
+                    self.routes = await self.load_routes()
+                    self.tree = RouteTree(self.routes)
+                    self.routes_expire_at = time.monotonic() + SETTINGS.ROUTE_CACHE_TTL
+        else:
+            METRICS_HELPER.route_cache.inc("routes", "hit")
+
+
+    async def match(self, path: str) -> Tuple[str, Dict[str, Any]]:
+        """
+            Resolves a requested path to the endpoint URL it matches.
+
+            Args:
+                path (str): Requested path, without the prefix of the gateway router.
+
+            Returns:
+                Tuple[str, Dict[str, Any]]: Endpoint URL, a template when it has parameters,
+                and the typed values of the parameters. The path itself when no cached route
+                matches, so an endpoint added since the last reload is still found by URL.
+        """
+        await self.refresh_routes()
+        return self.tree.match(path) or (path, {})
+
+
+    async def resolve(self, path: str) -> str:
+        """
+            Resolves the full path of a request to the endpoint URL checked by the access
+            control. Only the paths of the gateway router are matched against the URL
+            templates, any other path (administration, monitoring...) is looked up as is,
+            so a template can never make them public.
+
+            Args:
+                path (str): Requested path, with the prefix of the gateway router.
+
+            Returns:
+                str: Endpoint URL.
+        """
+        if not path.startswith("/gateway/"):
+            return path
+
+        template, _ = await self.match(path.removeprefix("/gateway"))
+        return template
+
+
+    async def route(self, path: str) -> Union[CachedRoute, None]:
+        """
+            Obtains the route of a requested path.
+
+            Args:
+                path (str): Requested path, without the prefix of the gateway router.
+
+            Returns:
+                CachedRoute: The route, None if no endpoint matches the path.
+        """
+        template, _ = await self.match(path)
+        return self.routes.get(template)
+
+
+    async def user(self, user_id: int) -> Union[CachedUser, None]:
+        """
+            Obtains the grants of a user, loading them when missing or older than the TTL.
+
+            Args:
+                user_id (int): User ID.
+
+            Returns:
+                CachedUser: Grants of the user, None if the user does not exist.
+        """
+        cached = self.users.get(user_id)
+
+        if cached is not None and time.monotonic() < cached.expires_at:
+            METRICS_HELPER.route_cache.inc("users", "hit")
+            self.users.move_to_end(user_id)
+            return cached
+
+        METRICS_HELPER.route_cache.inc("users", "miss")
+        loading = self.loading.get(user_id)
+
+        if loading is None:
+            loading = self.loading[user_id] = asyncio.ensure_future(self.load_user(user_id))
+            loading.add_done_callback(lambda _: self.loading.pop(user_id, None))
+
+        return await asyncio.shield(loading)
+
+
+    async def authorize(self, user_id: int, path: str) -> bool:
+        """
+            Validates the access of a user to an endpoint with the same rules as
+            PermissionHelper.user_access_control, from the cached structures.
+
+            Args:
+                user_id (int): User ID.
+                path (str): Requested path, without the prefix of the gateway router.
+
+            Returns:
+                bool: True if the user has access, False otherwise.
+        """
+        user = await self.user(user_id)
+
+        if user is None:
+            return False
+
+        if user.superuser:
+            return True
+
+        route = await self.route(path)
+
+        if route is None or route.system_id not in user.systems:
+            return False
+
+        return not route.roles or not route.roles.isdisjoint(user.roles)
+
+
+
+ROUTE_CACHE = RouteCacheHelper()
@@ -0,0 +1,65 @@
+from typing import List, Tuple, Type, Union
+
+from sqlalchemy import func, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from core.bases import Base
+from core.databases.SearchIndexes import fulltext_query, fulltext_vector
+
+
+
+class SearchHelper:
+    """
+        Helper class that translates a search term into predicates backed by
+        the search indexes declared on the models, together with a relevance rank.
+    """
+
+    def build(
+        self,
+        model: Type[Base],
+        search: str,
+        search_fields: List[str],
+        dialect: str
+    ) -> Tuple[ColumnElement, Union[ColumnElement, None]]:
+        """
+            Builds the search predicate and its rank. On PostgreSQL, columns declared in
+            __fulltext_search__ are matched by words with ts_rank, columns declared in
+            __trigram_search__ are matched by substring with similarity and any other
+            column falls back to a plain ILIKE.
+
+            Args:
+                model (Type[Base]): SQLAlchemy model to search.
+                search (str): Search term.
+                search_fields (List[str]): Field names where the search will be performed.
+                dialect (str): Name of the database dialect.
+
+            Returns:
+                Tuple[ColumnElement, Union[ColumnElement, None]]: Predicate and rank (None if no field is ranked).
+        """
+        filters = []
+        ranks = []
+
+        for field in search_fields:
+            column = getattr(model, field)
+
+            if dialect == "postgresql" and field in model.__fulltext_search__:
+                query = fulltext_query(search)
+                filters.append(fulltext_vector(column).op("@@")(query))
+                ranks.append(func.ts_rank(fulltext_vector(column), query))
+
+            elif dialect == "postgresql" and field in model.__trigram_search__:
+                # The GIN trigram index serves ILIKE with leading wildcards
+                filters.append(column.ilike(f"%{search}%"))
+                ranks.append(func.similarity(column, search))
+
+            else:
+                filters.append(column.ilike(f"%{search}%"))
+
+        if not ranks:
+            return or_(*filters), None
+
+        return or_(*filters), ranks[0] if len(ranks) == 1 else func.greatest(*ranks)
+
+
+
+SEARCH_HELPER = SearchHelper()
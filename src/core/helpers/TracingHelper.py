@@ -0,0 +1,440 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import functools
+import contextlib
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Iterator, List, Union
+
+from httpx import AsyncClient
+
+from settings import SETTINGS
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+CURRENT_SPAN: ContextVar[Union["Span", None]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+        Timed stage of a request. Spans of the same request share the trace ID
+        and the root span, which collects the finished stages for Server-Timing.
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "root", "kind", "start", "end", "attributes", "error", "children")
+
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Union[str, None],
+        sampled: bool,
+        root: Union["Span", None] = None,
+        attributes: Union[Dict[str, Any], None] = None
+    ) -> None:
+        """
+            Initializes an instance of Span and starts its clock.
+
+            Args:
+                name (str): Name of the stage.
+                trace_id (str): 32 hex characters trace ID.
+                parent_id (str, optional): ID of the parent span.
+                sampled (bool): Whether the span is exported.
+                root (Span, optional): Root span of the request, None if this span is the root.
+                attributes (Dict[str, Any], optional): Attributes of the span.
+        """
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.root = root or self
+        self.kind = 2 if root is None else 1  # OTLP span kind: SERVER for the root, INTERNAL otherwise
+        self.start = time.time_ns()
+        self.end: Union[int, None] = None
+        self.attributes = attributes or {}
+        self.error: Union[str, None] = None
+        self.children: List["Span"] = []
+
+
+    def set(self, key: str, value: Any) -> None:
+        """
+            Sets an attribute of the span.
+
+            Args:
+                key (str): Attribute name.
+                value (Any): Attribute value.
+        """
+        self.attributes[key] = value
+
+
+    @property
+    def duration_ms(self) -> float:
+        """
+            Obtains the duration of the span in milliseconds.
+
+            Returns:
+                float: Duration, up to now if the span has not finished.
+        """
+        return ((self.end or time.time_ns()) - self.start) / 1e6
+
+
+    @property
+    def traceparent(self) -> str:
+        """
+            Builds the W3C traceparent header that makes this span the parent of the callee.
+
+            Returns:
+                str: traceparent header value.
+        """
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+    def export(self) -> Dict[str, Any]:
+        """
+            Converts the span to the OTLP JSON representation.
+
+            Returns:
+                Dict[str, Any]: OTLP span.
+        """
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}} for key, value in self.attributes.items()
+            ],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+
+        return span
+
+
+
+class TracingHelper:
+    """
+        Class that instruments the stages of the requests with spans. The current span
+        lives in a context variable, the W3C traceparent header links the spans with
+        the caller and the upstream services, and finished spans are exported in
+        batches by a background task so exporting never delays a request.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of TracingHelper.
+        """
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SETTINGS.TRACING_QUEUE_SIZE)
+        self.task: Union[asyncio.Task, None] = None
+        self.file_handler: Union[RotatingFileHandler, None] = None
+        self.dropped = 0
+
+
+    @staticmethod
+    def parse_traceparent(header: Union[str, None]) -> Union[tuple, None]:
+        """
+            Parses a W3C traceparent header.
+
+            Args:
+                header (str, optional): traceparent header value.
+
+            Returns:
+                tuple: Trace ID, parent span ID and sampled flag, None if the header is missing or invalid.
+        """
+        if not header:
+            return None
+
+        parts = header.strip().lower().split("-")
+
+        if len(parts) < 4 or parts[0] == "ff" or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+            return None
+
+        try:
+            int(parts[1], 16), int(parts[2], 16)
+            flags = int(parts[3], 16)
+        except ValueError:
+            return None
+
+        if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+            return None
+
+        return parts[1], parts[2], bool(flags & 1)
+
+
+    @contextlib.contextmanager
+    def request(self, name: str, traceparent: Union[str, None] = None, **attributes: Any) -> Iterator[Span]:
+        """
+            Measures a request with a root span, continuing the trace of the caller when it sent a traceparent.
+
+            Args:
+                name (str): Name of the span.
+                traceparent (str, optional): traceparent header of the request.
+                **attributes (Any): Attributes of the span.
+
+            Yields:
+                Span: Root span, set as the current span.
+        """
+        parent = self.parse_traceparent(traceparent)
+
+        if parent:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = random.random() < SETTINGS.TRACING_SAMPLE_RATE
+
+        span = Span(name, trace_id, parent_id, sampled, attributes=attributes)
+        token = CURRENT_SPAN.set(span)
+
+        try:
+            yield span
+        except BaseException as error:
+            span.error = repr(error)
+            raise
+        finally:
+            CURRENT_SPAN.reset(token)
+            self.finish(span)
+
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Union[Span, None]]:
+        """
+            Measures a stage as a child of the current span. Outside a request it does nothing.
+
+            Args:
+                name (str): Name of the stage.
+                **attributes (Any): Attributes of the span.
+
+            Yields:
+                Span: The stage span, None when there is no current span.
+        """
+        parent = CURRENT_SPAN.get()
+
+        if parent is None:
+            yield None
+            return
+
+        span = Span(name, parent.trace_id, parent.span_id, parent.sampled, parent.root, attributes)
+        token = CURRENT_SPAN.set(span)
+
+        try:
+            yield span
+        except BaseException as error:
+            span.error = repr(error)
+            raise
+        finally:
+            CURRENT_SPAN.reset(token)
+            self.finish(span)
+            span.root.children.append(span)
+
+
+    def trace(self, name: str) -> Callable:
+        """
+            Decorator that measures every call of a coroutine function as a stage.
+
+            Args:
+                name (str): Name of the stage.
+
+            Returns:
+                Callable: Decorator.
+        """
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return await function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+
+    def inject(self, headers: Dict[str, Any]) -> Dict[str, Any]:
+        """
+            Adds the traceparent of the current span to the headers of an upstream request.
+
+            Args:
+                headers (Dict[str, Any]): Headers of the upstream request.
+
+            Returns:
+                Dict[str, Any]: The same headers.
+        """
+        span = CURRENT_SPAN.get()
+
+        if span is not None:
+            headers["traceparent"] = span.traceparent
+
+        return headers
+
+
+    @staticmethod
+    def server_timing(root: Span) -> str:
+        """
+            Builds the Server-Timing header from the stages of a request. Stages
+            measured more than once (for example several lookups) are added up.
+
+            Args:
+                root (Span): Root span of the request.
+
+            Returns:
+                str: Server-Timing header value.
+        """
+        durations: Dict[str, float] = {}
+
+        for span in root.children:
+            durations[span.name] = durations.get(span.name, 0.0) + span.duration_ms
+
+        metrics = [f"{name};dur={duration:.3f}" for name, duration in durations.items()]
+        metrics.append(f"total;dur={root.duration_ms:.3f}")
+        return ", ".join(metrics)
+
+
+    def finish(self, span: Span) -> None:
+        """
+            Ends a span and queues it for export if its trace is sampled.
+
+            Args:
+                span (Span): Span to end.
+        """
+        span.end = time.time_ns()
+
+        if not span.sampled or SETTINGS.TRACING_EXPORTER == "none":
+            return
+
+        try:
+            self.queue.put_nowait(span)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+    async def start(self) -> None:
+        """
+            Starts the background task that exports the finished spans.
+        """
+        if SETTINGS.TRACING_ENABLED and SETTINGS.TRACING_EXPORTER != "none" and self.task is None:
+            self.task = asyncio.create_task(self.run(), name="tracing-exporter")
+
+
+    async def stop(self) -> None:
+        """
+            Stops the background task and exports the spans still pending.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        while not self.queue.empty():
+            await self.export(self.take(SETTINGS.TRACING_BATCH_SIZE))
+
+        if self.file_handler is not None:
+            self.file_handler.close()
+            self.file_handler = None
+
+
+    def take(self, size: int) -> List[Span]:
+        """
+            Takes up to size spans already in the queue.
+
+            Args:
+                size (int): Maximum number of spans.
+
+            Returns:
+                List[Span]: Spans taken.
+        """
+        spans = []
+
+        while len(spans) < size and not self.queue.empty():
+            spans.append(self.queue.get_nowait())
+
+        return spans
+
+
+    async def run(self) -> None:
+        """
+            Exports the finished spans on the configured interval, in as many batches
+            as it takes to empty the queue, so the export keeps up with any request rate.
+        """
+        while True:
+            spans = [await self.queue.get()]
+            await asyncio.sleep(SETTINGS.TRACING_FLUSH_INTERVAL)
+            spans += self.take(SETTINGS.TRACING_BATCH_SIZE - 1)
+
+            while spans:
+                await asyncio.shield(self.export(spans))
+                spans = self.take(SETTINGS.TRACING_BATCH_SIZE)
+
+
+    async def export(self, spans: List[Span]) -> None:
+        """
+            Exports a batch of spans in the OTLP JSON format, appended to the trace
+            file or sent to an OTLP/HTTP collector. A batch that cannot be exported
+            is discarded.
+
+            Args:
+                spans (List[Span]): Spans to export.
+        """
+        if not spans:
+            return
+
+        payload = {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [{"key": "service.name", "value": {"stringValue": SETTINGS.PROJECT_NAME}}]
+                },
+                "scopeSpans": [{
+                    "scope": {"name": "api-gateway"},
+                    "spans": [span.export() for span in spans],
+                }],
+            }]
+        }
+
+        try:
+            if SETTINGS.TRACING_EXPORTER == "otlp":
+                async with AsyncClient() as client:
+                    response = await client.post(SETTINGS.TRACING_OTLP_ENDPOINT, json=payload, timeout=5.0)
+                    response.raise_for_status()
+            else:
+                await asyncio.to_thread(self.write, payload)
+
+        except Exception as error:
+            LOGGER.error(f"Batch of {len(spans)} spans could not be exported: {error}")
+
+
+    def write(self, payload: Dict[str, Any]) -> None:
+        """
+            Appends an export request to the trace file, one JSON document per line.
+            The file is rotated by size like the log files, so it never grows without bound.
+
+            Args:
+                payload (Dict[str, Any]): OTLP export request.
+        """
+        if self.file_handler is None:
+            path = SETTINGS.TRACING_EXPORT_FILE or os.path.join(os.getcwd(), "logs", "traces.jsonl")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            self.file_handler = RotatingFileHandler(
+                path,
+                maxBytes=SETTINGS.TRACING_EXPORT_FILE_MAX_MB * 1024 * 1024,
+                backupCount=SETTINGS.TRACING_EXPORT_FILE_BACKUPS,
+                encoding="utf-8",
+                delay=True
+            )
+
+        self.file_handler.handle(logging.makeLogRecord({"msg": json.dumps(payload)}))
+
+
+
+TRACING_HELPER = TracingHelper()
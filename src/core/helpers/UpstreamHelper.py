@@ -0,0 +1,253 @@
+import time
+import asyncio
+import logging
+from urllib.parse import urlsplit
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple, Union
+
+from httpx import AsyncClient, Limits, PoolTimeout, ReadError, RemoteProtocolError, Response, Timeout, WriteError
+
+from settings import SETTINGS
+from core.helpers.MetricsHelper import METRICS_HELPER
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+# Errors of a server that closes the connection on the HTTP/2 preface it does not understand
+PRIOR_KNOWLEDGE_ERRORS = (RemoteProtocolError, ReadError, WriteError)
+
+
+class UpstreamHelper:
+    """
+        Class that keeps the HTTP clients the proxy shares across requests, so the
+        connections to the microservices are reused instead of opened per request.
+        Microservices with HTTP/2 enabled multiplex their requests as streams over a
+        few connections: negotiated through ALPN over TLS, which falls back to HTTP/1.1
+        on its own, and with prior knowledge (h2c) over plain HTTP, which falls back to
+        HTTP/1.1 for a while when the microservice rejects it. A semaphore per
+        microservice bounds its concurrent streams, the requests over the limit wait
+        for a free one instead of opening more connections. Every microservice has
+        its own pools, and its event streams, which hold a connection for as long as
+        they last, have a pool of their own, so they never starve the other requests.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of UpstreamHelper.
+        """
+        self.clients: Dict[Tuple[str, str, bool], AsyncClient] = {}
+        self.streams: Dict[Any, Tuple[int, asyncio.Semaphore]] = {}
+        self.fallbacks: Dict[str, float] = {}
+        self.h2c_hosts: Set[str] = set()
+        self.warned = False
+
+
+    def client(self, protocol: str, host: str, stream: bool = False) -> AsyncClient:
+        """
+            Obtains the shared client of a protocol and microservice, creating it on first use.
+
+            Args:
+                protocol (str): http1, http2 (ALPN over TLS) or h2c (prior knowledge).
+                host (str): Host and port of the microservice.
+                stream (bool): Whether the client carries event streams.
+
+            Returns:
+                AsyncClient: Shared client.
+        """
+        client = self.clients.get((protocol, host, stream))
+
+        if client is None:
+            if protocol != "http1":
+                limits = Limits(
+                    max_connections=SETTINGS.UPSTREAM_HTTP2_CONNECTIONS or None,
+                    max_keepalive_connections=SETTINGS.UPSTREAM_HTTP2_CONNECTIONS or None,
+                )
+            elif stream:
+                limits = Limits(
+                    max_connections=SETTINGS.UPSTREAM_MAX_EVENT_STREAMS or None,
+                    max_keepalive_connections=SETTINGS.UPSTREAM_MAX_KEEPALIVE,
+                )
+            else:
+                limits = Limits(
+                    max_connections=SETTINGS.UPSTREAM_MAX_CONNECTIONS or None,
+                    max_keepalive_connections=SETTINGS.UPSTREAM_MAX_KEEPALIVE,
+                )
+
+            client = self.clients[(protocol, host, stream)] = AsyncClient(
+                http1=protocol != "h2c",
+                http2=protocol != "http1",
+                limits=limits,
+                # Shared by every user, the cookies of a response must not reach the requests of others
+                cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            )
+
+        return client
+
+
+    def protocol(self, url: str, http2: bool) -> str:
+        """
+            Chooses the protocol of a request.
+
+            Args:
+                url (str): URL of the request.
+                http2 (bool): Whether the microservice has HTTP/2 enabled.
+
+            Returns:
+                str: http1, http2 or h2c.
+        """
+        if not http2:
+            return "http1"
+
+        if h2 is None:
+            if not self.warned:
+                LOGGER.warning("HTTP/2 is enabled for a microservice but h2 is not installed (pip install httpx[http2]), using HTTP/1.1")
+                self.warned = True
+            return "http1"
+
+        parts = urlsplit(url)
+
+        if parts.scheme == "https":
+            return "http2"
+
+        if self.fallbacks.get(parts.netloc, 0.0) > time.monotonic():
+            return "http1"
+
+        return "h2c"
+
+
+    def semaphore(self, key: Any, limit: int) -> Union[asyncio.Semaphore, None]:
+        """
+            Obtains the semaphore bounding the concurrent streams of a microservice.
+
+            Args:
+                key (Any): Microservice.
+                limit (int): Maximum concurrent streams, 0 for unlimited.
+
+            Returns:
+                asyncio.Semaphore: The semaphore, None if unlimited.
+        """
+        if limit <= 0:
+            return None
+
+        current = self.streams.get(key)
+
+        # Replaced when the limit of the microservice changes, requests holding the old one release it
+        if current is None or current[0] != limit:
+            current = self.streams[key] = (limit, asyncio.Semaphore(limit))
+
+        return current[1]
+
+
+    async def open(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, Any],
+        body: bytes,
+        timeout: Timeout,
+        http2: bool = False,
+        max_streams: Union[int, None] = None,
+        key: Any = None,
+        stream: bool = False
+    ) -> Tuple[Response, Callable[[], Awaitable[None]]]:
+        """
+            Sends a request and returns as soon as the headers of the response arrive.
+
+            Args:
+                method (str): HTTP method.
+                url (str): URL of the request.
+                headers (Dict[str, Any]): Request headers.
+                body (bytes): Request body.
+                timeout (Timeout): Timeouts of the request.
+                http2 (bool): Whether the microservice has HTTP/2 enabled.
+                max_streams (int, optional): Maximum concurrent streams of the microservice, 0 for
+                    unlimited, None for UPSTREAM_MAX_STREAMS with HTTP/2 and unlimited otherwise.
+                key (Any): Microservice the limit applies to.
+                stream (bool): Whether the request opens an event stream.
+
+            Returns:
+                Tuple: Response, with its body not read yet, and the function that closes
+                it and frees its stream.
+
+            Raises:
+                PoolTimeout: If no stream or connection of the microservice frees up in time.
+        """
+        if max_streams is None:
+            max_streams = SETTINGS.UPSTREAM_MAX_STREAMS if http2 else 0
+
+        semaphore = self.semaphore(key, max_streams)
+
+        if semaphore is not None:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), SETTINGS.UPSTREAM_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise PoolTimeout("No stream of the microservice was freed in time.")
+
+        try:
+            host = urlsplit(url).netloc
+            protocol = self.protocol(url, http2)
+            client = self.client(protocol, host, stream)
+
+            try:
+                response = await client.send(
+                    client.build_request(method=method, url=url, headers=headers, content=body, timeout=timeout),
+                    stream=True
+                )
+
+            except PRIOR_KNOWLEDGE_ERRORS as error:
+                # Only a host that never answered HTTP/2 is retried, the request cannot have been processed
+                if protocol != "h2c" or host in self.h2c_hosts:
+                    raise
+
+                LOGGER.warning(f"{host} rejected HTTP/2 with prior knowledge, using HTTP/1.1: {error!r}")
+                self.fallbacks[host] = time.monotonic() + SETTINGS.UPSTREAM_HTTP2_RETRY_AFTER
+                client = self.client("http1", host, stream)
+                response = await client.send(
+                    client.build_request(method=method, url=url, headers=headers, content=body, timeout=timeout),
+                    stream=True
+                )
+
+        except BaseException:
+            if semaphore is not None:
+                semaphore.release()
+            raise
+
+        if protocol == "h2c" and response.http_version == "HTTP/2":
+            self.h2c_hosts.add(host)
+
+        METRICS_HELPER.upstream_protocol.inc(response.http_version)
+        released = False
+
+        async def close() -> None:
+            nonlocal released
+
+            try:
+                await response.aclose()
+            finally:
+                if semaphore is not None and not released:
+                    released = True
+                    semaphore.release()
+
+        return response, close
+
+
+    async def stop(self) -> None:
+        """
+            Closes the shared clients and their connections.
+        """
+        clients = list(self.clients.values())
+        self.clients.clear()
+
+        for client in clients:
+            await client.aclose()
+
+
+
+UPSTREAM_HELPER = UpstreamHelper()
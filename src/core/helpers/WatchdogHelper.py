@@ -0,0 +1,137 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, Union
+
+from settings import SETTINGS
+from core.helpers.MetricsHelper import METRICS_HELPER
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+
+class BlockingCallError(RuntimeError):
+    """
+        Raised on shutdown in strict mode when the event loop was blocked, so a
+        test run that triggers a blocking call inside a coroutine fails.
+    """
+
+
+
+class WatchdogHelper:
+    """
+        Class that watches the event loop of the worker. A heartbeat task measures
+        how late the loop wakes it up and exports the lag, and a watchdog thread
+        notices when the heartbeat stops and captures the stack of the loop thread
+        while it is still blocked, which points at the offending synchronous call.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of WatchdogHelper.
+        """
+        self.task: Union[asyncio.Task, None] = None
+        self.thread: Union[threading.Thread, None] = None
+        self.stopping = threading.Event()
+        self.loop_thread: Union[int, None] = None
+        self.beat = time.monotonic()
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=100)
+
+
+    async def start(self) -> None:
+        """
+            Starts the heartbeat and the watchdog thread. In strict mode the asyncio debug
+            mode also reports every callback slower than the threshold with its coroutine.
+        """
+        if not SETTINGS.WATCHDOG_ENABLED or self.task is not None:
+            return
+
+        if SETTINGS.WATCHDOG_STRICT:
+            loop = asyncio.get_running_loop()
+            loop.set_debug(True)
+            loop.slow_callback_duration = SETTINGS.WATCHDOG_THRESHOLD
+
+        self.loop_thread = threading.get_ident()
+        self.beat = time.monotonic()
+        self.stalls.clear()
+        self.stopping.clear()
+
+        self.task = asyncio.create_task(self.run(), name="event-loop-heartbeat")
+        self.thread = threading.Thread(target=self.watch, name="event-loop-watchdog", daemon=True)
+        self.thread.start()
+
+
+    async def stop(self) -> None:
+        """
+            Stops the heartbeat and the watchdog thread.
+
+            Raises:
+                BlockingCallError: In strict mode, if the event loop was blocked while running.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        if self.thread is not None:
+            self.stopping.set()
+            await asyncio.to_thread(self.thread.join)
+            self.thread = None
+
+        if SETTINGS.WATCHDOG_STRICT and self.stalls:
+            worst = max(self.stalls, key=lambda stall: stall["blocked_ms"])
+            raise BlockingCallError(
+                f"The event loop was blocked {len(self.stalls)} times, the longest for "
+                f"at least {worst['blocked_ms']} ms at:\n{worst['stack']}"
+            )
+
+
+    async def run(self) -> None:
+        """
+            Wakes up on the configured interval and records how late the event loop woke it up.
+        """
+        while True:
+            expected = time.monotonic() + SETTINGS.WATCHDOG_INTERVAL
+            await asyncio.sleep(SETTINGS.WATCHDOG_INTERVAL)
+            self.beat = time.monotonic()
+
+            lag = max(self.beat - expected, 0.0)
+            METRICS_HELPER.loop_lag.observe(value=lag)
+
+            if lag >= SETTINGS.WATCHDOG_THRESHOLD:
+                METRICS_HELPER.loop_stalls.inc()
+
+
+    def watch(self) -> None:
+        """
+            Checks the heartbeat from its own thread and captures the stack of the event
+            loop thread once per stall, while the blocking call is still running.
+        """
+        reported = None
+
+        while not self.stopping.wait(SETTINGS.WATCHDOG_INTERVAL / 2):
+            beat = self.beat
+            blocked = time.monotonic() - beat - SETTINGS.WATCHDOG_INTERVAL
+
+            if blocked < SETTINGS.WATCHDOG_THRESHOLD or reported == beat:
+                continue
+
+            reported = beat
+            frame = sys._current_frames().get(self.loop_thread)
+            stack = "".join(traceback.format_stack(frame, limit=SETTINGS.WATCHDOG_STACK_DEPTH)) if frame else ""
+            self.stalls.append({"blocked_ms": round(blocked * 1000, 1), "stack": stack})
+
+            LOGGER.log(
+                logging.ERROR if SETTINGS.WATCHDOG_STRICT else logging.WARNING,
+                f"Event loop blocked for more than {blocked * 1000:.0f} ms\n{stack}"
+            )
+
+
+
+WATCHDOG_HELPER = WatchdogHelper()
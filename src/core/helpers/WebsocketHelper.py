@@ -1,7 +1,320 @@
 import asyncio
-from urllib.parse import urlparse, urlunparse
+import logging
+from typing import Awaitable, Callable, Dict, List, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
 from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+from websockets.frames import CONT, CTRL_OPCODES, Frame
+from websockets.exceptions import ConnectionClosed
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory, PerMessageDeflate
+
+from settings import SETTINGS
+from core.helpers.MetricsHelper import METRICS_HELPER
+from core.helpers.TracingHelper import TRACING_HELPER
+from core.helpers.JwtManagerHelper import JwtManagerHelper
+from core.helpers.RouteCacheHelper import ROUTE_CACHE
+from core.helpers.WebsocketSessionHelper import WS_SESSIONS, WebSocketSession
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+# Close codes a peer may receive but never send, replaced by the closest sendable one
+RESERVED_CLOSE_CODES = {1005: 1000, 1006: 1001, 1015: 1011}
+
+# Browsers cannot set headers on a WebSocket, they offer this subprotocol followed by the token instead
+TOKEN_SUBPROTOCOL = "bearer"
+TOKEN_QUERY_PARAMETER = "access_token"
+
+
+class Close:
+    """
+        End of one direction of a relay, queued behind the messages still to be delivered.
+    """
+
+    __slots__ = ("code", "reason")
+
+
+    def __init__(self, code: int, reason: str = "") -> None:
+        self.code = code
+        self.reason = reason
+
+
+
+class ThresholdPerMessageDeflate(PerMessageDeflate):
+    """
+        permessage-deflate that sends the messages smaller than a threshold uncompressed,
+        the extension allows it per message and compressing a few bytes costs CPU and
+        rarely makes them smaller.
+    """
+
+
+    def __init__(self, *args, threshold: int, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.threshold = threshold
+        self.skipping = False
+
+
+    def encode(self, frame: Frame) -> Frame:
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+
+        # The continuation frames of a message follow the decision taken on its first frame
+        if frame.opcode is not CONT:
+            self.skipping = len(frame.data) < self.threshold
+
+        return frame if self.skipping else super().encode(frame)
+
+
+
+class ThresholdDeflateFactory(ClientPerMessageDeflateFactory):
+    """
+        Client side negotiation of permessage-deflate with the configured window and
+        memory level, which returns ThresholdPerMessageDeflate once accepted.
+    """
+
+
+    def __init__(self) -> None:
+        super().__init__(
+            server_max_window_bits=SETTINGS.WEBSOCKET_COMPRESSION_WINDOW_BITS,
+            client_max_window_bits=SETTINGS.WEBSOCKET_COMPRESSION_WINDOW_BITS,
+            compress_settings={"memLevel": SETTINGS.WEBSOCKET_COMPRESSION_MEMORY_LEVEL},
+        )
+
+
+    def process_response_params(self, params, accepted_extensions) -> PerMessageDeflate:
+        extension = super().process_response_params(params, accepted_extensions)
+
+        return ThresholdPerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            threshold=SETTINGS.WEBSOCKET_COMPRESSION_THRESHOLD,
+        )
+
+
+
+class WebSocketRelay:
+    """
+        Full-duplex relay of one WebSocket session. Each direction has a reader that
+        puts the messages in a bounded queue and a writer that delivers them: when the
+        receiving side is slow the queue fills, the reader stops reading and the
+        backpressure reaches the sender through TCP. Text and binary messages keep
+        their type, and the close code and reason of one side are passed to the other.
+    """
+
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        upstream: ClientConnection,
+        authorize: Union[Callable[[], Awaitable[bool]], None] = None
+    ) -> None:
+        """
+            Initializes an instance of WebSocketRelay.
+
+            Args:
+                websocket (WebSocket): Accepted client WebSocket.
+                upstream (ClientConnection): Open connection to the microservice.
+                authorize (Callable, optional): Re-checks the authorization of the session, None if it is public.
+        """
+        self.websocket = websocket
+        self.upstream = upstream
+        self.authorize = authorize
+        self.to_upstream: asyncio.Queue = asyncio.Queue(maxsize=SETTINGS.WEBSOCKET_BUFFER_SIZE)
+        self.to_client: asyncio.Queue = asyncio.Queue(maxsize=SETTINGS.WEBSOCKET_BUFFER_SIZE)
+        self.activity = asyncio.get_running_loop().time()
+        self.stopping: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+    @staticmethod
+    def size(message: Union[str, bytes]) -> int:
+        """
+            Args:
+                message (Union[str, bytes]): Relayed message.
+
+            Returns:
+                int: Size of the message on the wire, without the frame header.
+        """
+        # isascii() only reads a flag of the string, so plain text is never encoded twice
+        return len(message) if isinstance(message, bytes) or message.isascii() else len(message.encode("utf-8"))
+
+
+    def stop(self, code: int, reason: str) -> None:
+        """
+            Ends the session from outside, both sides are closed with the given code.
+
+            Args:
+                code (int): Close code.
+                reason (str): Close reason.
+        """
+        if not self.stopping.done():
+            self.stopping.set_result((code, reason))
+
+
+    async def read_client(self) -> None:
+        """
+            Reads the messages of the client until it disconnects.
+        """
+        while True:
+            message = await self.websocket.receive()
+
+            if message["type"] == "websocket.disconnect":
+                await self.to_upstream.put(Close(message.get("code", 1000), message.get("reason") or ""))
+                return
+
+            self.activity = asyncio.get_running_loop().time()
+            await self.to_upstream.put(message["text"] if message.get("text") is not None else message.get("bytes", b""))
+
+
+    async def read_upstream(self) -> None:
+        """
+            Reads the messages of the microservice until it closes the connection.
+        """
+        try:
+            while True:
+                message = await self.upstream.recv()
+                self.activity = asyncio.get_running_loop().time()
+                await self.to_client.put(message)
+
+        except ConnectionClosed as closed:
+            if closed.rcvd is not None:
+                await self.to_client.put(Close(closed.rcvd.code, closed.rcvd.reason))
+            else:
+                await self.to_client.put(Close(1014, "The microservice connection was lost."))
+
+
+    async def write_upstream(self) -> Tuple[int, str]:
+        """
+            Delivers the messages of the client to the microservice.
+
+            Returns:
+                Tuple[int, str]: Close code and reason of the client.
+        """
+        while True:
+            message = await self.to_upstream.get()
+
+            if isinstance(message, Close):
+                return message.code, message.reason
+
+            await self.upstream.send(message)
+            METRICS_HELPER.websocket_messages.inc("upstream")
+            METRICS_HELPER.websocket_bytes.inc("upstream", amount=self.size(message))
+
+
+    async def write_client(self) -> Tuple[int, str]:
+        """
+            Delivers the messages of the microservice to the client.
+
+            Returns:
+                Tuple[int, str]: Close code and reason of the microservice.
+        """
+        while True:
+            message = await self.to_client.get()
+
+            if isinstance(message, Close):
+                return message.code, message.reason
+
+            if isinstance(message, str):
+                await self.websocket.send_text(message)
+            else:
+                await self.websocket.send_bytes(message)
+
+            METRICS_HELPER.websocket_messages.inc("client")
+            METRICS_HELPER.websocket_bytes.inc("client", amount=self.size(message))
+
+
+    async def watch_idle(self) -> Tuple[int, str]:
+        """
+            Waits until no message has been relayed in either direction for the idle timeout.
+
+            Returns:
+                Tuple[int, str]: Close code and reason sent to both sides.
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            remaining = self.activity + SETTINGS.WEBSOCKET_IDLE_TIMEOUT - loop.time()
+
+            if remaining <= 0:
+                return 1001, "Idle timeout."
+
+            await asyncio.sleep(remaining)
+
+
+    async def watch_authorization(self) -> Tuple[int, str]:
+        """
+            Re-checks the authorization of the session on the configured interval, so an
+            expired token or a revoked grant also ends the sessions that are already open.
+
+            Returns:
+                Tuple[int, str]: Close code and reason sent to both sides.
+        """
+        while True:
+            await asyncio.sleep(SETTINGS.WEBSOCKET_AUTH_RECHECK_INTERVAL)
+
+            if not await self.authorize():
+                return 1008, "The authorization of the session expired or was revoked."
+
+
+    async def run(self) -> None:
+        """
+            Relays the session and closes both sides with the code that ended it.
+        """
+        readers = [asyncio.create_task(self.read_client()), asyncio.create_task(self.read_upstream())]
+        writers = [asyncio.create_task(self.write_upstream()), asyncio.create_task(self.write_client()), self.stopping]
+
+        if SETTINGS.WEBSOCKET_IDLE_TIMEOUT > 0:
+            writers.append(asyncio.create_task(self.watch_idle()))
+
+        if self.authorize is not None and SETTINGS.WEBSOCKET_AUTH_RECHECK_INTERVAL > 0:
+            writers.append(asyncio.create_task(self.watch_authorization()))
+
+        # Replaced by the code of whatever ends the session, kept if the relay is cancelled
+        code, reason = 1001, "The gateway is going away."
+
+        try:
+            done, _ = await asyncio.wait(writers, return_when=asyncio.FIRST_COMPLETED)
+            finished = done.pop()
+
+            if finished.exception() is None:
+                code, reason = finished.result()
+            elif isinstance(finished.exception(), ConnectionClosed):
+                code, reason = 1014, "The microservice connection was lost."
+            else:
+                LOGGER.warning(f"WebSocket relay failed: {finished.exception()!r}")
+                code, reason = 1011, "The gateway could not relay the message."
+
+        finally:
+            for task in readers + writers:
+                task.cancel()
+
+            await asyncio.gather(*readers, *writers, return_exceptions=True)
+            await self.close(code, reason)
+
+
+    async def close(self, code: int, reason: str) -> None:
+        """
+            Closes the sides that are still open.
+
+            Args:
+                code (int): Close code.
+                reason (str): Close reason.
+        """
+        code = RESERVED_CLOSE_CODES.get(code, code)
+        METRICS_HELPER.websocket_closes.inc(str(code))
+
+        await self.upstream.close(code=code, reason=reason)
+
+        if self.websocket.application_state == WebSocketState.CONNECTED and self.websocket.client_state == WebSocketState.CONNECTED:
+            try:
+                await self.websocket.close(code=code, reason=reason)
+            except RuntimeError:
+                pass
 
 
 
@@ -45,51 +358,155 @@ class WebSocketHelper:
         )
 
 
-    async def consume(self, ws: WebSocket, websocket: WebSocket) -> None:
+    @staticmethod
+    def handshake_credentials(websocket: WebSocket) -> Tuple[Union[str, None], List[str], str, bool]:
         """
-            Consumes messages from one WebSocket and forwards them to another WebSocket.
+            Takes the token of a WebSocket handshake from the Authorization header, the
+            subprotocols or, with WEBSOCKET_QUERY_TOKEN, the access_token query parameter.
+            The token is removed from the subprotocols and the query string forwarded to
+            the microservice.
 
             Args:
-                ws: WebSocket from which messages will be consumed.
-                websocket: WebSocket to which messages will be forwarded.
+                websocket (WebSocket): WebSocket being opened.
 
             Returns:
-                None
+                Tuple: Token (None if missing), subprotocols and query string to forward,
+                and whether the token came as a subprotocol.
         """
-        while True:
-            try:
-                message = await websocket.receive_bytes()
-                await ws.send(message)
+        token = None
+        subprotocols = list(websocket.scope.get("subprotocols", []))
+        query = parse_qsl(websocket.url.query, keep_blank_values=True)
+        from_subprotocol = False
+
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and credentials:
+            token = credentials.strip()
+
+        if TOKEN_SUBPROTOCOL in subprotocols:
+            index = subprotocols.index(TOKEN_SUBPROTOCOL)
+            offered = subprotocols[index + 1:index + 2]
+            del subprotocols[index:index + 2]
+            from_subprotocol = True
+            token = token or (offered[0] if offered else None)
+
+        if any(name == TOKEN_QUERY_PARAMETER for name, _ in query):
+            if SETTINGS.WEBSOCKET_QUERY_TOKEN:
+                token = token or next(value for name, value in query if name == TOKEN_QUERY_PARAMETER)
+
+            query = [(name, value) for name, value in query if name != TOKEN_QUERY_PARAMETER]
+
+        return token, subprotocols, urlencode(query), from_subprotocol
+
+
+    @staticmethod
+    async def reject(websocket: WebSocket, code: int, reason: str) -> None:
+        """
+            Rejects a WebSocket handshake with a close code. The handshake is accepted and
+            closed right away, since a close before the accept becomes a plain HTTP 403 and
+            the client would never see the code (1008, 1012, 1013, 1014) nor its reason.
+
+            Args:
+                websocket (WebSocket): WebSocket being opened.
+                code (int): Close code.
+                reason (str): Close reason.
+        """
+        offered = websocket.scope.get("subprotocols", [])
 
-            except asyncio.CancelledError:
-                break
+        # A browser fails the handshake, and drops the code, unless one of its subprotocols is selected
+        subprotocol = TOKEN_SUBPROTOCOL if TOKEN_SUBPROTOCOL in offered else next(iter(offered), None)
 
-            except Exception as e:
-                break
+        await websocket.accept(subprotocol=subprotocol)
+        await websocket.close(code=code, reason=reason)
 
 
-    async def produce(self, ws: WebSocket, websocket: WebSocket) -> None:
+    @staticmethod
+    async def authenticate(token: str) -> Union[Dict, None]:
         """
-            Produces messages from one WebSocket and sends them to another WebSocket.
+            Validates a token with the cached public key.
 
             Args:
-                ws: WebSocket from which messages will be produced.
-                websocket: WebSocket to which messages will be sent.
+                token (str): JWT token.
 
             Returns:
-                None
+                Dict: Claims of the token, None if it is invalid or expired.
         """
-        while True:
-            try:
-                message = await asyncio.wait_for(ws.recv(), timeout=10.0)
-                await websocket.send_bytes(message)
+        claims = await JwtManagerHelper(token=token).validate_token()
+
+        # validate_token returns {"token": <reason>} when the token is not valid
+        if not isinstance(claims, dict) or "id" not in claims:
+            return None
+
+        return claims
+
 
-            except asyncio.CancelledError:
-                break
+    async def authorize(self, token: str, path: str) -> bool:
+        """
+            Validates a token and the access of its user to an endpoint, from the cached
+            keys, routes and grants.
+
+            Args:
+                token (str): JWT token.
+                path (str): Endpoint URL, without the prefix of the gateway router.
+
+            Returns:
+                bool: True if the token is valid and its user has access, False otherwise.
+        """
+        claims = await self.authenticate(token)
+        return claims is not None and await ROUTE_CACHE.authorize(claims["id"], path)
+
+
+    async def connect(self, url: str, subprotocols: List[str]) -> ClientConnection:
+        """
+            Opens the WebSocket connection to the microservice. The client pings it on the
+            configured interval and closes it when a pong takes longer than the timeout, and
+            offers permessage-deflate when compression is enabled.
+
+            Args:
+                url (str): WebSocket URL of the microservice.
+                subprotocols (List[str]): Subprotocols offered by the client.
+
+            Returns:
+                ClientConnection: Open connection to the microservice.
+        """
+        return await connect(
+            url,
+            subprotocols=subprotocols or None,
+            additional_headers=TRACING_HELPER.inject({}),
+            compression=None,
+            extensions=[ThresholdDeflateFactory()] if SETTINGS.WEBSOCKET_COMPRESSION else None,
+            open_timeout=SETTINGS.WEBSOCKET_OPEN_TIMEOUT,
+            ping_interval=SETTINGS.WEBSOCKET_PING_INTERVAL or None,
+            ping_timeout=SETTINGS.WEBSOCKET_PING_TIMEOUT or None,
+            close_timeout=SETTINGS.WEBSOCKET_CLOSE_TIMEOUT,
+            max_size=SETTINGS.WEBSOCKET_MAX_MESSAGE_SIZE,
+            max_queue=SETTINGS.WEBSOCKET_BUFFER_SIZE,
+        )
+
+
+    async def relay(
+        self,
+        websocket: WebSocket,
+        upstream: ClientConnection,
+        authorize: Union[Callable[[], Awaitable[bool]], None] = None,
+        session: Union[WebSocketSession, None] = None
+    ) -> None:
+        """
+            Relays the messages between the client and the microservice until either side
+            closes, the session is idle for too long, its authorization is lost or a
+            connection fails.
+
+            Args:
+                websocket (WebSocket): Accepted client WebSocket.
+                upstream (ClientConnection): Open connection to the microservice.
+                authorize (Callable, optional): Re-checks the authorization of the session, None if it is public.
+                session (WebSocketSession, optional): Registered session, so a drain can stop the relay.
+        """
+        relay = WebSocketRelay(websocket, upstream, authorize)
 
-            except Exception as e:
-                break
+        if session is not None:
+            WS_SESSIONS.attach(session, relay)
 
+        await relay.run()
 
 
 WS_HELPER = WebSocketHelper()
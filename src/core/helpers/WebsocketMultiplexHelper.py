@@ -0,0 +1,328 @@
+import json
+import asyncio
+import logging
+from typing import Dict, List, Set, Union
+
+from websockets.frames import Close
+from websockets.exceptions import ConnectionClosed
+from websockets.asyncio.client import ClientConnection
+
+from settings import SETTINGS
+from core.helpers.MetricsHelper import METRICS_HELPER
+from core.helpers.WebsocketHelper import WS_HELPER
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+# Operations of the channel-ID framing, every frame starts with "<channel> <operation>\n"
+OPEN, DATA, CLOSE = "open", "data", "close"
+
+
+class Channel:
+    """
+        Client session multiplexed on a shared upstream connection. It exposes the part
+        of ClientConnection used by WebSocketRelay, so the relay does not know whether
+        the microservice connection is its own or shared.
+    """
+
+    __slots__ = ("id", "connection", "messages", "closed", "subprotocol")
+
+
+    def __init__(self, channel_id: int, connection: "MultiplexedConnection") -> None:
+        self.id = channel_id
+        self.connection = connection
+        self.messages: asyncio.Queue = asyncio.Queue(maxsize=SETTINGS.WEBSOCKET_BUFFER_SIZE)
+        self.closed = False
+        self.subprotocol = None
+
+
+    def deliver(self, message: Union[str, bytes, Close]) -> bool:
+        """
+            Queues a message of the microservice without waiting, a slow client must not
+            stall the other channels of the connection.
+
+            Args:
+                message (Union[str, bytes, Close]): Message, or the close of the channel.
+
+            Returns:
+                bool: False if the queue of the channel is full.
+        """
+        try:
+            self.messages.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+
+    def terminate(self, code: int, reason: str) -> None:
+        """
+            Closes the channel from the gateway side, discarding the messages not yet relayed.
+
+            Args:
+                code (int): Close code delivered to the relay.
+                reason (str): Close reason.
+        """
+        self.closed = True
+        self.connection.channels.pop(self.id, None)
+
+        while not self.messages.empty():
+            self.messages.get_nowait()
+
+        self.messages.put_nowait(Close(code, reason))
+
+
+    async def recv(self) -> Union[str, bytes]:
+        """
+            Returns:
+                Union[str, bytes]: Next message of the microservice.
+
+            Raises:
+                ConnectionClosed: When the microservice or the shared connection closed the channel.
+        """
+        message = await self.messages.get()
+
+        if isinstance(message, Close):
+            raise ConnectionClosed(message, None)
+
+        return message
+
+
+    async def send(self, message: Union[str, bytes]) -> None:
+        """
+            Args:
+                message (Union[str, bytes]): Message of the client.
+        """
+        await self.connection.send(self.id, DATA, message)
+
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        """
+            Closes the channel, the shared connection stays open.
+
+            Args:
+                code (int): Close code.
+                reason (str): Close reason.
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+        self.connection.channels.pop(self.id, None)
+
+        # Shielded, the microservice must learn about the close even if the session is cancelled
+        try:
+            await asyncio.shield(self.connection.send_later(self.id, CLOSE, f"{code} {reason}"))
+        except ConnectionClosed:
+            pass
+
+
+
+class MultiplexedConnection:
+    """
+        Upstream connection shared by many client sessions. Every frame in either
+        direction starts with the header "<channel> <operation>\\n" followed by the
+        payload: "open" carries the path, query string, subprotocols and user of a new
+        session as JSON, "data" a message of the session with its text or binary type
+        kept, and "close" the "<code> <reason>" of the session.
+    """
+
+
+    def __init__(self, upstream: ClientConnection) -> None:
+        """
+            Initializes an instance of MultiplexedConnection.
+
+            Args:
+                upstream (ClientConnection): Open connection to the multiplex path of the microservice.
+        """
+        self.upstream = upstream
+        self.channels: Dict[int, Channel] = {}
+        self.next_id = 0
+        self.pending: Set[asyncio.Task] = set()
+        self.task = asyncio.create_task(self.run(), name="websocket-multiplex")
+
+
+    @property
+    def open(self) -> bool:
+        return not self.task.done()
+
+
+    async def send(self, channel_id: int, operation: str, payload: Union[str, bytes]) -> None:
+        """
+            Sends a frame of a channel.
+
+            Args:
+                channel_id (int): Channel.
+                operation (str): Operation of the framing.
+                payload (Union[str, bytes]): Payload, sent in a text or binary frame by its type.
+        """
+        header = f"{channel_id} {operation}\n"
+        await self.upstream.send(header + payload if isinstance(payload, str) else header.encode() + payload)
+
+
+    def send_later(self, channel_id: int, operation: str, payload: Union[str, bytes]) -> asyncio.Task:
+        """
+            Sends a frame of a channel from its own task.
+
+            Args:
+                channel_id (int): Channel.
+                operation (str): Operation of the framing.
+                payload (Union[str, bytes]): Payload.
+
+            Returns:
+                asyncio.Task: Task sending the frame.
+        """
+        task = asyncio.create_task(self.send(channel_id, operation, payload))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+
+
+    async def open_channel(self, path: str, query: str, subprotocols: List[str], user: Union[int, None]) -> Channel:
+        """
+            Opens a channel for a client session.
+
+            Args:
+                path (str): Endpoint URL.
+                query (str): Query string of the client.
+                subprotocols (List[str]): Subprotocols offered by the client.
+                user (int, optional): ID of the authenticated user.
+
+            Returns:
+                Channel: The open channel.
+        """
+        self.next_id += 1
+        channel = self.channels[self.next_id] = Channel(self.next_id, self)
+
+        await self.send(channel.id, OPEN, json.dumps({"path": path, "query": query, "subprotocols": subprotocols, "user": user}))
+        return channel
+
+
+    def dispatch(self, message: Union[str, bytes]) -> None:
+        """
+            Delivers a frame of the microservice to its channel.
+
+            Args:
+                message (Union[str, bytes]): Frame with the header of the framing.
+        """
+        index = message.find("\n" if isinstance(message, str) else b"\n")
+        header = message[:index] if isinstance(message, str) else message[:index].decode("ascii", "replace")
+        payload = message[index + 1:]
+        channel_id, _, operation = header.partition(" ")
+
+        # isdigit alone accepts other digits like "²" that int() rejects
+        channel = self.channels.get(int(channel_id)) if index > 0 and channel_id.isascii() and channel_id.isdigit() else None
+
+        if channel is None:
+            return
+
+        if operation == CLOSE:
+            text, _, reason = (payload if isinstance(payload, str) else payload.decode("utf-8", "replace")).partition(" ")
+            code = int(text) if text.isascii() and text.isdigit() else 1000
+            # Only the codes an endpoint may send, the relay closes the client with it
+            close = Close(code if 1000 <= code < 5000 and code not in (1004, 1005, 1006, 1015) else 1000, reason)
+            self.channels.pop(channel.id, None)
+            channel.closed = True
+
+            if not channel.deliver(close):
+                channel.terminate(close.code, close.reason)
+
+        elif operation == DATA and not channel.deliver(payload):
+            channel.terminate(1013, "The client is not reading its messages fast enough.")
+            self.send_later(channel.id, CLOSE, "1013 The client is too slow.")
+
+
+    async def run(self) -> None:
+        """
+            Reads the frames of the microservice until the connection closes, then closes
+            the channels still open.
+        """
+        try:
+            async for message in self.upstream:
+                # A malformed frame is dropped alone, the other channels keep the connection
+                try:
+                    self.dispatch(message)
+                except Exception as error:
+                    LOGGER.warning(f"WebSocket multiplexed frame dropped: {error!r}")
+
+        except ConnectionClosed:
+            pass
+
+        except Exception as error:
+            LOGGER.warning(f"WebSocket multiplexed connection failed: {error!r}")
+
+        finally:
+            METRICS_HELPER.websocket_multiplexed.dec()
+
+            for channel in list(self.channels.values()):
+                channel.terminate(1014, "The microservice connection was lost.")
+
+
+
+class WebsocketMultiplexHelper:
+    """
+        Class that keeps, per microservice, a pool of upstream connections the client
+        sessions are multiplexed on. The connections are opened on demand up to the
+        configured size and every new session goes to the one with fewer channels.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of WebsocketMultiplexHelper.
+        """
+        self.pools: Dict[str, List[MultiplexedConnection]] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+
+    async def open(
+        self,
+        base_url: str,
+        path: str,
+        query: str,
+        subprotocols: List[str],
+        user: Union[int, None]
+    ) -> Channel:
+        """
+            Opens a channel on the pool of a microservice.
+
+            Args:
+                base_url (str): Base URL of the microservice.
+                path (str): Endpoint URL.
+                query (str): Query string of the client.
+                subprotocols (List[str]): Subprotocols offered by the client.
+                user (int, optional): ID of the authenticated user.
+
+            Returns:
+                Channel: The open channel.
+        """
+        url = await WS_HELPER.convert_url_to_ws(f"{base_url}{SETTINGS.WEBSOCKET_MULTIPLEX_PATH}")
+
+        async with self.locks.setdefault(url, asyncio.Lock()):
+            pool = self.pools[url] = [connection for connection in self.pools.get(url, []) if connection.open]
+
+            if len(pool) < SETTINGS.WEBSOCKET_MULTIPLEX_CONNECTIONS and all(connection.channels for connection in pool):
+                pool.append(MultiplexedConnection(await WS_HELPER.connect(url, [])))
+                METRICS_HELPER.websocket_multiplexed.inc()
+
+            connection = min(pool, key=lambda connection: len(connection.channels))
+
+        return await connection.open_channel(path, query, subprotocols, user)
+
+
+    async def stop(self) -> None:
+        """
+            Closes the shared connections.
+        """
+        connections = [connection for pool in self.pools.values() for connection in pool]
+        self.pools.clear()
+
+        for connection in connections:
+            await connection.upstream.close(code=1001, reason="The gateway is going away.")
+
+        await asyncio.gather(*(connection.task for connection in connections), return_exceptions=True)
+
+
+
+WS_MULTIPLEX = WebsocketMultiplexHelper()
@@ -0,0 +1,269 @@
+import signal
+import random
+import asyncio
+import logging
+import threading
+from types import FrameType
+from collections import Counter
+from typing import Any, Callable, Dict, Set, Tuple, Union
+
+from settings import SETTINGS
+from core.helpers.MetricsHelper import METRICS_HELPER
+
+
+
+LOGGER = logging.getLogger("fastapi")
+
+# Signals after which the open sessions are drained before the server cuts them
+DRAIN_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class WebSocketSession:
+    """
+        WebSocket session registered in the worker, from the handshake until both sides are closed.
+    """
+
+    __slots__ = ("user", "ip", "upstream", "relay")
+
+
+    def __init__(self, user: Union[int, None], ip: Union[str, None], upstream: str) -> None:
+        self.user = user
+        self.ip = ip
+        self.upstream = upstream
+        self.relay: Any = None
+
+
+
+class WebSocketSessionHelper:
+    """
+        Class that registers the WebSocket sessions of the worker. It limits the
+        concurrent sessions per user, per IP and per microservice, and on shutdown it
+        closes them with 1012 (service restart) spread over the drain period, each with a
+        random reconnect delay in the reason, so the clients of a restarted worker do not
+        all reconnect at the same moment.
+
+        uvicorn closes every WebSocket before the lifespan shutdown runs, so start() also
+        chains the SIGINT and SIGTERM handlers: the first signal drains the sessions and
+        then hands over to the server, a second one hands over at once.
+    """
+
+
+    def __init__(self) -> None:
+        """
+            Initializes an instance of WebSocketSessionHelper.
+        """
+        self.sessions: Set[WebSocketSession] = set()
+        self.counts: Dict[str, Counter] = {"user": Counter(), "ip": Counter(), "upstream": Counter()}
+        self.draining = False
+        self.drained: Union[asyncio.Event, None] = None
+        self.task: Union[asyncio.Task, None] = None
+        self.handlers: Dict[int, Callable[[int, Union[FrameType, None]], Any]] = {}
+
+
+    @staticmethod
+    def limits() -> Dict[str, int]:
+        """
+            Returns:
+                Dict[str, int]: Maximum concurrent sessions by key, 0 for unlimited.
+        """
+        return {
+            "user": SETTINGS.WEBSOCKET_MAX_SESSIONS_PER_USER,
+            "ip": SETTINGS.WEBSOCKET_MAX_SESSIONS_PER_IP,
+            "upstream": SETTINGS.WEBSOCKET_MAX_SESSIONS_PER_UPSTREAM,
+        }
+
+
+    @staticmethod
+    def restart() -> Tuple[int, str]:
+        """
+            Builds the close frame sent to a session on shutdown.
+
+            Returns:
+                Tuple[int, str]: Close code and reason with a random reconnect delay in seconds.
+        """
+        delay = random.uniform(0.0, SETTINGS.WEBSOCKET_RECONNECT_DELAY)
+        return 1012, f"Service restart. reconnect_after={delay:.1f}"
+
+
+    def rejection(self, user: Union[int, None], ip: Union[str, None], upstream: str) -> Union[Tuple[int, str], None]:
+        """
+            Checks whether a new session is admitted.
+
+            Args:
+                user (int, optional): ID of the authenticated user, None if the session is anonymous.
+                ip (str, optional): IP of the client.
+                upstream (str): Base URL of the microservice.
+
+            Returns:
+                Tuple[int, str]: Close code and reason if the session is rejected, None otherwise.
+        """
+        if self.draining:
+            METRICS_HELPER.websocket_rejections.inc("draining")
+            return self.restart()
+
+        for key, value in (("user", user), ("ip", ip), ("upstream", upstream)):
+            limit = self.limits()[key]
+
+            if value is not None and limit > 0 and self.counts[key][value] >= limit:
+                METRICS_HELPER.websocket_rejections.inc(key)
+                return 1013, f"Too many WebSocket sessions for this {key}, try again later."
+
+        return None
+
+
+    def acquire(self, user: Union[int, None], ip: Union[str, None], upstream: str) -> WebSocketSession:
+        """
+            Registers a new session, call rejection() first without awaiting in between.
+
+            Args:
+                user (int, optional): ID of the authenticated user, None if the session is anonymous.
+                ip (str, optional): IP of the client.
+                upstream (str): Base URL of the microservice.
+
+            Returns:
+                WebSocketSession: The registered session.
+        """
+        session = WebSocketSession(user, ip, upstream)
+        self.sessions.add(session)
+
+        for key in self.counts:
+            if getattr(session, key) is not None:
+                self.counts[key][getattr(session, key)] += 1
+
+        METRICS_HELPER.websocket_sessions.inc()
+        return session
+
+
+    def attach(self, session: WebSocketSession, relay: Any) -> None:
+        """
+            Links the relay of a session, so a drain can stop it.
+
+            Args:
+                session (WebSocketSession): Registered session.
+                relay (WebSocketRelay): Relay of the session.
+        """
+        session.relay = relay
+
+        # Connected to the microservice while the worker started draining
+        if self.draining:
+            relay.stop(*self.restart())
+
+
+    def release(self, session: WebSocketSession) -> None:
+        """
+            Unregisters a session once it is closed.
+
+            Args:
+                session (WebSocketSession): Registered session.
+        """
+        if session not in self.sessions:
+            return
+
+        self.sessions.discard(session)
+
+        for key in self.counts:
+            value = getattr(session, key)
+
+            if value is not None:
+                self.counts[key][value] -= 1
+
+                if self.counts[key][value] <= 0:
+                    del self.counts[key][value]
+
+        METRICS_HELPER.websocket_sessions.dec()
+
+        if not self.sessions and self.drained is not None:
+            self.drained.set()
+
+
+    async def drain(self) -> None:
+        """
+            Rejects new sessions and closes the open ones spread over the drain period,
+            then waits for them to finish closing.
+        """
+        self.draining = True
+
+        if self.drained is None:
+            self.drained = asyncio.Event()
+
+        if not self.sessions:
+            return
+
+        loop = asyncio.get_running_loop()
+        sessions = [session for session in self.sessions if session.relay is not None]
+        random.shuffle(sessions)
+
+        LOGGER.info(f"Draining {len(self.sessions)} WebSocket sessions over {SETTINGS.WEBSOCKET_DRAIN_PERIOD} seconds")
+
+        for index, session in enumerate(sessions):
+            loop.call_later(SETTINGS.WEBSOCKET_DRAIN_PERIOD * index / len(sessions), session.relay.stop, *self.restart())
+
+        try:
+            await asyncio.wait_for(self.drained.wait(), SETTINGS.WEBSOCKET_DRAIN_PERIOD + SETTINGS.WEBSOCKET_CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            LOGGER.warning(f"{len(self.sessions)} WebSocket sessions were still open after the drain period")
+
+
+    def handle_signal(self, loop: asyncio.AbstractEventLoop, number: int, frame: Union[FrameType, None]) -> None:
+        """
+            Drains the sessions before passing the signal to the previous handler.
+
+            Args:
+                loop (asyncio.AbstractEventLoop): Event loop of the worker.
+                number (int): Signal number.
+                frame (FrameType, optional): Interrupted frame.
+        """
+        previous = self.handlers[number]
+
+        if self.draining or not self.sessions:
+            previous(number, frame)
+            return
+
+        self.draining = True
+
+        def drain() -> None:
+            self.task = loop.create_task(self.drain(), name="websocket-drain")
+            self.task.add_done_callback(lambda _: previous(number, None))
+
+        loop.call_soon_threadsafe(drain)
+
+
+    async def start(self) -> None:
+        """
+            Accepts new sessions and chains the handlers of the shutdown signals, which
+            can only be replaced from the main thread.
+        """
+        self.draining = False
+        self.drained = None
+
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        loop = asyncio.get_running_loop()
+
+        for number in DRAIN_SIGNALS:
+            previous = signal.getsignal(number)
+
+            if callable(previous):
+                self.handlers[number] = previous
+                signal.signal(number, lambda received, frame: self.handle_signal(loop, received, frame))
+
+
+    async def stop(self) -> None:
+        """
+            Drains the sessions still open and restores the signal handlers.
+        """
+        if self.task is not None:
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        await self.drain()
+
+        for number, previous in self.handlers.items():
+            signal.signal(number, previous)
+
+        self.handlers.clear()
+
+
+
+WS_SESSIONS = WebSocketSessionHelper()
@@ -0,0 +1,59 @@
+import json
+import time
+from typing import Union
+
+from fastapi import Request, Response
+
+from starlette.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from core.helpers.AuditHelper import AUDIT_HELPER
+
+
+
+class AuditMiddleware(BaseHTTPMiddleware):
+    """
+        Middleware that records every request proxied by the gateway in the
+        audit trail. Records are only queued, the audit writer stores them
+        in the background.
+    """
+
+    AUDITED_PREFIX = "/gateway/"
+
+
+    async def dispatch(self, request: Request, call_next) -> Union[JSONResponse, Response]:
+        """
+            Handles incoming requests and queues their audit record once answered.
+
+            Args:
+                request: Request object.
+                call_next: Function to call the next middleware layer.
+
+            Returns:
+                HTTP response.
+        """
+        if not request.url.path.startswith(self.AUDITED_PREFIX):
+            return await call_next(request)
+
+        started = time.perf_counter()
+        status_code = 500
+
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+
+        finally:
+            AUDIT_HELPER.record(
+                url_request = request.url.path,
+                type_request = request.method,
+                system = getattr(request.state, "system", None),
+                user_ip = request.client.host if request.client else None,
+                user_browser = request.headers.get("user-agent"),
+                query = str(request.query_params),
+                details = json.dumps({
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3)
+                }),
+                user_id = getattr(request.state, "user_id", None),
+            )
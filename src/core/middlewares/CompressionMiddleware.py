@@ -0,0 +1,128 @@
+from typing import Union
+
+from fastapi import Request, Response
+
+from starlette.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from settings import SETTINGS
+from core.utils.MakeRequest import STREAMING_MEDIA_TYPES
+from core.helpers.MetricsHelper import METRICS_HELPER
+from core.helpers.CompressionHelper import COMPRESSION_HELPER
+
+
+
+class CompressionMiddleware(BaseHTTPMiddleware):
+    """
+        Middleware that compresses the responses with the encoding negotiated from the
+        Accept-Encoding of the client. Bodies of known length are compressed whole when
+        they reach COMPRESSION_MIN_SIZE, streams part by part as they are relayed, and
+        bodies the microservice already encoded go out untouched.
+    """
+
+
+    async def dispatch(self, request: Request, call_next) -> Union[JSONResponse, Response]:
+        """
+            Handles incoming requests and compresses their responses.
+
+            Args:
+                request: Request object.
+                call_next: Function to call the next middleware layer.
+
+            Returns:
+                HTTP response.
+        """
+        response = await call_next(request)
+
+        if not SETTINGS.COMPRESSION_ENABLED or not self.compressible(response):
+            return response
+
+        # The body depends on the Accept-Encoding, whether it is compressed or not
+        vary = response.headers.get("vary")
+        if vary is None:
+            response.headers["vary"] = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower() and vary.strip() != "*":
+            response.headers["vary"] = f"{vary}, Accept-Encoding"
+
+        if "content-encoding" in response.headers:
+            METRICS_HELPER.compression.inc(response.headers["content-encoding"], "passthrough")
+            return response
+
+        encoding = COMPRESSION_HELPER.negotiate(request.headers.get("accept-encoding", ""))
+
+        if encoding is None or request.method == "HEAD":
+            return response
+
+        media_type = response.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+
+        if media_type in STREAMING_MEDIA_TYPES or "content-length" not in response.headers:
+            if not COMPRESSION_HELPER.within_budget():
+                METRICS_HELPER.compression.inc(encoding, "budget")
+                return response
+
+            self.encode_headers(response, encoding)
+            response.body_iterator = COMPRESSION_HELPER.stream(response.body_iterator, encoding)
+            return response
+
+        if int(response.headers["content-length"]) < SETTINGS.COMPRESSION_MIN_SIZE:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        compressed = await COMPRESSION_HELPER.compress(body, encoding)
+
+        if compressed is None or len(compressed) >= len(body):
+            response.body_iterator = self.iterate(body)
+            return response
+
+        self.encode_headers(response, encoding)
+        response.headers["content-length"] = str(len(compressed))
+        response.body_iterator = self.iterate(compressed)
+        return response
+
+
+    @staticmethod
+    def compressible(response: Response) -> bool:
+        """
+            Checks whether a response may be compressed: it has a body, is not partial,
+            allows transformations and its media type is in COMPRESSION_MEDIA_TYPES.
+
+            Args:
+                response: Response of the next middleware layer.
+
+            Returns:
+                bool: True if the response may be compressed.
+        """
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+
+        if "content-range" in response.headers or "no-transform" in response.headers.get("cache-control", "").lower():
+            return False
+
+        media_type = response.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        return bool(media_type) and COMPRESSION_HELPER.compressible(media_type)
+
+
+    @staticmethod
+    def encode_headers(response: Response, encoding: str) -> None:
+        """
+            Marks a response as encoded. Its length is unknown until it is compressed and a
+            strong ETag no longer identifies its bytes, so the ETag becomes weak.
+
+            Args:
+                response: Response of the next middleware layer.
+                encoding (str): Encoding of the body.
+        """
+        response.headers["content-encoding"] = encoding
+
+        if "content-length" in response.headers:
+            del response.headers["content-length"]
+
+        etag = response.headers.get("etag")
+
+        if etag and not etag.startswith("W/"):
+            response.headers["etag"] = f"W/{etag}"
+
+
+    @staticmethod
+    async def iterate(body: bytes):
+        yield body
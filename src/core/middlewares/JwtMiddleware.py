@@ -7,6 +7,8 @@ from sqlalchemy.future import select
 
 from core.databases.Models import Users, Endpoints
 from core.bases.BaseRepositories import BaseRepository
+from core.helpers.TracingHelper import TRACING_HELPER
+from core.helpers.RouteCacheHelper import ROUTE_CACHE
 from core.helpers.JwtManagerHelper import JwtManagerHelper
 
 
@@ -16,6 +18,7 @@ class JWTBearer(HTTPBearer):
         super(JWTBearer, self).__init__(auto_error=auto_error, scheme_name=scheme_name)
 
 
+    @TRACING_HELPER.trace("jwt_bearer")
     async def __call__(self, request: Request) -> Union[dict, HTTPException]:
         credentials: HTTPAuthorizationCredentials = await super(JWTBearer, self).__call__(request)
         base = BaseRepository()
@@ -30,10 +33,11 @@ class JWTBearer(HTTPBearer):
                     }
                 )
 
-            jwt_token = await JwtManagerHelper(token=credentials.credentials).validate_token()
+            with TRACING_HELPER.span("jwt_validate"):
+                jwt_token = await JwtManagerHelper(token=credentials.credentials).validate_token()
 
             if request.url.path.startswith("/administration/") and not request.url.path.startswith("/administration/users/get_current_user"):
-                async with base.get_connection() as session:
+                async with base.get_connection(read_only=True) as session:
                     async with session.begin():
                         user = await session.execute(
                             select(Users).where(Users.email == jwt_token.get("email"), Users.is_superuser == True)
@@ -54,13 +58,14 @@ class JWTBearer(HTTPBearer):
             # #### TO THE REQUESTED ROUTE
             from core.helpers.PermissionHelper import PERMISSION_HELPER
 
-            async with base.get_connection() as session:
+            async with base.get_connection(read_only=True) as session:
                 async with session.begin():
                     user_id = (
                         await session.execute(
                             select(Users.id).where(Users.email == jwt_token.get("email"))
                         )
                     ).scalar()
+                    request.state.user_id = user_id
 
                     control_access = await PERMISSION_HELPER.user_access_control(
                         user_id,            # ID OF THE LOGGED USER
@@ -82,12 +87,14 @@ class JWTBearer(HTTPBearer):
             if request.url.path in ["/authentication/login", "/authentication/register"]:
                 return True
 
-            async with base.get_connection() as session:
+            template = await ROUTE_CACHE.resolve(request.url.path)
+
+            async with base.get_connection(read_only=True) as session:
                 async with session.begin():
                     endpoint = (
                         await session.execute(
                             select(Endpoints).where(
-                                Endpoints.endpoint_url == request.url.path.replace("/gateway", ""),
+                                Endpoints.endpoint_url == template,
                                 Endpoints.endpoint_authenticated == False
                             )
                         )
@@ -0,0 +1,83 @@
+import time
+from typing import Union
+
+from fastapi import Request, Response
+
+from starlette.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from core.helpers.MetricsHelper import METRICS_HELPER
+
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """
+        Middleware that records the count and latency of every request, labeled by
+        endpoint template, microservice, method and status. Gateway requests are
+        labeled with the Endpoints.endpoint_url they matched, other requests with
+        the path of their route, so the number of series stays bounded.
+    """
+
+
+    async def dispatch(self, request: Request, call_next) -> Union[JSONResponse, Response]:
+        """
+            Handles incoming requests and records their metrics once answered.
+
+            Args:
+                request: Request object.
+                call_next: Function to call the next middleware layer.
+
+            Returns:
+                HTTP response.
+        """
+        METRICS_HELPER.in_flight.inc()
+        started = time.perf_counter()
+        status_code = 500
+
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+
+        finally:
+            METRICS_HELPER.in_flight.dec()
+            labels = (
+                self.endpoint_label(request),
+                getattr(request.state, "microservice", None) or "",
+                request.method,
+                str(status_code),
+            )
+            METRICS_HELPER.requests.inc(*labels)
+            METRICS_HELPER.request_duration.observe(*labels, value=time.perf_counter() - started)
+
+
+    @staticmethod
+    def endpoint_label(request: Request) -> str:
+        """
+            Obtains the endpoint template of a request. Outside the gateway, the
+            values of the path parameters are replaced by their names.
+
+            Args:
+                request: Request object.
+
+            Returns:
+                str: Endpoint template, route template or "unmatched".
+        """
+        endpoint = getattr(request.state, "endpoint", None)
+
+        if endpoint:
+            return endpoint
+
+        if request.scope.get("route") is None:
+            return "unmatched"
+
+        path = request.url.path
+
+        for name, value in request.path_params.items():
+            value = str(value)
+
+            if value:
+                head, _, tail = path.rpartition(value)
+                path = f"{head}{{{name}}}{tail}" if head or tail else f"{{{name}}}"
+
+        return path
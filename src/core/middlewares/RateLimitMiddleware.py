@@ -7,6 +7,8 @@ from starlette.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from settings import SETTINGS
+from core.bases.BaseResponses import DEFAULT_RESPONSE_CLASS
+from core.helpers.TracingHelper import TRACING_HELPER
 
 
 
@@ -40,10 +42,13 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         """
         client_ip = request.client.host
 
-        if not self.allow_request(client_ip):
+        with TRACING_HELPER.span("rate_limit"):
+            allowed = self.allow_request(client_ip)
+
+        if not allowed:
             remaining_time = self.get_remaining_block_time(client_ip)
 
-            return JSONResponse(
+            return DEFAULT_RESPONSE_CLASS(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "code": status.HTTP_429_TOO_MANY_REQUESTS,
@@ -0,0 +1,50 @@
+from typing import Union
+
+from fastapi import Request, Response
+
+from starlette.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from settings import SETTINGS
+from core.helpers.TracingHelper import TRACING_HELPER
+from core.middlewares.MetricsMiddleware import MetricsMiddleware
+
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+        Middleware that opens the root span of every request. The stages measured
+        below it (rate limit, authentication, permissions, lookups, upstream call
+        and encoding) become its children and, when enabled, are reported to the
+        client in the Server-Timing header.
+    """
+
+
+    async def dispatch(self, request: Request, call_next) -> Union[JSONResponse, Response]:
+        """
+            Handles incoming requests inside a root span.
+
+            Args:
+                request: Request object.
+                call_next: Function to call the next middleware layer.
+
+            Returns:
+                HTTP response.
+        """
+        if not SETTINGS.TRACING_ENABLED:
+            return await call_next(request)
+
+        with TRACING_HELPER.request(
+            f"{request.method} {request.url.path}",
+            request.headers.get("traceparent"),
+            **{"http.method": request.method, "http.target": request.url.path}
+        ) as span:
+            response = await call_next(request)
+
+            span.name = f"{request.method} {MetricsMiddleware.endpoint_label(request)}"
+            span.set("http.status_code", response.status_code)
+
+            if SETTINGS.TRACING_SERVER_TIMING:
+                response.headers["Server-Timing"] = TRACING_HELPER.server_timing(span)
+
+            return response
@@ -1,10 +1,14 @@
 from fastapi import FastAPI
 
 from apps.gateway.routers import gateway
+from apps.monitoring.routers import monitoring
+from apps.administration.routers import administration
 from apps.authentication.routers import authentication
 
 
 
 def routersApp(app: FastAPI) -> None:
     app.include_router(gateway)
-    app.include_router(authentication)
\ No newline at end of file
+    app.include_router(authentication)
+    app.include_router(monitoring)
+    app.include_router(administration)
\ No newline at end of file
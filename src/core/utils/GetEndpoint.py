@@ -4,15 +4,17 @@ from sqlalchemy.future import select
 
 from core.databases.Models import Endpoints
 from core.bases.BaseRepositories import BaseRepository
+from core.helpers.TracingHelper import TRACING_HELPER
 
 
 
+@TRACING_HELPER.trace("route_lookup")
 async def get_endpoint(path: str):
     """
         Retrieves an endpoint based on the provided path.
 
         Args:
-        - path (str): The path to the endpoint.
+        - path (str): The endpoint URL, the template matched by the requested path (see RouteCacheHelper.match).
 
         Returns:
         - Endpoint object.
@@ -22,7 +24,7 @@ async def get_endpoint(path: str):
     """
     base = BaseRepository()
 
-    async with base.get_connection() as session:
+    async with base.get_connection(read_only=True) as session:
         async with session.begin():
             statement = select(Endpoints).where(Endpoints.endpoint_url == path)
             result = await session.execute(statement)
@@ -1,20 +1,21 @@
 from fastapi import HTTPException
 
 from sqlalchemy import exc
-from sqlalchemy.orm import selectinload
 from sqlalchemy.future import select
 
 from core.bases.BaseRepositories import BaseRepository
 from core.databases.Models import Endpoints, MicroServices
+from core.helpers.TracingHelper import TRACING_HELPER
 
 
 
+@TRACING_HELPER.trace("microservice_lookup")
 async def get_microservices(path: str):
     """
         Retrieves the microservices based on the provided path.
 
         Args:
-        - path (str): The path to the endpoint.
+        - path (str): The endpoint URL, the template matched by the requested path.
 
         Returns:
         - List of microservices.
@@ -24,11 +25,9 @@ async def get_microservices(path: str):
     """
     base = BaseRepository()
 
-    async with base.get_connection() as session:
+    async with base.get_connection(read_only=True) as session:
         async with session.begin():
-            statement = select(MicroServices).options(
-                selectinload(MicroServices.back_endpoints_endpoint_microservice)
-            ).where(
+            statement = select(MicroServices).where(
                 MicroServices.back_endpoints_endpoint_microservice.has(Endpoints.endpoint_microservice == None) | 
                 MicroServices.back_endpoints_endpoint_microservice.has(Endpoints.endpoint_url == path)
             )
@@ -1,7 +1,16 @@
 import os
+import re
+import copy
+import json
+import queue
+import atexit
+import random
 import logging
 import logging.config
-from datetime import datetime
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+from settings import SETTINGS
 
 
 
@@ -9,45 +18,171 @@ LOGGING_DIR = os.path.join(os.getcwd(), 'logs')
 if not os.path.exists(LOGGING_DIR):
     os.makedirs(LOGGING_DIR)
 
+# Attributes every LogRecord has, anything else was passed through extra=
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+# Bearer token a WebSocket client may send in the query string, uvicorn logs the path with it
+TOKEN_QUERY_PATTERN = re.compile(r'(access_token=)[^&\s"]*')
+
+
+
+class JsonFormatter(logging.Formatter):
+    """
+        Formats each record as a single JSON line, including the fields passed through extra=.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'process': record.process,
+            'message': record.getMessage(),
+        }
+
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+
+class SamplingFilter(logging.Filter):
+    """
+        Keeps a fraction of the records below WARNING, used for the high-volume access log.
+    """
+
+    def __init__(self, rate: float = 1.0) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+
+class TokenRedactingFilter(logging.Filter):
+    """
+        Replaces the access_token of the query strings in the arguments of the uvicorn records.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple) and any(isinstance(arg, str) and 'access_token=' in arg for arg in record.args):
+            record.args = tuple(
+                TOKEN_QUERY_PATTERN.sub(r'\1[REDACTED]', arg) if isinstance(arg, str) else arg
+                for arg in record.args
+            )
+
+        return True
+
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+        Queue handler that never blocks the caller: when the queue is full the record
+        is dropped and counted instead of waiting for the writer thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The base class formats the record and clears exc_info, which would leave the
+        # formatters of the listener without the exception; only the message is merged
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+
+
+LOG_QUEUE: queue.Queue = queue.Queue(maxsize=SETTINGS.LOGGING_QUEUE_SIZE)
+
+FORMATTER = JsonFormatter() if SETTINGS.LOGGING_FORMAT == 'json' else logging.Formatter(
+    '{levelname} {asctime} {module} {message}',
+    style='{'
+)
+
+CONSOLE_HANDLER = logging.StreamHandler()
+CONSOLE_HANDLER.setFormatter(FORMATTER)
+
+# Rotates at midnight, the active file is gateway.log and the rotated ones get the date as suffix
+FILE_HANDLER = TimedRotatingFileHandler(
+    os.path.join(LOGGING_DIR, 'gateway.log'),
+    when='midnight',
+    backupCount=SETTINGS.LOGGING_BACKUP_DAYS,
+    encoding='utf-8',
+    delay=True
+)
+FILE_HANDLER.setFormatter(FORMATTER)
+
+# The console and file writes happen in the listener thread, never on the event loop
+LOG_LISTENER = QueueListener(LOG_QUEUE, CONSOLE_HANDLER, FILE_HANDLER, respect_handler_level=True)
+
 
 LOGGING_CONFIG = {
     'version': 1,
     'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
-            'style': '{',
+    'filters': {
+        'access_sampling': {
+            '()': SamplingFilter,
+            'rate': SETTINGS.LOGGING_ACCESS_SAMPLE_RATE,
         },
-        'simple': {
-            'format': '{levelname} {message}',
-            'style': '{',
+        'token_redacting': {
+            '()': TokenRedactingFilter,
         },
     },
     'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
-        },
-        'file': {
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(LOGGING_DIR, f"{datetime.now().strftime('%Y-%m-%d')}.log"),
-            'formatter': 'verbose',
+        'queue': {
+            '()': NonBlockingQueueHandler,
+            'log_queue': LOG_QUEUE,
         },
     },
     'loggers': {
+        # Configuring the uvicorn loggers replaces the synchronous handlers uvicorn installs
         'uvicorn': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
+            'level': 'INFO',
+        },
+        'uvicorn.error': {
+            'handlers': [],
+            'filters': ['token_redacting'],
+            'level': 'INFO',
+        },
+        'uvicorn.access': {
+            'handlers': ['queue'],
+            'filters': ['access_sampling', 'token_redacting'],
             'level': 'INFO',
+            'propagate': False,
         },
         'fastapi': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
         },
         'tortoise': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
         },
+        'sqlalchemy.engine': {
+            'handlers': ['queue'],
+            'level': 'INFO' if SETTINGS.DATABASE_ECHO else 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
-logging.config.dictConfig(LOGGING_CONFIG)
\ No newline at end of file
+logging.config.dictConfig(LOGGING_CONFIG)
+
+LOG_LISTENER.start()
+atexit.register(LOG_LISTENER.stop)
@@ -1,6 +1,85 @@
-from typing import Dict, Any
+from typing import Any, Awaitable, Callable, Dict, Tuple, Union
 
-from httpx import AsyncClient
+from httpx import Response, Timeout
+
+from settings import SETTINGS
+from core.helpers.TracingHelper import TRACING_HELPER
+from core.helpers.UpstreamHelper import UPSTREAM_HELPER
+
+
+
+# Media types relayed as they arrive instead of read whole, besides any chunked body without length
+STREAMING_MEDIA_TYPES = {"text/event-stream", "application/x-ndjson"}
+
+
+def is_streaming(response: Response) -> bool:
+    """
+        Checks whether a response must be relayed as it arrives: Server-Sent Events,
+        newline delimited JSON or a successful body of unknown length, like long polling.
+        The length is unknown without Content-Length, HTTP/2 has no Transfer-Encoding.
+        Error responses are read, so they keep the error handling of the gateway.
+
+        Args:
+        - response (Response): Response of the microservice, with its body not read yet.
+
+        Returns:
+        - True if the response is a stream.
+    """
+    media_type = response.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+
+    if media_type in STREAMING_MEDIA_TYPES:
+        return True
+
+    return (
+        200 <= response.status_code < 300
+        and response.status_code not in (204, 205)
+        and "content-length" not in response.headers
+    )
+
+
+
+async def open_request(
+        method: str,
+        url: str,
+        headers: Dict[str, Any],
+        body: bytes,
+        http2: bool = False,
+        max_streams: Union[int, None] = None,
+        key: Any = None
+    ) -> Tuple[Response, Callable[[], Awaitable[None]]]:
+    """
+        Makes an asynchronous request to a specific URL through the shared clients and
+        returns as soon as the headers of the response arrive, without reading its body.
+
+        Args:
+        - method (str): HTTP method.
+        - url (str): The URL of the endpoint.
+        - headers (Dict[str, Any]): Request headers.
+        - body (bytes): Request body.
+        - http2 (bool): Whether the microservice has HTTP/2 enabled.
+        - max_streams (int, optional): Maximum concurrent requests to the microservice, 0 for unlimited, None for the default.
+        - key (Any): Microservice the limit applies to.
+
+        Returns:
+        - Response object and the function that closes it, the caller reads or streams the body and closes it.
+    """
+    # An event stream stays silent between events for as long as the microservice wants
+    accepts_stream = "text/event-stream" in str(headers.get("accept", ""))
+    timeout = Timeout(600.0, read=None if accepts_stream else 600.0, pool=SETTINGS.UPSTREAM_POOL_TIMEOUT)
+
+    with TRACING_HELPER.span("upstream", **{"http.method": method, "http.url": url}) as span:
+        if span is not None:
+            span.kind = 3  # OTLP span kind CLIENT
+
+        response, close = await UPSTREAM_HELPER.open(
+            method, url, TRACING_HELPER.inject(headers), body, timeout, http2, max_streams, key, accepts_stream
+        )
+
+        if span is not None:
+            span.set("http.status_code", response.status_code)
+            span.set("http.flavor", response.http_version)
+
+    return response, close
 
 
 
@@ -22,12 +101,11 @@ async def make_request(
         Returns:
         - Response object.
     """
-    async with AsyncClient() as client:
-        response = await client.request(
-            method=method,
-            url=url,
-            headers=headers,
-            data=body,
-            timeout=600.0
-        )
+    response, close = await open_request(method, url, headers, body)
+
+    try:
+        await response.aread()
+    finally:
+        await close()
+
     return response
@@ -1,11 +1,22 @@
 import core.utils.Logger
 
 from fastapi import FastAPI
+from fastapi.exceptions import RequestValidationError
+from starlette.exceptions import HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
 from settings import SETTINGS
 from core.routers.Routers import routersApp
+from core.bases.BaseResponses import (
+    APP_RESPONSE_CLASS,
+    http_exception_handler,
+    validation_exception_handler
+)
 from core.contexts.managers.Lifespan import lifespan
+from core.middlewares.AuditMiddleware import AuditMiddleware
+from core.middlewares.MetricsMiddleware import MetricsMiddleware
+from core.middlewares.CompressionMiddleware import CompressionMiddleware
+from core.middlewares.TracingMiddleware import TracingMiddleware
 from core.middlewares.RateLimitMiddleware import RateLimitMiddleware
 
 
@@ -13,11 +24,19 @@ from core.middlewares.RateLimitMiddleware import RateLimitMiddleware
 app = FastAPI(
     title=SETTINGS.PROJECT_NAME,
     openapi_url=f"{SETTINGS.URL_API_DOCUMENTATION}openapi.json",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=APP_RESPONSE_CLASS
 )
 
 
+#### Exception handlers
+if SETTINGS.JSON_RESPONSE_FAST:
+    app.add_exception_handler(HTTPException, http_exception_handler)
+    app.add_exception_handler(RequestValidationError, validation_exception_handler)
+
+
 #### Middlewares
+app.add_middleware(AuditMiddleware)
 app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
@@ -25,7 +44,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=SETTINGS.CORS_MAX_AGE,
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 
 #### Routers
@@ -0,0 +1,68 @@
+import asyncio
+from logging.config import fileConfig
+
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from alembic import context
+
+from settings import SETTINGS
+from core.bases import Base
+import core.databases.Models
+
+
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+
+def run_migrations_offline() -> None:
+    """
+        Runs the migrations in 'offline' mode, emitting the SQL to the output.
+    """
+    context.configure(
+        url=SETTINGS.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+
+def do_run_migrations(connection: Connection) -> None:
+    """
+        Runs the migrations on the given connection.
+    """
+    context.configure(connection=connection, target_metadata=target_metadata)
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+
+async def run_async_migrations() -> None:
+    """
+        Runs the migrations in 'online' mode against the primary database.
+    """
+    connectable = create_async_engine(SETTINGS.DATABASE_URL, poolclass=pool.NullPool)
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_async_migrations())
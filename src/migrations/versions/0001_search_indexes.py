@@ -0,0 +1,79 @@
+"""search indexes
+
+Adds the pg_trgm extension and the GIN indexes backing the search of
+BaseRepository.list. The tables themselves are created by create_all.
+
+Revision ID: 0001_search_indexes
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0001_search_indexes"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRIGRAM_INDEXES = [
+    ("systems", "system_code"),
+    ("systems", "name_system"),
+    ("micro_services", "microservice_name"),
+    ("endpoints", "endpoint_name"),
+    ("endpoints", "endpoint_url"),
+    ("profiles", "first_name"),
+    ("profiles", "last_name"),
+    ("profiles", "document"),
+    ("users", "email"),
+    ("historical_movements", "url_request"),
+    ("historical_movements", "system"),
+    ("historical_movements", "user_ip"),
+]
+
+FULLTEXT_INDEXES = [
+    ("endpoints", "endpoint_description"),
+    ("historical_movements", "details"),
+]
+
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Built concurrently so large tables stay writable during the migration
+    with op.get_context().autocommit_block():
+        for table, column in TRIGRAM_INDEXES:
+            op.create_index(
+                f"ix_{table}_{column}_trgm",
+                table,
+                [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+        for table, column in FULLTEXT_INDEXES:
+            op.create_index(
+                f"ix_{table}_{column}_tsv",
+                table,
+                [sa.text(f"to_tsvector('simple', coalesce({column}, ''))")],
+                postgresql_using="gin",
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column in FULLTEXT_INDEXES:
+            op.drop_index(f"ix_{table}_{column}_tsv", table_name=table, postgresql_concurrently=True, if_exists=True)
+
+        for table, column in TRIGRAM_INDEXES:
+            op.drop_index(f"ix_{table}_{column}_trgm", table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,103 @@
+"""partition historical_movements
+
+Converts historical_movements into a table range partitioned by month
+on created_at. The existing rows are copied into monthly partitions, in
+UTC, and the partitions for the upcoming months are created ahead of
+time, the PartitionHelper keeps creating and dropping them afterwards.
+A DEFAULT partition takes the rows outside every monthly partition.
+
+Revision ID: 0002_historical_partitions
+Revises: 0001_search_indexes
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0002_historical_partitions"
+down_revision: Union[str, Sequence[str], None] = "0001_search_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLE = "historical_movements"
+COLUMNS = "id, created_at, updated_at, url_request, type_request, system, user_ip, user_browser, query, details, user_id"
+PREMAKE_MONTHS = 3
+
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+
+def month_bound(month: date) -> str:
+    return f"{month.isoformat()} 00:00:00+00"
+
+
+
+def create_indexes() -> None:
+    op.execute(f"CREATE INDEX ix_{TABLE}_id ON {TABLE} (id)")
+
+    for column in ("url_request", "system", "user_ip"):
+        op.execute(f"CREATE INDEX ix_{TABLE}_{column}_trgm ON {TABLE} USING gin ({column} gin_trgm_ops)")
+
+    op.execute(f"CREATE INDEX ix_{TABLE}_details_tsv ON {TABLE} USING gin (to_tsvector('simple', coalesce(details, '')))")
+
+
+
+def replace_table(new_table: str, primary_key: str) -> None:
+    """
+        Moves the rows and the id sequence to the new table, drops the current
+        table and gives the new one its name, constraints and indexes.
+    """
+    op.execute(f"ALTER TABLE {new_table} ADD CONSTRAINT {new_table}_pkey PRIMARY KEY ({primary_key})")
+    op.execute(
+        f"INSERT INTO {new_table} ({COLUMNS}) "
+        f"SELECT {COLUMNS.replace('created_at', 'COALESCE(created_at, now())')} FROM {TABLE}"
+    )
+
+    sequence = op.get_bind().execute(sa.text(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")).scalar()
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {new_table}.id")
+
+    op.execute(f"DROP TABLE {TABLE}")
+    op.execute(f"ALTER TABLE {new_table} RENAME TO {TABLE}")
+    op.execute(f"ALTER TABLE {TABLE} RENAME CONSTRAINT {new_table}_pkey TO {TABLE}_pkey")
+    op.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)")
+    create_indexes()
+
+
+
+def upgrade() -> None:
+    new_table = f"{TABLE}_partitioned"
+    op.execute(f"CREATE TABLE {new_table} (LIKE {TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+
+    # One partition per month from the oldest row up to the premade months
+    oldest, newest = op.get_bind().execute(sa.text(f"SELECT min(created_at), max(created_at) FROM {TABLE}")).one()
+    today = datetime.now(timezone.utc).date()
+    month = month_start(oldest.astimezone(timezone.utc).date() if oldest else today)
+    last = max(month_start(today, PREMAKE_MONTHS), month_start(newest.astimezone(timezone.utc).date()) if newest else month)
+
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE {TABLE}_y{month.year:04d}m{month.month:02d} PARTITION OF {new_table} "
+            f"FOR VALUES FROM ('{month_bound(month)}') TO ('{month_bound(month_start(month, 1))}')"
+        )
+        month = month_start(month, 1)
+
+    op.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {new_table} DEFAULT")
+
+    replace_table(new_table, "id, created_at")
+
+
+
+def downgrade() -> None:
+    new_table = f"{TABLE}_plain"
+    op.execute(f"CREATE TABLE {new_table} (LIKE {TABLE} INCLUDING DEFAULTS)")
+    replace_table(new_table, "id")
@@ -0,0 +1,61 @@
+"""association indexes
+
+Adds the btree indexes on the foreign keys of the association tables
+and on the keys joining the endpoints to their system. The access
+control of every protected request resolves the roles of the user and
+of the endpoint through these tables, without the indexes each lookup
+scans them whole and its cost grows with the number of grants.
+
+Revision ID: 0003_association_indexes
+Revises: 0002_historical_partitions
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0003_association_indexes"
+down_revision: Union[str, Sequence[str], None] = "0002_historical_partitions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ASSOCIATION_INDEXES = [
+    ("groups_roles", "group_id"),
+    ("groups_roles", "role_id"),
+    ("endpoints_roles", "endpoint_id"),
+    ("endpoints_roles", "role_id"),
+    ("endpoints_groups", "endpoint_id"),
+    ("endpoints_groups", "group_id"),
+    ("users_roles", "user_id"),
+    ("users_roles", "role_id"),
+    ("users_groups", "user_id"),
+    ("users_groups", "group_id"),
+    ("users_systems", "user_id"),
+    ("users_systems", "system_id"),
+    ("micro_services", "microservice_system_id"),
+    ("endpoints", "endpoint_microservice_id"),
+]
+
+
+
+def upgrade() -> None:
+    # Built concurrently so the grants stay writable during the migration
+    with op.get_context().autocommit_block():
+        for table, column in ASSOCIATION_INDEXES:
+            op.create_index(
+                f"ix_{table}_{column}",
+                table,
+                [column],
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column in ASSOCIATION_INDEXES:
+            op.drop_index(f"ix_{table}_{column}", table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,36 @@
+"""websocket multiplex flag
+
+Adds micro_services.microservice_websocket_multiplex. The WebSocket
+sessions of a microservice with the flag enabled are multiplexed as
+channels on a small pool of shared upstream connections, instead of one
+upstream connection per client.
+
+Revision ID: 0004_websocket_multiplex
+Revises: 0003_association_indexes
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0004_websocket_multiplex"
+down_revision: Union[str, Sequence[str], None] = "0003_association_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+
+def upgrade() -> None:
+    # The server default fills the existing rows without rewriting the table
+    op.add_column(
+        "micro_services",
+        sa.Column("microservice_websocket_multiplex", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+
+
+def downgrade() -> None:
+    op.drop_column("micro_services", "microservice_websocket_multiplex")
@@ -0,0 +1,38 @@
+"""upstream http2
+
+Adds micro_services.microservice_http2 and
+micro_services.microservice_max_streams. The requests to a microservice
+with HTTP/2 enabled are multiplexed as streams over a few shared
+connections, and at most microservice_max_streams of them are in flight
+at once (UPSTREAM_MAX_STREAMS when it is null).
+
+Revision ID: 0005_upstream_http2
+Revises: 0004_websocket_multiplex
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0005_upstream_http2"
+down_revision: Union[str, Sequence[str], None] = "0004_websocket_multiplex"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+
+def upgrade() -> None:
+    op.add_column(
+        "micro_services",
+        sa.Column("microservice_http2", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.add_column("micro_services", sa.Column("microservice_max_streams", sa.Integer(), nullable=True))
+
+
+
+def downgrade() -> None:
+    op.drop_column("micro_services", "microservice_max_streams")
+    op.drop_column("micro_services", "microservice_http2")
@@ -0,0 +1,31 @@
+"""endpoint headers
+
+Adds endpoints.endpoint_headers, the header rules applied to the requests
+and responses proxied through the endpoint, a JSON object like
+{"request": {"set": {...}, "remove": [...]}, "response": {...}}.
+
+Revision ID: 0006_endpoint_headers
+Revises: 0005_upstream_http2
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0006_endpoint_headers"
+down_revision: Union[str, Sequence[str], None] = "0005_upstream_http2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+
+def upgrade() -> None:
+    op.add_column("endpoints", sa.Column("endpoint_headers", sa.JSON(), nullable=True))
+
+
+
+def downgrade() -> None:
+    op.drop_column("endpoints", "endpoint_headers")
@@ -1,3 +1,5 @@
+import os
+import tempfile
 from typing import List
 
 from decouple import config
@@ -18,20 +20,141 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 60  # EXPIRES IN 1 HOUR
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7 # EXPIRES IN 7 DAYS
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = ["http://localhost:4400"] # LIST OF URLS ALLOWED FOR ACCESS
+    CORS_MAX_AGE: int = 7200 # SECONDS THE BROWSERS CACHE A PREFLIGHT (CHROMIUM CAPS IT AT 7200)
 
     # Database config
     DATABASE_URL: str = config("DATABASE_URL", cast=str)
+    DATABASE_REPLICA_URLS: str = config("DATABASE_REPLICA_URLS", default="", cast=str) # COMMA SEPARATED LIST OF READ REPLICAS
+    DATABASE_REPLICA_MAX_LAG: float = 5.0 # MAXIMUM REPLICATION LAG TOLERATED IN SECONDS
+    DATABASE_REPLICA_CHECK_INTERVAL: float = 10.0 # SECONDS BETWEEN REPLICA HEALTH CHECKS
+    DATABASE_ECHO: bool = True # LOG THE SQL STATEMENTS THROUGH THE LOGGING QUEUE
 
     # Vault config
     SYSTEM_CODE: str = config("SYSTEM_CODE", cast=str)
     VAULT_SECRET_KEY: str = config("VAULT_SECRET_KEY", cast=str)
     GRPC_SERVER_ADDRESS: str = config("GRPC_SERVER_ADDRESS", cast=str)
+    VAULT_KEYS_CACHE_TTL: float = 300.0 # SECONDS THE KEY PAIRS ARE REUSED BEFORE ASKING THE VAULT AGAIN (0 ALWAYS ASKS)
+
+    # Responses config
+    JSON_RESPONSE_FAST: bool = False # RENDER THE RESPONSES BUILT BY THE GATEWAY WITH orjson (FALLS BACK TO json IF MISSING)
+
+    # Upstream HTTP config (limits are per worker)
+    UPSTREAM_MAX_CONNECTIONS: int = 100 # HTTP/1.1 CONNECTIONS TO EACH MICROSERVICE (0 UNLIMITED)
+    UPSTREAM_MAX_KEEPALIVE: int = 20 # IDLE HTTP/1.1 CONNECTIONS KEPT FOR REUSE BY EACH MICROSERVICE
+    UPSTREAM_HTTP2_CONNECTIONS: int = 2 # HTTP/2 CONNECTIONS TO EACH MICROSERVICE, EACH CARRIES MANY STREAMS (0 UNLIMITED)
+    UPSTREAM_MAX_EVENT_STREAMS: int = 1000 # CONNECTIONS HOLDING EVENT STREAMS OF EACH MICROSERVICE, OUTSIDE THE POOL OF THE OTHER REQUESTS (0 UNLIMITED)
+    UPSTREAM_POOL_TIMEOUT: float = 5.0 # SECONDS A REQUEST WAITS FOR A FREE CONNECTION BEFORE ANSWERING 503
+    UPSTREAM_MAX_STREAMS: int = 100 # CONCURRENT REQUESTS TO AN HTTP/2 MICROSERVICE WITHOUT microservice_max_streams (0 UNLIMITED)
+    UPSTREAM_QUEUE_TIMEOUT: float = 30.0 # SECONDS A REQUEST WAITS FOR A FREE STREAM BEFORE ANSWERING 503
+    UPSTREAM_HTTP2_RETRY_AFTER: float = 300.0 # SECONDS A MICROSERVICE THAT REJECTED h2c IS REACHED THROUGH HTTP/1.1
+
+    # Proxied headers config
+    HEADERS_TRUST_FORWARDED: bool = False # KEEP THE X-Forwarded-* AND Forwarded OF THE CLIENT AND APPEND TO THEM (ONLY BEHIND A TRUSTED PROXY)
+    HEADERS_IDENTITY: bool = False # REPLACE THE BEARER TOKEN OF AUTHENTICATED REQUESTS WITH THE IDENTITY HEADERS OF THE USER
+    HEADERS_IDENTITY_PREFIX: str = "X-User-" # PREFIX OF THE IDENTITY HEADERS (Id, Email AND Roles), THE ONES SENT BY CLIENTS ARE REMOVED
+
+    # Streaming proxy config
+    STREAM_HEARTBEAT_INTERVAL: float = 15.0 # SECONDS OF SILENCE OF AN EVENT STREAM BEFORE A HEARTBEAT COMMENT IS SENT (0 NEVER)
+
+    # Response compression config
+    COMPRESSION_ENABLED: bool = True # COMPRESS THE RESPONSES OF THE CLIENTS THAT SEND Accept-Encoding
+    COMPRESSION_ENCODINGS: List[str] = ["zstd", "br", "gzip"] # OFFERED ENCODINGS BY PREFERENCE, br AND zstd NEED brotli AND zstandard INSTALLED
+    COMPRESSION_MEDIA_TYPES: List[str] = ["text/*", "application/json", "application/*+json", "application/x-ndjson", "application/javascript", "application/xml", "application/*+xml", "image/svg+xml"] # PATTERNS OF THE COMPRESSED MEDIA TYPES
+    COMPRESSION_MIN_SIZE: int = 1024 # BYTES BELOW WHICH A RESPONSE IS SENT AS IS (STREAMS ARE ALWAYS COMPRESSED)
+    COMPRESSION_GZIP_LEVEL: int = 6 # 1 (FASTEST) TO 9 (SMALLEST)
+    COMPRESSION_BROTLI_QUALITY: int = 4 # 0 (FASTEST) TO 11 (SMALLEST)
+    COMPRESSION_ZSTD_LEVEL: int = 3 # 1 (FASTEST) TO 22 (SMALLEST)
+    COMPRESSION_CPU_BUDGET: float = 0.5 # SECONDS SPENT COMPRESSING PER SECOND BEFORE NEW RESPONSES ARE SENT UNCOMPRESSED (0 UNLIMITED)
+    COMPRESSION_CACHE_SIZE: int = 0 # COMPRESSED COPIES OF REPEATED BODIES KEPT IN MEMORY (0 DISABLED)
+    COMPRESSION_CACHE_MAX_BODY: int = 1048576 # LARGEST BODY WHOSE COMPRESSED COPY IS KEPT
+
+    # WebSocket proxy config
+    WEBSOCKET_BUFFER_SIZE: int = 16 # MESSAGES BUFFERED PER DIRECTION BEFORE READING FROM THE SENDER PAUSES
+    WEBSOCKET_MAX_MESSAGE_SIZE: int = 1024 * 1024 # LARGEST MESSAGE ACCEPTED FROM THE MICROSERVICE IN BYTES
+    WEBSOCKET_OPEN_TIMEOUT: float = 10.0 # SECONDS TO OPEN THE CONNECTION TO THE MICROSERVICE
+    WEBSOCKET_CLOSE_TIMEOUT: float = 5.0 # SECONDS TO WAIT FOR THE CLOSING HANDSHAKE OF THE MICROSERVICE
+    WEBSOCKET_PING_INTERVAL: float = 20.0 # SECONDS BETWEEN PINGS TO THE MICROSERVICE (0 DISABLES THEM, CLIENT PINGS ARE uvicorn --ws-ping-interval)
+    WEBSOCKET_PING_TIMEOUT: float = 20.0 # SECONDS WITHOUT PONG BEFORE THE MICROSERVICE CONNECTION IS CONSIDERED LOST
+    WEBSOCKET_IDLE_TIMEOUT: float = 0.0 # SECONDS WITHOUT MESSAGES IN EITHER DIRECTION BEFORE CLOSING THE SESSION (0 NEVER)
+
+    WEBSOCKET_AUTH_RECHECK_INTERVAL: float = 60.0 # SECONDS BETWEEN AUTHORIZATION RE-CHECKS OF AN OPEN SESSION (0 NEVER)
+    WEBSOCKET_QUERY_TOKEN: bool = False # ALSO ACCEPT THE TOKEN AS ?access_token=, QUERY STRINGS END UP IN LOGS AND HISTORIES
+
+    # WebSocket compression config (the client leg is negotiated by uvicorn, --ws-per-message-deflate)
+    WEBSOCKET_COMPRESSION: bool = True # OFFER permessage-deflate TO THE MICROSERVICES
+    WEBSOCKET_COMPRESSION_THRESHOLD: int = 256 # MESSAGES SMALLER THAN THIS IN BYTES ARE SENT UNCOMPRESSED
+    WEBSOCKET_COMPRESSION_WINDOW_BITS: int = 12 # DEFLATE WINDOW (9-15), ABOUT 2^(BITS+2) BYTES OF MEMORY PER CONNECTION
+    WEBSOCKET_COMPRESSION_MEMORY_LEVEL: int = 5 # ZLIB memLevel (1-9), ABOUT 2^(LEVEL+9) BYTES OF MEMORY PER CONNECTION
+
+    # WebSocket multiplexing config (microservices with microservice_websocket_multiplex enabled)
+    WEBSOCKET_MULTIPLEX_PATH: str = "/ws/multiplex" # PATH OF THE MICROSERVICE THAT ACCEPTS THE SHARED CONNECTIONS
+    WEBSOCKET_MULTIPLEX_CONNECTIONS: int = 4 # SHARED CONNECTIONS PER MICROSERVICE AND WORKER
+
+    # WebSocket sessions config (limits are per worker, 0 UNLIMITED)
+    WEBSOCKET_MAX_SESSIONS_PER_USER: int = 20 # MAXIMUM CONCURRENT SESSIONS OF AN AUTHENTICATED USER
+    WEBSOCKET_MAX_SESSIONS_PER_IP: int = 200 # MAXIMUM CONCURRENT SESSIONS FROM A CLIENT IP
+    WEBSOCKET_MAX_SESSIONS_PER_UPSTREAM: int = 10000 # MAXIMUM CONCURRENT SESSIONS TO A MICROSERVICE
+    WEBSOCKET_DRAIN_PERIOD: float = 10.0 # SECONDS THE CLOSING OF THE OPEN SESSIONS IS SPREAD OVER ON SHUTDOWN (0 AT ONCE)
+    WEBSOCKET_RECONNECT_DELAY: float = 30.0 # UPPER BOUND OF THE RANDOM RECONNECT DELAY HINTED IN THE CLOSE REASON ON SHUTDOWN
+
+    # Route cache config
+    ROUTE_CACHE_TTL: float = 30.0 # SECONDS THE CACHED ROUTES AND USER GRANTS ARE TRUSTED BEFORE RELOADING THEM
+    ROUTE_CACHE_USERS: int = 10000 # MAXIMUM NUMBER OF USERS WHOSE GRANTS ARE CACHED
 
     # Rate limit config
     REQUESTS_PER_SECOND: int = 15 # MAXIMUM NUMBER OF REQUESTS ALLOWED PER SECOND
     REQUEST_INTERVAL: int = 1 # TIME INTERVAL IN SECONDS
     BLOCK_DURATION: int = 60 # LOCK TIME IN SECONDS
 
+    # Audit trail config
+    AUDIT_ENABLED: bool = True # RECORD EVERY GATEWAY REQUEST IN historical_movements
+    AUDIT_QUEUE_SIZE: int = 10000 # MAXIMUM NUMBER OF RECORDS WAITING TO BE WRITTEN
+    AUDIT_BATCH_SIZE: int = 500 # MAXIMUM NUMBER OF RECORDS PER INSERT
+    AUDIT_FLUSH_INTERVAL: float = 2.0 # MAXIMUM SECONDS A RECORD WAITS BEFORE BEING WRITTEN
+    AUDIT_OVERFLOW_POLICY: str = "drop_newest" # drop_newest OR drop_oldest WHEN THE QUEUE IS FULL
+
+    # Partitioning config
+    PARTITION_PREMAKE_MONTHS: int = 3 # MONTHLY PARTITIONS CREATED AHEAD OF THE CURRENT MONTH
+    PARTITION_RETENTION_MONTHS: int = 0 # MONTHS OF PARTITIONS KEPT, OLDER ONES ARE DROPPED (0 KEEPS THEM ALL)
+    PARTITION_MAINTENANCE_INTERVAL: int = 60 * 60 * 6 # SECONDS BETWEEN PARTITION MAINTENANCE RUNS
+
+    # Logging config
+    LOGGING_FORMAT: str = "json" # json OR verbose
+    LOGGING_QUEUE_SIZE: int = 10000 # MAXIMUM NUMBER OF RECORDS WAITING TO BE WRITTEN, NEWER ONES ARE DROPPED
+    LOGGING_BACKUP_DAYS: int = 14 # DAILY LOG FILES KEPT AFTER ROTATION
+    LOGGING_ACCESS_SAMPLE_RATE: float = 1.0 # FRACTION OF ACCESS LOG RECORDS KEPT (WARNINGS AND ERRORS ARE ALWAYS KEPT)
+
+    # Metrics config
+    METRICS_DIR: str = config("METRICS_DIR", default=os.path.join(tempfile.gettempdir(), f"api-gateway-metrics-{os.getppid()}"), cast=str) # SNAPSHOTS SHARED BY THE WORKERS OF ONE INSTANCE (DEFAULT ONE PER SUPERVISOR PROCESS)
+    METRICS_TOKEN: str = config("METRICS_TOKEN", default="", cast=str) # BEARER TOKEN OF THE SCRAPERS OF /monitoring/metrics, EMPTY TO DISABLE
+    METRICS_ALLOWED_IPS: str = config("METRICS_ALLOWED_IPS", default="127.0.0.1/32,::1/128", cast=str) # COMMA SEPARATED NETWORKS ALLOWED TO SCRAPE WITHOUT THE TOKEN
+    METRICS_SNAPSHOT_INTERVAL: float = 5.0 # SECONDS BETWEEN SNAPSHOTS OF EACH WORKER
+
+    # Tracing config
+    TRACING_ENABLED: bool = True # MEASURE THE STAGES OF EVERY REQUEST
+    TRACING_SAMPLE_RATE: float = 1.0 # FRACTION OF NEW TRACES EXPORTED, INCOMING traceparent FLAGS ARE RESPECTED
+    TRACING_SERVER_TIMING: bool = False # ADD THE Server-Timing HEADER TO THE RESPONSES
+    TRACING_EXPORTER: str = "none" # none, file OR otlp
+    TRACING_EXPORT_FILE: str = "" # JSON LINES FILE OF THE file EXPORTER (DEFAULT logs/traces.jsonl)
+    TRACING_EXPORT_FILE_MAX_MB: int = 100 # SIZE AT WHICH THE TRACE FILE IS ROTATED
+    TRACING_EXPORT_FILE_BACKUPS: int = 5 # ROTATED TRACE FILES KEPT
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces" # OTLP/HTTP COLLECTOR OF THE otlp EXPORTER
+    TRACING_QUEUE_SIZE: int = 10000 # MAXIMUM NUMBER OF SPANS WAITING TO BE EXPORTED
+    TRACING_BATCH_SIZE: int = 512 # MAXIMUM NUMBER OF SPANS PER EXPORT
+    TRACING_FLUSH_INTERVAL: float = 2.0 # SECONDS BETWEEN EXPORTS
+
+    # Profiling config
+    PROFILING_MAX_SECONDS: float = 60.0 # LONGEST PROFILE AN ADMINISTRATOR CAN REQUEST
+    PROFILING_INTERVAL: float = 0.005 # DEFAULT SECONDS BETWEEN STACK SAMPLES
+    PROFILING_SLOW_CALLBACK: float = 0.1 # DEFAULT SECONDS A CALLBACK MAY BLOCK THE EVENT LOOP BEFORE IT IS REPORTED
+
+    # Event loop watchdog config
+    WATCHDOG_ENABLED: bool = True # MEASURE THE EVENT LOOP LAG AND REPORT BLOCKING CALLS
+    WATCHDOG_INTERVAL: float = 0.05 # SECONDS BETWEEN HEARTBEATS OF THE EVENT LOOP
+    WATCHDOG_THRESHOLD: float = 0.1 # SECONDS THE EVENT LOOP MAY BE BLOCKED BEFORE ITS STACK IS CAPTURED
+    WATCHDOG_STACK_DEPTH: int = 30 # INNERMOST FRAMES OF THE CAPTURED STACK
+    WATCHDOG_STRICT: bool = False # DEVELOPMENT MODE: ASYNCIO DEBUG AND SHUTDOWN FAILS IF THE LOOP WAS BLOCKED
+
     class Config:
         case_sensitive = True
 
@@ -0,0 +1,13 @@
+import os
+
+
+
+# The settings are read from the environment when imported, the tests use the values of .env.test
+ENV_FILE = os.path.join(os.path.dirname(__file__), "..", "..", ".env.test")
+
+with open(ENV_FILE, encoding="utf-8") as env:
+    for line in env:
+        key, separator, value = line.strip().partition("=")
+
+        if separator and not key.startswith("#"):
+            os.environ.setdefault(key, value.strip('"'))
@@ -0,0 +1,49 @@
+import json
+import uuid
+import base64
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from core.helpers.CursorHelper import CURSOR_HELPER
+
+
+
+def forge(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+
+def test_round_trip_keeps_the_column_types():
+    key = uuid.uuid4()
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    cursor = CURSOR_HELPER.encode([created_at, key, 7], "created_at:desc")
+
+    assert CURSOR_HELPER.decode(cursor, [datetime, uuid.UUID, int], "created_at:desc") == [created_at, key, 7]
+
+
+
+@pytest.mark.parametrize("payload, kinds, sort", [
+    ({"s": "id:asc", "v": ["abc"]}, [int], "id:asc"),
+    ({"s": "id:asc", "v": [True]}, [int], "id:asc"),
+    ({"s": "id:asc", "v": [{"dt": 5}]}, [datetime], "id:asc"),
+    ({"s": "id:asc", "v": [{"x": 1}]}, [str], "id:asc"),
+    ({"s": "id:asc", "v": ["not-a-uuid"]}, [uuid.UUID], "id:asc"),
+    ({"s": "id:asc", "v": [1]}, [int], "id:desc"),
+    ({"s": "id:asc", "v": [1, 2]}, [int], "id:asc"),
+    ([{"dt": 5}], [datetime], "id:asc"),
+])
+def test_invalid_cursors_are_rejected_with_400(payload, kinds, sort):
+    with pytest.raises(HTTPException) as error:
+        CURSOR_HELPER.decode(forge(payload), kinds, sort)
+
+    assert error.value.status_code == 400
+
+
+
+def test_malformed_base64_is_rejected_with_400():
+    with pytest.raises(HTTPException) as error:
+        CURSOR_HELPER.decode("!!!", [int], "id:asc")
+
+    assert error.value.status_code == 400
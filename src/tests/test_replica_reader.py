@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from sqlalchemy import exc, text
+
+from core.bases import AsyncDatabaseSession
+
+
+
+# The worker thread of a failed aiosqlite connection reports on the loop after it closed
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_unreachable_replica_falls_back_to_the_primary(tmp_path):
+    async def scenario():
+        database = AsyncDatabaseSession(
+            f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}",
+            f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}"
+        )
+        database.replicas[0].checked_at = float("inf")
+
+        try:
+            session_local, connection = await database.open_reader(max_lag=0)
+
+            assert session_local is database.SessionLocal and connection is None
+            assert not database.replicas[0].healthy
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
+
+
+
+def test_reachable_replica_opens_its_connection(tmp_path):
+    async def scenario():
+        database = AsyncDatabaseSession(
+            f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}",
+            f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"
+        )
+
+        try:
+            session_local, connection = await database.open_reader(max_lag=0)
+
+            async with session_local(bind=connection) as session:
+                assert await session.scalar(text("SELECT 1")) == 1
+
+            await connection.close()
+            assert session_local is database.replicas[0].SessionLocal
+        finally:
+            await database.close()
+
+    asyncio.run(scenario())
+
+
+
+def test_statement_errors_do_not_count_as_lost_connections():
+    timeout = exc.OperationalError("SELECT pg_sleep(10)", {}, Exception("canceling statement due to statement timeout"))
+    lost = exc.OperationalError("SELECT 1", {}, Exception("server closed the connection"), connection_invalidated=True)
+
+    assert not AsyncDatabaseSession.connection_lost(timeout)
+    assert AsyncDatabaseSession.connection_lost(lost)
+    assert AsyncDatabaseSession.connection_lost(ConnectionResetError())
@@ -0,0 +1,72 @@
+import uuid
+import asyncio
+
+from core.helpers.RouteCacheHelper import RouteTree, RouteCacheHelper
+
+
+
+def test_static_segment_wins_over_parameter():
+    tree = RouteTree(["/orders/{id:int}", "/orders/latest", "/orders/{name}"])
+
+    assert tree.match("/orders/latest") == ("/orders/latest", {})
+    assert tree.match("/orders/42") == ("/orders/{id:int}", {"id": 42})
+    assert tree.match("/orders/pending") == ("/orders/{name}", {"name": "pending"})
+
+
+
+def test_parameter_types_by_priority():
+    tree = RouteTree(["/files/{key:uuid}", "/files/{key}", "/files/{key:int}"])
+    key = uuid.uuid4()
+
+    assert tree.match("/files/7") == ("/files/{key:int}", {"key": 7})
+    assert tree.match(f"/files/{key}") == ("/files/{key:uuid}", {"key": key})
+    assert tree.match("/files/report") == ("/files/{key}", {"key": "report"})
+    assert tree.match("/files/٣") == ("/files/{key}", {"key": "٣"})
+
+
+
+def test_backtracks_when_a_branch_does_not_match():
+    tree = RouteTree(["/users/me/profile", "/users/{id:int}/orders", "/users/{name}/orders"])
+
+    assert tree.match("/users/me/orders") == ("/users/{name}/orders", {"name": "me"})
+    assert tree.match("/users/5/orders") == ("/users/{id:int}/orders", {"id": 5})
+    assert tree.match("/users/me/profile") == ("/users/me/profile", {})
+    assert tree.match("/users/me") is None
+
+
+
+def test_path_parameter_takes_the_rest_of_the_path():
+    tree = RouteTree(["/static/{file:path}", "/static/index"])
+
+    assert tree.match("/static/index") == ("/static/index", {})
+    assert tree.match("/static/css/site.css") == ("/static/{file:path}", {"file": "css/site.css"})
+    assert tree.match("/static/index/extra") == ("/static/{file:path}", {"file": "index/extra"})
+
+
+
+def test_empty_segment_does_not_match_a_parameter():
+    tree = RouteTree(["/orders/{name}"])
+
+    assert tree.match("/orders/") is None
+
+
+
+def test_invalid_templates_only_match_themselves():
+    tree = RouteTree(["/a/{x:float}", "/b/{rest:path}/tail"])
+
+    assert tree.match("/a/{x:float}") == ("/a/{x:float}", {})
+    assert tree.match("/a/1.5") is None
+    assert tree.match("/b/{rest:path}/tail") == ("/b/{rest:path}/tail", {})
+    assert tree.match("/b/one/tail") is None
+
+
+
+def test_only_gateway_paths_are_matched_against_templates():
+    cache = RouteCacheHelper()
+    cache.tree = RouteTree(["/{a}/{b}"])
+    cache.routes_expire_at = float("inf")
+
+    assert asyncio.run(cache.resolve("/gateway/orders/list")) == "/{a}/{b}"
+    assert asyncio.run(cache.resolve("/administration/profiling")) == "/administration/profiling"
+    assert asyncio.run(cache.resolve("/monitoring/metrics")) == "/monitoring/metrics"
+    assert asyncio.run(cache.resolve("/gatewayx/orders")) == "/gatewayx/orders"